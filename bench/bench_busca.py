@@ -0,0 +1,103 @@
+"""
+Benchmark do índice de busca de prestadores (utils/indice_busca.py).
+
+Monta um armazém sintético com as cidades de estados_cidades_amil.json
+(tamanho das cidades com cauda longa, como no site), reconstrói o índice
+numa transação e mede a latência de consultas típicas da /api/prestadores.
+
+Exemplo:
+    python -m bench.bench_busca --media-prestadores 120 --repeticoes 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+# Armazém e índice sintéticos em pasta temporária (não toca em output/)
+os.environ["AMIL_OUTPUT_DIR"] = tempfile.mkdtemp(prefix="bench_busca_")
+
+from utils.armazem_resultados import ArmazemResultados  # noqa: E402
+from utils.indice_busca import IndiceBusca  # noqa: E402
+from utils.file_manager import OUTPUT_DIR  # noqa: E402
+
+_RUAS = ["RUA DAS FLORES", "AVENIDA SETE DE SETEMBRO", "RUA CHILE", "AVENIDA PAULISTA",
+         "RUA SÃO JOÃO", "TRAVESSA DA PAZ", "AVENIDA BRASIL", "RUA DOUTOR JOSÉ PEROBA"]
+_NOMES = ["CLINICA ODONTOLOGICA", "CONSULTORIO", "ODONTO", "SORRISO", "DENTAL", "ORTO"]
+
+
+def _montar_armazem(armazem: ArmazemResultados, media: int, semente: int) -> int:
+    rnd = random.Random(semente)
+    with open(RAIZ / "estados_cidades_amil.json", "r", encoding="utf-8") as f:
+        mapa = json.load(f)
+    total = 0
+    for uf, cidades in mapa.items():
+        for cidade in cidades:
+            quantidade = min(int(rnd.lognormvariate(0, 1.2) * media / 2), 5000)
+            prestadores = [
+                {
+                    "nome": f"{rnd.choice(_NOMES)} {cidade} {i:04d} LTDA",
+                    "endereco": f"{rnd.choice(_RUAS)}, {rnd.randint(1, 3000)}",
+                    "bairro": f"BAIRRO {rnd.randint(1, 60)}",
+                    "telefone": f"({rnd.randint(11, 99)}) 3{rnd.randint(0, 999):03d}-{rnd.randint(0, 9999):04d}",
+                }
+                for i in range(quantidade)
+            ]
+            armazem.registrar(uf, cidade, prestadores)
+            total += quantidade
+    return total
+
+
+def _medir(indice: IndiceBusca, repeticoes: int, **consulta) -> list[float]:
+    indice.buscar(**consulta)  # aquecimento (cache de páginas do SQLite)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        indice.buscar(**consulta)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark da busca de prestadores (FTS5)")
+    parser.add_argument("--media-prestadores", type=int, default=120, help="Prestadores por cidade (média)")
+    parser.add_argument("--repeticoes", type=int, default=200, help="Consultas medidas por caso")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    armazem = ArmazemResultados(OUTPUT_DIR / "resultados")
+    total = _montar_armazem(armazem, args.media_prestadores, args.semente)
+    indice = IndiceBusca(OUTPUT_DIR / "indice_prestadores.db")
+    reconstrucao = indice.reconstruir(OUTPUT_DIR / "resultados")
+    print(f"\n🔎 Índice: {reconstrucao['cidades']} cidades, {total} prestadores, "
+          f"reconstruído em {reconstrucao['tempo_seg']:.2f}s")
+
+    casos = {
+        "nome ('sorriso salvador')": {"texto": "sorriso salvador"},
+        "palavra longa + número ('consultorio 0042')": {"texto": "consultorio 0042"},
+        "rua comum ('avenida brasil')": {"texto": "avenida brasil"},
+        "prefixo curto ('cl')": {"texto": "cl"},
+        "prefixo longo ('odontologica')": {"texto": "odontologica"},
+        "telefone ('3123')": {"texto": "3123"},
+        "sem acento ('sao joao', uf=SP)": {"texto": "sao joao", "uf": "SP"},
+        "rua na cidade ('rua', cidade=SALVADOR)": {"texto": "rua", "cidade": "SALVADOR"},
+        "lista da cidade (SALVADOR-BA)": {"uf": "BA", "cidade": "SALVADOR"},
+        "página 10 ('odonto')": {"texto": "odonto", "pagina": 10},
+    }
+    print(f"\n📊 CONSULTAS ({args.repeticoes} repetições)")
+    for rotulo, consulta in casos.items():
+        tempos = _medir(indice, args.repeticoes, **consulta)
+        p95 = statistics.quantiles(tempos, n=20)[-1]
+        print(f"   {rotulo}: mediana {statistics.median(tempos):.2f}ms | p95 {p95:.2f}ms "
+              f"| {indice.buscar(**consulta)['total']} resultados")
+
+
+if __name__ == "__main__":
+    main()
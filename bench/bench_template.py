@@ -0,0 +1,109 @@
+"""
+Benchmark da montagem do HTML dos PDFs (sem wkhtmltopdf).
+
+Compara, para uma cidade sintética, o caminho antigo (ler o template do disco
+a cada PDF + str.replace encadeado + f-string por prestador, sem escape), o
+mesmo caminho com html.escape por campo (o mínimo para ficar correto) e o
+template compilado de pdf.gerador_pdf (montar_html_prestadores).
+
+Exemplo:
+    python -m bench.bench_template --prestadores 1000 --repeticoes 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from html import escape
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# pdfkit só precisa de um binário existente para importar o gerador
+os.environ.setdefault("WKHTMLTOPDF_PATH", sys.executable)
+
+from pdf.gerador_pdf import (  # noqa: E402
+    SCRIPT_DIR,
+    TEMPLATE_DIR,
+    montar_html_prestadores,
+    referencia_atual,
+)
+
+
+def _prestadores_sinteticos(quantidade: int) -> list[dict]:
+    return [
+        {
+            "nome": f"CLINICA ODONTOLOGICA EXEMPLO {i:04d} LTDA",
+            "endereco": f"RUA DAS FLORES, {i} - SALA {i % 40}",
+            "bairro": f"BAIRRO {i % 25}",
+            "telefone": f"(71) 3{i:03d}-{i:04d}",
+        }
+        for i in range(quantidade)
+    ]
+
+
+def _montar_html_antigo(uf: str, cidade: str, prestadores: list[dict], escapar=str) -> str:
+    """Cópia do caminho anterior, só para comparação."""
+    with open(TEMPLATE_DIR / "prestadores.html", "r", encoding="utf-8") as f:
+        template = f.read()
+    logo_amil = (SCRIPT_DIR / "amil_dental.jpg").resolve().as_uri()
+    logo_ativa = (SCRIPT_DIR / "logo_ativa.jpg").resolve().as_uri()
+    mes_ano = referencia_atual()
+    html_prestadores = []
+    for p in prestadores:
+        html_prestadores.append(
+            "<div class='prestador'>"
+            f"<strong>Nome:</strong> {escapar(p['nome'])}<br>"
+            f"<strong>Bairro:</strong> {escapar(p['bairro'])}<br>"
+            f"<strong>Endereço:</strong> {escapar(p['endereco'])}<br>"
+            f"<strong>Telefone:</strong> {escapar(p['telefone'])}"
+            "</div>"
+        )
+    return (
+        template
+        .replace("{{LOGO_AMIL}}", logo_amil)
+        .replace("{{LOGO_ATIVA}}", logo_ativa)
+        .replace("{{REFERENCIA}}", mes_ano)
+        .replace("{{CIDADE}}", escapar(cidade))
+        .replace("{{UF}}", escapar(uf))
+        .replace("{{TOTAL_PRESTADORES}}", str(len(prestadores)))
+        .replace("<!--PRESTADORES-->", "\n".join(html_prestadores))
+    )
+
+
+def _medir(func, repeticoes: int, *args) -> list[float]:
+    func(*args)  # aquecimento (inclui a compilação do template no caminho novo)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func(*args)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark da montagem do HTML dos PDFs")
+    parser.add_argument("--prestadores", type=int, default=1000, help="Prestadores na cidade sintética")
+    parser.add_argument("--repeticoes", type=int, default=200, help="Renders medidos por caminho")
+    args = parser.parse_args()
+
+    prestadores = _prestadores_sinteticos(args.prestadores)
+    uf, cidade = "BA", "SALVADOR"
+
+    # Sem caracteres especiais os dois caminhos precisam gerar o mesmo HTML
+    if _montar_html_antigo(uf, cidade, prestadores) != montar_html_prestadores(uf, cidade, prestadores):
+        raise SystemExit("❌ HTML do template compilado difere do caminho antigo")
+
+    resultados = {
+        "Antes (replace, sem escape)": _medir(_montar_html_antigo, args.repeticoes, uf, cidade, prestadores),
+        "Antes + escape por campo": _medir(_montar_html_antigo, args.repeticoes, uf, cidade, prestadores, escape),
+        "Depois (compilado, escapado)": _medir(montar_html_prestadores, args.repeticoes, uf, cidade, prestadores),
+    }
+
+    print(f"\n📊 MONTAGEM DO HTML ({args.prestadores} prestadores, {args.repeticoes} repetições)")
+    for rotulo, tempos in resultados.items():
+        print(f"   {rotulo}: média {statistics.mean(tempos):.3f}ms | mediana {statistics.median(tempos):.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark ponta a ponta contra o mock local (bench/mock_amil.py).
+
+Mede cidades/hora do pipeline completo processar_cidade → PDF → planilha,
+sem rede: sobe o mock, aponta o AmilBot para ele e grava PDFs/planilha
+numa pasta temporária (não toca em docs/pdfs).
+
+Exemplo:
+    python -m bench.benchmark --uf BA --cidades 10 --escala-delays 0
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench.mock_amil import ServidorMock
+from bench.proxy_local import ProxyLocal
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    idx = min(int(round(p * (len(ordenados) - 1))), len(ordenados) - 1)
+    return ordenados[idx]
+
+
+def _selecionar_cidades(mapa: dict, uf: str | None, limite: int) -> list[tuple[str, str]]:
+    tarefas = []
+    for sigla, cidades in mapa.items():
+        if uf and sigla != uf:
+            continue
+        tarefas.extend((sigla, cidade) for cidade in cidades)
+    return tarefas[:limite] if limite else tarefas
+
+
+def executar_benchmark(url_busca: str, tarefas: list[tuple[str, str]]) -> dict:
+    """Roda o pipeline real para cada (uf, cidade). Os imports acontecem aqui
+    porque URL/diretórios são lidos das variáveis de ambiente na importação."""
+    os.environ["AMIL_URL_BUSCA"] = url_busca
+
+    from main import gerar_planilha_simples
+    from scraper.agendador import AgendadorTentativas
+    from scraper.amil_scraper import AmilBot
+    from utils.delays import iniciar_contabilidade, resumo_esperas
+    from utils.file_manager import DOCS_PDFS_DIR
+    from utils.metricas import ETAPA
+
+    iniciar_contabilidade()
+    duracoes = []
+    falhas = []
+    prestadores_total = 0
+    inicio = time.perf_counter()
+
+    agendador = AgendadorTentativas(tarefas)
+    with ExitStack() as pilha:
+        bots = {}
+        while (espera := agendador.espera()) is not None:
+            if espera > 0:
+                time.sleep(espera)
+                continue
+            uf, cidade, _ = agendador.proxima()
+            if uf not in bots:
+                bots[uf] = pilha.enter_context(AmilBot(uf, pasta_base=DOCS_PDFS_DIR))
+            bot = bots[uf]
+
+            t0 = time.perf_counter()
+            try:
+                bot.processar_cidade(cidade)
+            except Exception as e:
+                if not agendador.falhar(uf, cidade, e)["reagendada"]:
+                    falhas.append(f"{cidade}-{uf}")
+                bot.resultado_por_cidade.clear()
+                print(f"⚠️ {cidade}-{uf}: {e}")
+                continue
+            agendador.concluir(uf, cidade)
+            if bot.resultado_por_cidade:
+                gerar_planilha_simples(bot.resultado_por_cidade, modo_append=True)
+                prestadores_total += sum(item["prestadores"] for item in bot.resultado_por_cidade)
+            duracoes.append(time.perf_counter() - t0)
+            bot.resultado_por_cidade.clear()
+            print(f"🏁 {cidade}-{uf}: {duracoes[-1]:.1f}s")
+
+    total = time.perf_counter() - inicio
+    return {
+        "cidades": len(tarefas),
+        "falhas": falhas,
+        "prestadores": prestadores_total,
+        "tempo_total_seg": round(total, 2),
+        "cidades_por_hora": round(len(tarefas) / total * 3600, 1) if total else 0.0,
+        "cidade_media_seg": round(statistics.mean(duracoes), 2) if duracoes else 0.0,
+        "cidade_p50_seg": round(_percentil(duracoes, 0.50), 2),
+        "cidade_p95_seg": round(_percentil(duracoes, 0.95), 2),
+        "etapas": sorted(ETAPA.resumo(), key=lambda x: -x["soma"]),
+        "esperas": resumo_esperas(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline AmilBot")
+    parser.add_argument("--uf", default=None, help="Limitar a uma UF")
+    parser.add_argument("--cidades", type=int, default=5, help="Quantidade de cidades (0 = todas)")
+    parser.add_argument("--latencia-ms", type=int, default=150, help="Latência da API do mock")
+    parser.add_argument("--limite-buscas", type=int, default=0, help="Throttle do mock (buscas/min)")
+    parser.add_argument("--captcha-a-cada", type=int, default=0, help="Captcha a cada N páginas")
+    parser.add_argument("--escala-delays", type=float, default=0.0,
+                        help="Fator sobre cooldowns/pausas (1.0 = pacing real)")
+    parser.add_argument("--pasta-saida", default=None, help="Pasta para PDFs/planilha/relatório")
+    parser.add_argument("--proxies", type=int, default=0,
+                        help="Sobe N proxies locais (latência crescente) e usa o pool de proxies")
+    parser.add_argument("--proxies-bloqueados", type=int, default=0,
+                        help="Quantos desses proxies respondem 403 (acesso negado)")
+    args = parser.parse_args()
+
+    pasta = Path(args.pasta_saida or tempfile.mkdtemp(prefix="amil_bench_"))
+    pasta.mkdir(parents=True, exist_ok=True)
+    os.environ["AMIL_OUTPUT_DIR"] = str(pasta / "output")
+    os.environ["AMIL_DOCS_PDFS_DIR"] = str(pasta / "pdfs")
+    os.environ["AMIL_ESCALA_DELAYS"] = str(args.escala_delays)
+
+    from main import carregar_mapa_estados
+    tarefas = _selecionar_cidades(carregar_mapa_estados(), args.uf, args.cidades)
+
+    config = {
+        "latencia_ms": args.latencia_ms,
+        "limite_buscas": args.limite_buscas,
+        "captcha_a_cada": args.captcha_a_cada,
+    }
+    with ExitStack() as pilha:
+        servidor = pilha.enter_context(ServidorMock(config))
+        proxies = [
+            pilha.enter_context(ProxyLocal(latencia_ms=i * 100, bloqueado=i < args.proxies_bloqueados))
+            for i in range(args.proxies)
+        ]
+        if proxies:
+            os.environ["AMIL_PROXIES"] = ",".join(p.url for p in proxies)
+            print(f"🌐 {len(proxies)} proxies locais ({args.proxies_bloqueados} bloqueados)")
+        print(f"🧪 Mock em {servidor.url_busca} — {len(tarefas)} cidades")
+        resultado = executar_benchmark(servidor.url_busca, tarefas)
+        resultado["mock"] = servidor.contadores()
+        if proxies:
+            from scraper.proxy_pool import obter_pool
+            resultado["proxies"] = obter_pool().resumo()
+    resultado["config"] = {**config, "escala_delays": args.escala_delays}
+
+    caminho = pasta / "benchmark.json"
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    print("\n📊 RESULTADO")
+    print(f"   Cidades: {resultado['cidades']} ({len(resultado['falhas'])} com erro)")
+    print(f"   Tempo total: {resultado['tempo_total_seg']:.1f}s")
+    print(f"   Cidades/hora: {resultado['cidades_por_hora']:.1f}")
+    print(f"   Por cidade: média {resultado['cidade_media_seg']:.1f}s | "
+          f"p50 {resultado['cidade_p50_seg']:.1f}s | p95 {resultado['cidade_p95_seg']:.1f}s")
+    print(f"   Relatório: {caminho}")
+
+
+if __name__ == "__main__":
+    main()
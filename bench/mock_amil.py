@@ -0,0 +1,234 @@
+"""
+Mock local da busca-avançada da Amil, para replay/benchmark sem rede.
+
+Serve uma SPA com a mesma estrutura que o AmilBot espera (dropdowns
+rw-*, listbox, labels Estado/Municipio/Bairro/Especialidade, blocos
+accredited-network__result, result-legend) e uma API JSON que alimenta
+os resultados. Latência, throttling e captcha são configuráveis.
+
+Uso direto:  python -m bench.mock_amil --porta 8765
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+
+from flask import Flask, jsonify, request, send_file
+from werkzeug.serving import make_server
+
+SCRIPT_DIR = Path(__file__).resolve().parents[1]
+PAGINA_SPA = Path(__file__).parent / "static" / "busca_avancada.html"
+PAGINA_CAPTCHA = Path(__file__).parent / "static" / "captcha.html"
+
+# Caminho com hash route igual ao site real
+CAMINHO_BUSCA = "/institucional/#/servicos/saude/rede-credenciada/amil/busca-avancada"
+
+CAPITAIS = {
+    "RIO BRANCO", "MACEIO", "MANAUS", "MACAPA", "SALVADOR", "FORTALEZA", "BRASILIA",
+    "VITORIA", "GOIANIA", "SAO LUIS", "BELO HORIZONTE", "CAMPO GRANDE", "CUIABA",
+    "BELEM", "JOAO PESSOA", "RECIFE", "TERESINA", "CURITIBA", "RIO DE JANEIRO",
+    "NATAL", "PORTO VELHO", "BOA VISTA", "PORTO ALEGRE", "FLORIANOPOLIS", "ARACAJU",
+    "SAO PAULO", "PALMAS",
+}
+
+ESPECIALIDADES = [
+    "CIRURGIA ORAL MENOR", "CLINICA GERAL", "ENDODONTIA", "ODONTOPEDIATRIA",
+    "ORTODONTIA", "PERIODONTIA", "PROTESE", "RADIOLOGIA",
+]
+
+BAIRROS = ["CENTRO", "JARDIM AMERICA", "VILA NOVA", "SAO JOSE", "BOA VISTA", "INDUSTRIAL"]
+RUAS = ["RUA DAS FLORES", "AV BRASIL", "RUA SETE DE SETEMBRO", "AV GETULIO VARGAS", "RUA DA MATRIZ"]
+NOMES = ["CLINICA", "CONSULTORIO", "ODONTO", "SORRISO", "DENTAL CENTER", "ORAL CARE"]
+SOBRENOMES = ["SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "LIMA", "PEREIRA", "COSTA", "ALMEIDA"]
+
+
+def config_padrao() -> dict:
+    return {
+        "latencia_ms": 150,            # atraso de cada chamada da API JSON
+        "tamanho_pagina": 20,          # blocos revelados por scroll (lazy loading)
+        "limite_buscas": 0,            # buscas por janela antes de devolver 429 (0 = sem limite)
+        "janela_throttle_seg": 60,
+        "captcha_a_cada": 0,           # a cada N carregamentos da página, serve captcha (0 = nunca)
+        "cidades_sem_especialidade": None,  # None = determinístico (~20%); lista = fixo
+        "cidades_sem_resultado": None,      # None = determinístico (~5%); lista = fixo
+        "municipios_extras": {},       # {"UF": ["CIDADE NOVA"]} — simula municípios novos no site
+    }
+
+
+def _semente(*partes: str) -> int:
+    return zlib.crc32("|".join(partes).encode("utf-8"))
+
+
+def gerar_prestadores(uf: str, cidade: str) -> list[dict]:
+    """Lista determinística de prestadores para a cidade (mesma entrada, mesma saída)."""
+    rng = random.Random(_semente(uf, cidade))
+    total = rng.randint(120, 400) if cidade in CAPITAIS else rng.randint(1, 30)
+    prestadores = []
+    for i in range(total):
+        prestadores.append({
+            "nome": f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {i + 1:03d}",
+            "endereco": f"{rng.choice(RUAS)}, {rng.randint(1, 2500)}",
+            "bairro": rng.choice(BAIRROS),
+            "cep": f"{rng.randint(10000, 99999)}-{rng.randint(100, 999)}",
+            "telefone": f"({rng.randint(11, 99)}) {rng.randint(3000, 3999)}-{rng.randint(1000, 9999)}",
+        })
+    return prestadores
+
+
+def criar_app(config: dict | None = None) -> Flask:
+    cfg = config_padrao()
+    cfg.update(config or {})
+
+    with open(SCRIPT_DIR / "estados_cidades_amil.json", encoding="utf-8") as f:
+        mapa = json.load(f)
+    for uf, extras in cfg["municipios_extras"].items():
+        mapa.setdefault(uf, []).extend(extras)
+
+    estado = {
+        "carregamentos": 0,
+        "buscas": deque(),
+        "lock": threading.Lock(),
+        "contadores": {"paginas": 0, "captchas": 0, "buscas": 0, "throttled": 0},
+    }
+
+    def _sem_especialidade(uf: str, cidade: str) -> bool:
+        lista = cfg["cidades_sem_especialidade"]
+        if lista is not None:
+            return cidade in lista
+        return cidade not in CAPITAIS and _semente("esp", uf, cidade) % 5 == 0
+
+    def _sem_resultado(uf: str, cidade: str) -> bool:
+        lista = cfg["cidades_sem_resultado"]
+        if lista is not None:
+            return cidade in lista
+        return cidade not in CAPITAIS and _semente("res", uf, cidade) % 20 == 0
+
+    def _latencia() -> None:
+        if cfg["latencia_ms"]:
+            time.sleep(cfg["latencia_ms"] / 1000)
+
+    app = Flask(__name__)
+    app.config["MOCK"] = cfg
+    app.config["MOCK_ESTADO"] = estado
+
+    @app.route("/institucional/")
+    def pagina():
+        with estado["lock"]:
+            estado["carregamentos"] += 1
+            estado["contadores"]["paginas"] += 1
+            n = estado["carregamentos"]
+        if cfg["captcha_a_cada"] and n % cfg["captcha_a_cada"] == 0:
+            with estado["lock"]:
+                estado["contadores"]["captchas"] += 1
+            return send_file(PAGINA_CAPTCHA)
+        return send_file(PAGINA_SPA)
+
+    @app.route("/mock-api/estados")
+    def estados():
+        _latencia()
+        return jsonify(sorted(mapa.keys()))
+
+    @app.route("/mock-api/municipios")
+    def municipios():
+        _latencia()
+        return jsonify(sorted(mapa.get(request.args.get("uf", ""), [])))
+
+    @app.route("/mock-api/especialidades")
+    def especialidades():
+        _latencia()
+        uf = request.args.get("uf", "")
+        cidade = request.args.get("cidade", "")
+        if _sem_especialidade(uf, cidade):
+            return jsonify([e for e in ESPECIALIDADES if e != "CLINICA GERAL"])
+        return jsonify(ESPECIALIDADES)
+
+    @app.route("/mock-api/prestadores")
+    def prestadores():
+        _latencia()
+        agora = time.time()
+        with estado["lock"]:
+            estado["contadores"]["buscas"] += 1
+            buscas = estado["buscas"]
+            buscas.append(agora)
+            while buscas and agora - buscas[0] > cfg["janela_throttle_seg"]:
+                buscas.popleft()
+            throttled = bool(cfg["limite_buscas"]) and len(buscas) > cfg["limite_buscas"]
+            if throttled:
+                estado["contadores"]["throttled"] += 1
+        if throttled:
+            return jsonify({"erro": "Too many requests"}), 429
+
+        uf = request.args.get("uf", "")
+        cidade = request.args.get("cidade", "")
+        lista = [] if _sem_resultado(uf, cidade) else gerar_prestadores(uf, cidade)
+        return jsonify({
+            "uf": uf,
+            "cidade": cidade,
+            "especialidade": request.args.get("especialidade", ""),
+            "total": len(lista),
+            "tamanho_pagina": cfg["tamanho_pagina"],
+            "prestadores": lista,
+        })
+
+    @app.route("/mock-api/contadores")
+    def contadores():
+        with estado["lock"]:
+            return jsonify(dict(estado["contadores"]))
+
+    return app
+
+
+class ServidorMock:
+    """Sobe o mock em uma thread (werkzeug) para uso no benchmark."""
+
+    def __init__(self, config: dict | None = None, host: str = "127.0.0.1", porta: int = 0) -> None:
+        self.app = criar_app(config)
+        self._servidor = make_server(host, porta, self.app, threaded=True)
+        self.host = host
+        self.porta = self._servidor.server_port
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+
+    @property
+    def url_busca(self) -> str:
+        return f"http://{self.host}:{self.porta}{CAMINHO_BUSCA}"
+
+    def contadores(self) -> dict:
+        estado = self.app.config["MOCK_ESTADO"]
+        with estado["lock"]:
+            return dict(estado["contadores"])
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._servidor.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock local da busca-avançada Amil")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia-ms", type=int, default=150)
+    parser.add_argument("--limite-buscas", type=int, default=0)
+    parser.add_argument("--captcha-a-cada", type=int, default=0)
+    args = parser.parse_args()
+
+    with ServidorMock(
+        {"latencia_ms": args.latencia_ms, "limite_buscas": args.limite_buscas, "captcha_a_cada": args.captcha_a_cada},
+        porta=args.porta,
+    ) as servidor:
+        print(f"🧪 Mock rodando em {servidor.url_busca}")
+        print(f"   export AMIL_URL_BUSCA='{servidor.url_busca}'")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
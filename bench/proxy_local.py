@@ -0,0 +1,146 @@
+"""
+Proxies HTTP locais para testar o pool de proxies sem rede externa.
+
+Cada proxy encaminha GET/POST (URL absoluta) e túneis CONNECT, com latência
+configurável e um modo "bloqueado" que devolve 403 com página de acesso negado.
+
+    python -m bench.proxy_local --portas 8801 8802 8803 --latencias-ms 50 400 0 --bloqueados 8803
+"""
+import argparse
+import select
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGINA_BLOQUEIO = (
+    "<html><body><h1>Acesso negado</h1>"
+    "<p>Seu IP foi bloqueado temporariamente.</p></body></html>"
+).encode("utf-8")
+
+
+def _criar_handler(config: dict):
+    class HandlerProxy(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _atrasar(self) -> None:
+            if config["latencia_ms"]:
+                time.sleep(config["latencia_ms"] / 1000)
+
+        def _bloqueado(self) -> bool:
+            config["requisicoes"] += 1
+            if not config["bloqueado"]:
+                return False
+            self.send_response(403)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(PAGINA_BLOQUEIO)))
+            self.end_headers()
+            self.wfile.write(PAGINA_BLOQUEIO)
+            return True
+
+        def _encaminhar(self) -> None:
+            self._atrasar()
+            if self._bloqueado():
+                return
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            corpo = self.rfile.read(tamanho) if tamanho else None
+            cabecalhos = {k: v for k, v in self.headers.items() if k.lower() not in ("proxy-connection", "connection")}
+            req = urllib.request.Request(self.path, data=corpo, headers=cabecalhos, method=self.command)
+            try:
+                resp = urllib.request.urlopen(req, timeout=30)
+                status, dados, headers = resp.status, resp.read(), resp.headers.items()
+            except urllib.error.HTTPError as e:
+                status, dados, headers = e.code, e.read(), e.headers.items()
+            except Exception as e:
+                self.send_error(502, str(e))
+                return
+            self.send_response(status)
+            for k, v in headers:
+                if k.lower() not in ("transfer-encoding", "connection", "content-length"):
+                    self.send_header(k, v)
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        do_GET = _encaminhar
+        do_POST = _encaminhar
+        do_HEAD = _encaminhar
+
+        def do_CONNECT(self) -> None:
+            self._atrasar()
+            if self._bloqueado():
+                return
+            host, _, porta = self.path.partition(":")
+            try:
+                destino = socket.create_connection((host, int(porta or 443)), timeout=30)
+            except Exception as e:
+                self.send_error(502, str(e))
+                return
+            self.send_response(200, "Connection Established")
+            self.end_headers()
+            sockets = [self.connection, destino]
+            try:
+                while True:
+                    prontos, _, erro = select.select(sockets, [], sockets, 60)
+                    if erro or not prontos:
+                        break
+                    for s in prontos:
+                        dados = s.recv(65536)
+                        if not dados:
+                            return
+                        (destino if s is self.connection else self.connection).sendall(dados)
+            finally:
+                destino.close()
+
+    return HandlerProxy
+
+
+class ProxyLocal:
+    """Um proxy em thread própria. `bloqueado` pode ser alterado em tempo de execução."""
+
+    def __init__(self, porta: int = 0, latencia_ms: int = 0, bloqueado: bool = False) -> None:
+        self.config = {"latencia_ms": latencia_ms, "bloqueado": bloqueado, "requisicoes": 0}
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", porta), _criar_handler(self.config))
+        self._servidor.daemon_threads = True
+        self.porta = self._servidor.server_port
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.porta}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Proxies HTTP locais (stand-in)")
+    parser.add_argument("--portas", type=int, nargs="+", default=[8801, 8802, 8803])
+    parser.add_argument("--latencias-ms", type=int, nargs="*", default=[])
+    parser.add_argument("--bloqueados", type=int, nargs="*", default=[], help="Portas que respondem 403")
+    args = parser.parse_args()
+
+    proxies = []
+    for i, porta in enumerate(args.portas):
+        latencia = args.latencias_ms[i] if i < len(args.latencias_ms) else 0
+        proxies.append(ProxyLocal(porta, latencia, porta in args.bloqueados).__enter__())
+    print("🌐 Proxies locais:")
+    print(f"   export AMIL_PROXIES='{','.join(p.url for p in proxies)}'")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for p in proxies:
+            p.__exit__(None, None, None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Execução nacional distribuída entre vários hosts.
+
+O coordenador coloca as cidades numa fila SQLite em volume compartilhado;
+cada worker arrenda uma cidade, processa com o AmilBot e devolve o resultado
+(contagem de prestadores e caminho do PDF). Leases vencidos (host que caiu no
+meio da cidade) voltam para a fila sozinhos. Cada worker loga em
+output/amil_bot.<id>.log (o coordenador, em output/amil_bot.log).
+
+    python distribuido.py coordenador --fila /mnt/compartilhado/fila.db
+    python distribuido.py worker --fila /mnt/compartilhado/fila.db --id host-1
+"""
+import argparse
+import re
+import socket
+import threading
+import time
+
+from main import carregar_mapa_estados, cidades_a_processar, gerar_planilha_simples, salvar_logs_finais
+from scraper.amil_scraper import AmilBot
+from scraper.agendador import atraso_retry
+from scraper.erros import PERMANENTE, classificar_erro
+from scraper.recursos import obter_monitor
+from utils.file_manager import OUTPUT_DIR, DOCS_PDFS_DIR, get_pdf_path
+from utils.armazem_resultados import obter_armazem
+from utils.fila_tarefas import FilaTarefas, CONCLUIDA, FALHOU
+from utils.historico import comparar_makespan, obter_historico, simular_makespan
+from utils.logger import setup_logger
+
+FILA_PADRAO = OUTPUT_DIR / "fila_tarefas.db"
+
+
+# =====================================================
+# Coordenador
+# =====================================================
+def coordenar(fila: FilaTarefas, reiniciar: bool = False, intervalo_seg: float = 30) -> None:
+    """Enfileira todas as cidades e acompanha até a fila esvaziar."""
+    logger = setup_logger("amil_bot", OUTPUT_DIR / "amil_bot.log")
+    if reiniciar:
+        fila.limpar()
+
+    mapa = carregar_mapa_estados()
+    tarefas = [(uf, cidade) for uf, cidades in mapa.items() for cidade in cidades]
+    # 🔥 NOVO — Prioridade = duração estimada: os workers arrendam as mais longas primeiro (LPT).
+    # Cidades com PDF (puladas em segundos pelo worker) ficam com prioridade 0 e fora da previsão
+    a_processar = cidades_a_processar(tarefas)
+    estimativas = obter_historico().estimativas(a_processar)
+    inicio = time.monotonic()
+    novas = fila.enfileirar(tarefas, prioridades=estimativas)
+    logger.info(f"📥 {novas} cidades enfileiradas ({len(tarefas)} no mapa)")
+
+    while not fila.finalizada():
+        resumo = fila.resumo()
+        logger.info(
+            f"📊 Fila: {resumo['pendente']} pendentes | {resumo['em_andamento']} em andamento | "
+            f"{resumo['concluida']} concluídas | {resumo['falhou']} com falha"
+        )
+        time.sleep(intervalo_seg)
+
+    # Previsto com o número de workers que de fato participaram
+    workers = {t["worker"] for t in fila.tarefas(CONCLUIDA) if t["worker"]}
+    ordem = sorted(a_processar, key=lambda t: -estimativas[t])
+    makespan = comparar_makespan(
+        simular_makespan([estimativas[t] for t in ordem], len(workers) or 1), time.monotonic() - inicio
+    )
+    logger.info(
+        f"📐 Makespan previsto {makespan['previsto_seg']:.0f}s | real {makespan['real_seg']:.0f}s "
+        f"({len(workers)} workers)"
+    )
+    consolidar(fila, makespan)
+
+
+def consolidar(fila: FilaTarefas, makespan: dict | None = None) -> None:
+    """Gera planilha e logs finais a partir dos resultados reportados pelos workers."""
+    resultado_por_cidade = []
+    for tarefa in fila.tarefas(CONCLUIDA):
+        if tarefa["resultado"]:
+            resultado_por_cidade.append(tarefa["resultado"])
+
+    cidades_com_erro = {}
+    for tarefa in fila.tarefas(FALHOU):
+        cidades_com_erro.setdefault(tarefa["uf"], []).append(tarefa["cidade"])
+
+    # puladas (PDF já existente) já estão na planilha da execução que as gerou
+    novas = [r for r in resultado_por_cidade if not r.get("pulada")]
+    if novas:
+        gerar_planilha_simples(novas, modo_append=True)
+    salvar_logs_finais(resultado_por_cidade, cidades_com_erro, makespan)
+    print(f"✅ Consolidado: {len(resultado_por_cidade)} cidades, {sum(len(v) for v in cidades_com_erro.values())} com erro")
+
+
+# =====================================================
+# Worker
+# =====================================================
+def _heartbeat(fila: FilaTarefas, tarefa_id: int, worker: str, parar: threading.Event) -> None:
+    """Renova o lease enquanto a cidade estiver sendo processada."""
+    intervalo = max(fila.visibilidade_seg / 3, 5)
+    while not parar.wait(intervalo):
+        if not fila.renovar(tarefa_id, worker):
+            return
+
+
+def trabalhar(fila: FilaTarefas, worker: str, aguardar: bool = False, stop_flag=None) -> None:
+    """Arrenda e processa cidades até a fila acabar (ou para sempre, com aguardar=True)."""
+    # 🔥 CORREÇÃO — Um arquivo de log por worker: o log rotaciona por tamanho, e
+    # processos girando o mesmo arquivo (mesma pasta output/) se atropelam
+    nome_log = re.sub(r"[^\w.-]", "_", worker)
+    logger = setup_logger("amil_bot", OUTPUT_DIR / f"amil_bot.{nome_log}.log")
+    logger.info(f"👷 Worker {worker} iniciado")
+    # 🔥 NOVO — Só órfãos de verdade (pai morto): outros workers do host ficam em paz
+    obter_monitor().recolher_orfaos(logger.info)
+
+    while not (stop_flag and stop_flag.is_set()):
+        tarefa = fila.arrendar(worker)
+        if tarefa is None:
+            if not aguardar and fila.finalizada():
+                break
+            time.sleep(10)
+            continue
+
+        uf, cidade = tarefa["uf"], tarefa["cidade"]
+        logger.info(f"🔒 {worker} arrendou {cidade}-{uf} (tentativa {tarefa['tentativas']})")
+
+        parar_heartbeat = threading.Event()
+        threading.Thread(
+            target=_heartbeat, args=(fila, tarefa["id"], worker, parar_heartbeat), daemon=True
+        ).start()
+
+        try:
+            with AmilBot(uf, pasta_base=DOCS_PDFS_DIR, logger=logger, stop_flag=stop_flag) as bot:
+                bot.processar_cidade(cidade)
+        except KeyboardInterrupt:
+            fila.liberar(tarefa["id"], worker)
+            raise
+        except Exception as e:
+            if stop_flag and stop_flag.is_set():
+                fila.liberar(tarefa["id"], worker)
+                break
+            # 🔥 NOVO — Permanente falha na hora; transitória/bloqueio volta com backoff
+            categoria = classificar_erro(e)
+            atraso = atraso_retry(categoria, tarefa["tentativas"])
+            fila.falhar(tarefa["id"], worker, f"{categoria}: {e}", atraso_seg=atraso,
+                        definitivo=categoria == PERMANENTE)
+            logger.info(f"❌ {cidade}-{uf} falhou em {worker} ({categoria}): {e}")
+            continue
+        finally:
+            parar_heartbeat.set()
+
+        resultado = next((item for item in bot.resultado_por_cidade if item["cidade"] == cidade), None)
+        if resultado is None:
+            # 🔥 CORREÇÃO — Pulada (PDF já existia): total do armazém, marcada para o consolidar
+            registro = obter_armazem().carregar(uf, cidade)
+            resultado = {"cidade": cidade, "uf": uf,
+                         "prestadores": registro["total"] if registro else None, "pulada": True}
+        pdf_path = get_pdf_path(uf, cidade, DOCS_PDFS_DIR)
+        if not fila.concluir(tarefa["id"], worker, resultado, str(pdf_path) if pdf_path.exists() else None):
+            logger.info(f"⚠️ Lease de {cidade}-{uf} expirou antes da conclusão — resultado descartado")
+
+    logger.info(f"👋 Worker {worker} finalizado")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Execução distribuída do bot Amil")
+    parser.add_argument("papel", choices=["coordenador", "worker", "consolidar"])
+    parser.add_argument("--fila", default=str(FILA_PADRAO), help="Arquivo SQLite compartilhado")
+    parser.add_argument("--id", default=socket.gethostname(), help="Identificador do worker")
+    parser.add_argument("--visibilidade", type=float, default=900, help="Lease em segundos")
+    parser.add_argument("--max-tentativas", type=int, default=3)
+    parser.add_argument("--reiniciar", action="store_true", help="Coordenador: limpa a fila antes")
+    parser.add_argument("--aguardar", action="store_true", help="Worker: espera novas tarefas")
+    args = parser.parse_args()
+
+    fila = FilaTarefas(args.fila, visibilidade_seg=args.visibilidade, max_tentativas=args.max_tentativas)
+    if args.papel == "coordenador":
+        coordenar(fila, reiniciar=args.reiniciar)
+    elif args.papel == "worker":
+        trabalhar(fila, args.id, aguardar=args.aguardar)
+    else:
+        consolidar(fila)
+
+
+if __name__ == "__main__":
+    main()
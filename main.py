@@ -1,10 +1,27 @@
 import json
+import time
+from contextlib import ExitStack
 from pathlib import Path
 from datetime import datetime  # 🔥 CORREÇÃO — Importar datetime no topo
-from utils.logger import setup_logger
-from utils.file_manager import OUTPUT_DIR, DOCS_PDFS_DIR
-from utils.delays import pausa_estrategica
-from scraper.amil_scraper import AmilBot
+from utils.logger import encaminhar_painel, iniciar_custos_log, resumo_custos_log, setup_logger
+from utils.file_manager import OUTPUT_DIR, DOCS_PDFS_DIR, get_pdf_path
+from utils.delays import (
+    dormir,
+    pausa_estrategica,
+    iniciar_contabilidade,
+    resumo_esperas,
+    resumo_esperas_por_cidade,
+)
+from utils.metricas import medir, ETAPA
+from scraper.amil_scraper import AmilBot, ATUALIZAR_EXISTENTES
+from scraper.agendador import AgendadorTentativas
+from scraper.recursos import obter_monitor
+from scraper.cache_opcoes import obter_cache
+from scraper.localizadores import obter_registro
+from utils.armazem_resultados import obter_armazem
+from utils.historico import comparar_makespan, obter_historico, simular_makespan
+from utils.previsao import obter_previsao
+from utils.perfilador import obter_perfilador
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 
@@ -165,14 +182,18 @@ def gerar_planilha_simples(resultado_por_cidade: list[dict], modo_append: bool =
 # =====================================================
 # 🔹 Funções para salvar/carregar progresso
 # =====================================================
-def salvar_progresso(uf: str, cidade: str) -> None:
-    """Salva o progresso atual (última cidade processada)."""
+def salvar_progresso(uf: str, cidade: str, pendentes: list[tuple[str, str]] | None = None) -> None:
+    """
+    Salva o progresso atual (última cidade processada) e as cidades antes
+    dela que ainda aguardam retry (não podem ser puladas ao continuar).
+    """
     progresso_path = OUTPUT_DIR / "progresso.json"
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     
     progresso = {
         "uf": uf,
         "cidade": cidade,
+        "pendentes": [list(t) for t in pendentes or []],
         "timestamp": datetime.now().isoformat()
     }
     
@@ -198,19 +219,43 @@ def limpar_progresso() -> None:
     if progresso_path.exists():
         progresso_path.unlink()
 
+def cidades_a_processar(tarefas: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """
+    Cidades que o bot vai de fato raspar: com AMIL_ATUALIZAR_EXISTENTES=0, as
+    que já têm PDF são puladas em segundos e ficam fora das previsões.
+    """
+    if ATUALIZAR_EXISTENTES:
+        return list(tarefas)
+    return [(uf, cidade) for uf, cidade in tarefas if not get_pdf_path(uf, cidade, DOCS_PDFS_DIR).exists()]
+
 # =====================================================
 # Carregar arquivo JSON das cidades
 # =====================================================
-def carregar_mapa_estados() -> dict:
+def carregar_mapa_estados(sincronizar_site: bool = True) -> dict:
     caminho_json = SCRIPT_DIR / "estados_cidades_amil.json"
     with open(caminho_json, encoding="utf-8") as f:
-        return json.load(f)
+        mapa = json.load(f)
+
+    # 🔥 NOVO — Ajustar pelo que o site mostrou nos dropdowns (cache de opções).
+    # Novos entram na fila; removidos só vão para o relatório (uma leitura ruim do
+    # dropdown — placeholder, lista de erro — derrubaria a UF inteira até o TTL vencer)
+    if sincronizar_site:
+        diferencas = obter_cache().diferencas(mapa)
+        for uf, diff in diferencas.items():
+            mapa[uf] = mapa[uf] + diff["novos"]
+            print(f"🗺️ {uf}: {len(diff['novos'])} município(s) novo(s), {len(diff['removidos'])} "
+                  f"fora do site (mantidos; ver municipios_diferencas.json)")
+        if diferencas:
+            OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+            with open(OUTPUT_DIR / "municipios_diferencas.json", "w", encoding="utf-8") as f:
+                json.dump(diferencas, f, ensure_ascii=False, indent=2)
+    return mapa
 
 
 # =====================================================
 # Logs finais (salva em output/ apenas para logs)
 # =====================================================
-def salvar_logs_finais(resultado_por_cidade, cidades_com_erro) -> None:
+def salvar_logs_finais(resultado_por_cidade, cidades_com_erro, makespan: dict | None = None) -> None:
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
     caminho_json_erros = OUTPUT_DIR / "cidades_com_erro.json"
@@ -227,10 +272,87 @@ def salvar_logs_finais(resultado_por_cidade, cidades_com_erro) -> None:
         log.write(f"❌ Cidades com erro: {total_erro}\n\n")
         log.write("📍 Prestadores por cidade:\n")
         for item in sorted(resultado_por_cidade, key=lambda x: (x["uf"], x["cidade"])):
+            duracao = f" ({item['duracao']:.1f}s)" if item.get("duracao") is not None else ""
+            if item.get("pulada"):
+                total = f"{item['prestadores']} prestadores, " if item.get("prestadores") is not None else ""
+                log.write(f"- {item['cidade']}/{item['uf']}: {total}PDF já existente (pulada)\n")
+                continue
+            log.write(
+                f"- {item['cidade']}/{item['uf']}: {item['prestadores']} prestadores{duracao}\n"
+            )
+
+        # 🔥 NOVO — Tempo médio por etapa (histogramas de latência)
+        resumo_etapas = ETAPA.resumo()
+        if resumo_etapas:
+            log.write("\n⏱️ Tempo por etapa (média / total):\n")
+            for serie in sorted(resumo_etapas, key=lambda x: -x["soma"]):
+                labels = ", ".join(f"{k}={v}" for k, v in sorted(serie["labels"].items()))
+                log.write(f"- {labels}: {serie['media']:.2f}s / {serie['soma']:.1f}s ({serie['total']}x)\n")
+
+        # 🔥 NOVO — Quanto do tempo foi sleep deliberado vs trabalho
+        esperas = resumo_esperas()
+        log.write("\n😴 Esperas deliberadas vs trabalho:\n")
+        log.write(f"- Tempo total da execução: {esperas['tempo_total_seg']:.1f}s\n")
+        log.write(f"- Ativo: {esperas['ativo_seg']:.1f}s ({esperas['proporcao_ativo']:.0%})\n")
+        log.write(f"- Dormindo: {esperas['dormindo_seg']:.1f}s ({esperas['proporcao_dormindo']:.0%})\n")
+        for motivo, segundos in esperas["por_motivo"].items():
+            log.write(f"  - {motivo}: {segundos:.1f}s\n")
+        log.write("\n📍 Esperas por cidade (dormindo / ativo):\n")
+        for item in sorted(resumo_esperas_por_cidade(), key=lambda x: (x["uf"], x["cidade"])):
             log.write(
-                f"- {item['cidade']}/{item['uf']}: {item['prestadores']} prestadores\n"
+                f"- {item['cidade']}/{item['uf']}: {item['dormindo_seg']:.1f}s / {item['ativo_seg']:.1f}s\n"
             )
 
+        # 🔥 NOVO — Acertos/falhas de cada localizador (seletores do site)
+        log.write("\n🎯 Localizadores (acertos / falhas):\n")
+        obter_registro().logar_resumo(lambda linha: log.write(f"- {linha}\n"))
+
+        # 🔥 NOVO — Cidades cuja lista de prestadores mudou nesta execução
+        mudancas = obter_armazem().salvar_relatorio(OUTPUT_DIR / "relatorio_mudancas.json")
+        log.write("\n🔀 Mudanças nas listas de prestadores:\n")
+        log.write(
+            f"- Novas: {mudancas['resumo']['novo']} | Alteradas: {mudancas['resumo']['alterado']} | "
+            f"Inalteradas: {mudancas['resumo']['inalterado']}\n"
+        )
+        for item in mudancas["cidades"]:
+            if item["status"] == "alterado":
+                log.write(
+                    f"- {item['cidade']}/{item['uf']}: +{len(item['adicionados'])} / "
+                    f"-{len(item['removidos'])} ({item['total_antes']} → {item['total_depois']})\n"
+                )
+
+        # 🔥 NOVO — Duração prevista pelo histórico (utils/historico.py) vs real
+        if makespan:
+            log.write("\n📐 Makespan (previsto / real):\n")
+            log.write(f"- {makespan['previsto_seg']:.0f}s / {makespan['real_seg']:.0f}s")
+            if makespan["erro_relativo"] is not None:
+                log.write(f" ({makespan['erro_relativo']:+.0%})")
+            log.write("\n")
+
+        # 🔥 NOVO — Quanto o log custou às cidades (enfileirar) e à thread de escrita
+        custos_log = resumo_custos_log()
+        por_cidade = [c for c in custos_log["cidades"] if c["cidade"]]
+        log.write("\n🧾 Custo do log (na thread da cidade / escrita em segundo plano):\n")
+        log.write(
+            f"- Total: {custos_log['registros']} registros, {custos_log['chamador_ms']:.1f}ms / "
+            f"{custos_log['escrita_ms']:.1f}ms\n"
+        )
+        if por_cidade:
+            media = sum(c["chamador_ms"] for c in por_cidade) / len(por_cidade)
+            log.write(f"- Média por cidade na thread da cidade: {media:.2f}ms\n")
+            for item in sorted(por_cidade, key=lambda x: -x["chamador_ms"])[:5]:
+                log.write(
+                    f"  - {item['cidade']}/{item['uf']}: {item['registros']} registros, "
+                    f"{item['chamador_ms']:.2f}ms / {item['escrita_ms']:.2f}ms\n"
+                )
+
+    caminho_esperas = OUTPUT_DIR / "esperas.json"
+    with open(caminho_esperas, "w", encoding="utf-8") as f:
+        json.dump(
+            {"execucao": resumo_esperas(), "cidades": resumo_esperas_por_cidade()},
+            f, ensure_ascii=False, indent=2,
+        )
+
 
 # =====================================================
 # MAIN
@@ -249,146 +371,195 @@ def executar_bot_com_callbacks(callback_progresso=None, callback_log=None, stop_
         stop_flag: threading.Event para parar execução
         continuar_progresso: Se True, continua de onde parou. Se False, começa do zero.
     """
-    
+    # 🔥 NOVO — callback_log é alimentado pela thread de escrita do log (utils/logger.py)
+    with encaminhar_painel(callback_log):
+        _executar_bot(callback_progresso, stop_flag, continuar_progresso)
+
+
+def _executar_bot(callback_progresso, stop_flag, continuar_progresso: bool) -> None:
     logger = setup_logger("amil_bot", OUTPUT_DIR / "amil_bot.log")
     mapa = carregar_mapa_estados()
+    iniciar_contabilidade()
+    iniciar_custos_log()
+    obter_armazem().iniciar_relatorio()
 
     resultado_por_cidade_global = []
-    cidades_com_erro_global = {}
     contador_cidades = 0
-    
-    # 🔥 NOVO — Carregar progresso anterior
-    progresso_anterior = None
-    pular_ate_progresso = False
-    
+
+    def _log(msg: str, **campos) -> None:
+        logger.info(msg, extra={"painel": True, **campos})
+
+    # 🔥 NOVO — Chrome/chromedriver que uma execução anterior deixou para trás
+    obter_monitor().recolher_orfaos(_log)
+
+    # Calcular total de cidades
+    total_cidades = sum(len(cidades) for cidades in mapa.values())
+    tarefas = [(uf, cidade) for uf, cidades in mapa.items() for cidade in cidades]
+
+    _log(f"Total de cidades a processar: {total_cidades}")
+
+    # 🔥 NOVO — Carregar progresso anterior: tudo até a última cidade salva (inclusive) já foi feito
     if continuar_progresso:
         progresso_anterior = carregar_progresso()
         if progresso_anterior:
-            if callback_log:
-                callback_log(f"📌 Continuando de: {progresso_anterior['cidade']}-{progresso_anterior['uf']}")
-            pular_ate_progresso = True
-    
-    # Calcular total de cidades
-    total_cidades = sum(len(cidades) for cidades in mapa.values())
-    
-    if callback_log:
-        callback_log(f"Total de cidades a processar: {total_cidades}")
-    
+            marco = (progresso_anterior["uf"], progresso_anterior["cidade"])
+            if marco in tarefas:
+                contador_cidades = tarefas.index(marco) + 1
+                # 🔥 NOVO — Cidades adiadas para retry antes do marco voltam para a fila
+                feitas = set(tarefas[:contador_cidades])
+                pendentes_anteriores = [
+                    t for t in map(tuple, progresso_anterior.get("pendentes", [])) if t in feitas
+                ]
+                tarefas = pendentes_anteriores + tarefas[contador_cidades:]
+                contador_cidades -= len(pendentes_anteriores)
+                _log(f"📌 Continuando após {marco[1]}-{marco[0]} ({contador_cidades} cidades já processadas)")
+                if pendentes_anteriores:
+                    _log(f"🔁 {len(pendentes_anteriores)} cidade(s) aguardando retry da execução anterior voltam para a fila")
+                if callback_progresso:
+                    callback_progresso(marco[0], marco[1], total_cidades, contador_cidades)
+
+    # 🔥 NOVO — Falhas voltam para o fim da fila (com backoff) em vez de travar a execução
+    agendador = AgendadorTentativas(tarefas)
+    # Marco = última cidade iniciada; adiadas = já passaram do marco mas aguardam retry
+    # (vão junto no progresso.json para não serem puladas ao continuar)
+    marco_atual = None
+    adiadas: dict[tuple[str, str], None] = {}
+
+    def _salvar_marco() -> None:
+        if marco_atual is not None:
+            salvar_progresso(*marco_atual, pendentes=list(adiadas))
+
+    # 🔥 NOVO — Um navegador só: a ordem do arquivo fica (é ela que o progresso retoma),
+    # mas o histórico ainda prevê quanto a execução vai levar (sem as cidades com PDF)
+    a_processar = cidades_a_processar(tarefas)
+    estimativas = obter_historico().estimativas(a_processar)
+    makespan_previsto = simular_makespan([estimativas[t] for t in a_processar], 1)
+    # 🔥 NOVO — ETA ao vivo (/api/status): cada cidade pesa a duração estimada; as
+    # com PDF passam pelo bot em segundos e ficam fora (senão inflariam a vazão)
+    previsao = obter_previsao()
+    previsao.iniciar(a_processar, estimativas, 1)
+    _log(f"📐 Duração prevista pelo histórico: {makespan_previsto / 3600:.1f}h")
+    inicio_execucao = time.monotonic()
+
     # Flag para controlar se já criou o cabeçalho da planilha
     primeira_vez = True
 
     try:
-        for uf, cidades in mapa.items():
-            if stop_flag and stop_flag.is_set():
-                if callback_log:
-                    callback_log("⛔ Execução interrompida pelo usuário")
-                break
-                
-            if callback_log:
-                callback_log(f"Iniciando UF {uf} ({len(cidades)} cidades)")
-            
-            logger.info(f"====== Iniciando UF {uf} ({len(cidades)} cidades) ======")
-            
-            with AmilBot(uf, pasta_base=DOCS_PDFS_DIR, logger=logger, stop_flag=stop_flag) as bot:
-                for cidade in cidades:
+        with ExitStack() as pilha:
+            # 🔥 NOVO — Perfil de CPU da execução inteira (AMIL_PERFIL=execucao ou POST /api/perfil)
+            pilha.enter_context(obter_perfilador().execucao(log=_log))
+            bots: dict[str, AmilBot] = {}
+            while True:
+                if stop_flag and stop_flag.is_set():
+                    _log("⛔ Execução interrompida pelo usuário")
+                    break
+
+                espera = agendador.espera()
+                if espera is None:
+                    break
+                if espera > 0:
+                    _log(f"⏳ Só restam cidades adiadas — próximo retry em {espera:.0f}s")
+                    dormir(espera, "retry_backoff", stop_flag, escalar=False)
+                    continue
+
+                uf, cidade, tentativa = agendador.proxima()
+                if uf not in bots:
+                    _log(f"====== Iniciando UF {uf} ({len(mapa[uf])} cidades) ======")
+                    bots[uf] = pilha.enter_context(
+                        AmilBot(uf, pasta_base=DOCS_PDFS_DIR, logger=logger, stop_flag=stop_flag)
+                    )
+                bot = bots[uf]
+                if tentativa > 1:
+                    _log(f"🔁 {cidade}-{uf}: tentativa {tentativa}/{agendador.max_tentativas}")
+
+                # Callback de progresso
+                if callback_progresso:
+                    callback_progresso(uf, cidade, total_cidades, contador_cidades)
+
+                # 🔥 NOVO — Salvar progresso ANTES de processar (para caso trave);
+                # retries ficam fora para o marco não voltar para trás
+                if tentativa == 1:
+                    marco_atual = (uf, cidade)
+                    _salvar_marco()
+
+                # Prazo por cidade/fase: scraper/watchdog.py (mata o Chrome travado)
+                try:
+                    bot.processar_cidade(cidade)
+                except Exception as e:
+                    # 🔥 NOVO — Parada pelo usuário: encerra o laço e ainda salva os logs
                     if stop_flag and stop_flag.is_set():
-                        if callback_log:
-                            callback_log("⛔ Execução interrompida pelo usuário")
+                        _log("⛔ Execução interrompida pelo usuário")
                         break
-                    
-                    # 🔥 NOVO — Pular cidades até chegar no progresso anterior
-                    if pular_ate_progresso:
-                        if progresso_anterior:
-                            if uf == progresso_anterior["uf"] and cidade == progresso_anterior["cidade"]:
-                                if callback_log:
-                                    callback_log(f"✅ Continuando após {cidade}-{uf} (pulando cidade já processada)")
-                                pular_ate_progresso = False
-                                # 🔥 CORREÇÃO — Atualizar contador e callback ao pular
-                                contador_cidades += 1
-                                if callback_progresso:
-                                    callback_progresso(uf, cidade, total_cidades, contador_cidades)
-                                # Pular a cidade do progresso e começar na próxima
-                                continue
-                            else:
-                                # 🔥 CORREÇÃO — Atualizar contador e callback ao pular cidades anteriores
-                                contador_cidades += 1
-                                if callback_progresso:
-                                    callback_progresso(uf, cidade, total_cidades, contador_cidades)
-                                if callback_log:
-                                    callback_log(f"⏭️  Pulando {cidade}-{uf} (já processada)")
-                                # Ainda não chegou no progresso, pular
-                                continue
-                        else:
-                            pular_ate_progresso = False
-                    
-                    # Callback de progresso
-                    if callback_progresso:
-                        callback_progresso(uf, cidade, total_cidades, contador_cidades)
-                    
-                    # 🔥 NOVO — Salvar progresso ANTES de processar (para caso trave)
-                    salvar_progresso(uf, cidade)
-                    
-                    # 🔥 NOVO — Timeout máximo para processar cidade (5 minutos)
-                    import time as time_module
-                    inicio_processamento = time_module.time()
-                    timeout_maximo_cidade = 300  # 5 minutos
-                    
-                    try:
-                        bot.processar_cidade(cidade)
-                    except Exception as e:
-                        # Verificar se foi timeout
-                        if time_module.time() - inicio_processamento > timeout_maximo_cidade:
-                            if callback_log:
-                                callback_log(f"⏱️ Timeout ao processar {cidade}-{uf} (mais de 5 minutos)")
-                        raise
-
-                    # coleta resultados
-                    resultado_por_cidade_global.extend(bot.resultado_por_cidade)
-                    for k, v in bot.cidades_com_erro.items():
-                        cidades_com_erro_global.setdefault(k, []).extend(v)
-
-                    # salvar planilha incrementalmente após cada cidade
-                    if bot.resultado_por_cidade:
+
+                    decisao = agendador.falhar(uf, cidade, e)
+                    previsao.falhar(uf, cidade, definitiva=not decisao["reagendada"])
+                    if decisao["reagendada"]:
+                        adiadas[(uf, cidade)] = None
+                    else:
+                        adiadas.pop((uf, cidade), None)
+                    _salvar_marco()
+                    if decisao["reagendada"]:
+                        _log(
+                            f"🔁 {cidade}-{uf} volta para o fim da fila em {decisao['atraso']:.0f}s "
+                            f"({decisao['categoria']}, tentativa {decisao['tentativa']}/{agendador.max_tentativas})"
+                        )
+                    else:
+                        _log(f"❌ Falha definitiva em {cidade}-{uf} ({decisao['categoria']}): {e}")
+                        contador_cidades += 1
+                    bot.resultado_por_cidade.clear()
+                    continue
+
+                agendador.concluir(uf, cidade)
+                previsao.concluir(uf, cidade)
+
+                # coleta resultados
+                resultado_por_cidade_global.extend(bot.resultado_por_cidade)
+
+                # salvar planilha incrementalmente após cada cidade
+                if bot.resultado_por_cidade:
+                    with medir("planilha", uf=uf):
                         gerar_planilha_simples(
-                            bot.resultado_por_cidade, 
+                            bot.resultado_por_cidade,
                             modo_append=not primeira_vez
                         )
-                        primeira_vez = False
-                        
-                        if callback_log:
-                            for item in bot.resultado_por_cidade:
-                                if item.get("prestadores", 0) > 0:
-                                    callback_log(f"✅ {item['cidade']}-{item['uf']}: {item['prestadores']} prestadores encontrados")
-                                else:
-                                    callback_log(f"⚠️ {item['cidade']}-{item['uf']}: PDF vazio gerado (sem especialidade)")
-                    
-                    # 🔥 CORREÇÃO — Salvar progresso sempre, mesmo sem resultados
-                    salvar_progresso(uf, cidade)
-
-                    # limpa buffers do bot
-                    bot.resultado_por_cidade.clear()
-                    bot.cidades_com_erro.clear()
+                    primeira_vez = False
 
-                    contador_cidades += 1
-                    pausa_estrategica(contador_cidades)
+                    for item in bot.resultado_por_cidade:
+                        if item.get("prestadores", 0) > 0:
+                            _log(f"✅ {item['cidade']}-{item['uf']}: {item['prestadores']} prestadores encontrados")
+                        else:
+                            _log(f"⚠️ {item['cidade']}-{item['uf']}: PDF vazio gerado (sem especialidade)")
+
+                # 🔥 CORREÇÃO — Salvar progresso sempre, mesmo sem resultados
+                adiadas.pop((uf, cidade), None)
+                _salvar_marco()
+
+                # limpa buffers do bot
+                bot.resultado_por_cidade.clear()
+
+                contador_cidades += 1
+                pausa_estrategica(contador_cidades, stop_flag=stop_flag)
 
     except KeyboardInterrupt:
-        logger.warning("⛔ Execução interrompida manualmente. Gerando logs parciais...")
-        if callback_log:
-            callback_log("⛔ Execução interrompida manualmente")
+        logger.warning("⛔ Execução interrompida manualmente. Gerando logs parciais...", extra={"painel": True})
+
+    cidades_com_erro_global = agendador.cidades_com_erro()
+    resumo_retries = agendador.resumo()
+    if resumo_retries["retries"] or resumo_retries["falhas"]:
+        _log(f"🔁 Retries: {resumo_retries['retries']} | falhas definitivas por tipo: {resumo_retries['falhas']}")
+
+    makespan = comparar_makespan(makespan_previsto, time.monotonic() - inicio_execucao)
+    _log(f"📐 Makespan previsto {makespan['previsto_seg']:.0f}s | real {makespan['real_seg']:.0f}s")
 
     # salva logs normais
-    salvar_logs_finais(resultado_por_cidade_global, cidades_com_erro_global)
+    salvar_logs_finais(resultado_por_cidade_global, cidades_com_erro_global, makespan)
 
-    logger.info("✅ Execução finalizada.")
-    if callback_log:
-        callback_log("✅ Execução finalizada")
+    _log("✅ Execução finalizada")
     
     # 🔥 NOVO — Limpar progresso quando terminar tudo
     if not stop_flag or not stop_flag.is_set():
         limpar_progresso()
-        if callback_log:
-            callback_log("📌 Progresso limpo - todas as cidades foram processadas")
+        _log("📌 Progresso limpo - todas as cidades foram processadas")
 
 
 if __name__ == "__main__":
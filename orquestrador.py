@@ -0,0 +1,285 @@
+"""
+Orquestrador asyncio do pipeline (alternativa ao laço sequencial de main.py).
+
+Cada navegador é um trabalhador que puxa cidades do agendador (falhas voltam
+para o fim da fila com backoff); semáforos limitam quantos navegadores,
+renderizações de PDF e escritas em disco acontecem ao mesmo tempo. As chamadas bloqueantes
+(Selenium em AmilBot.processar_cidade, pdfkit, openpyxl) rodam em executores
+separados, e as pausas entre cidades são asyncio.sleep — não prendem threads.
+
+As cidades saem da mais longa para a mais curta, pelo histórico de execuções
+anteriores (utils/historico.py).
+
+Os callbacks são os mesmos de executar_bot_com_callbacks.
+
+Uso:  python orquestrador.py --navegadores 3
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from main import (
+    carregar_mapa_estados,
+    gerar_planilha_simples,
+    salvar_logs_finais,
+)
+from scraper.amil_scraper import AmilBot, ATUALIZAR_EXISTENTES, atualizar_referencia_cidade
+from scraper.agendador import AgendadorTentativas
+from scraper.recursos import obter_monitor
+from utils.delays import (
+    iniciar_contabilidade,
+    calcular_pausa_estrategica,
+    dormir_async,
+)
+from utils.file_manager import OUTPUT_DIR, DOCS_PDFS_DIR, get_pdf_path
+from utils.logger import encaminhar_painel, iniciar_custos_log, setup_logger
+from utils.armazem_resultados import obter_armazem
+from utils.historico import comparar_makespan, obter_historico, simular_makespan
+from utils.previsao import obter_previsao
+from utils.metricas import medir
+from utils.perfilador import obter_perfilador
+
+
+class _Orquestrador:
+    def __init__(self, callback_progresso, stop_flag,
+                 max_navegadores: int, max_renderizadores: int, max_escritores: int) -> None:
+        self.callback_progresso = callback_progresso
+        self.stop_flag = stop_flag
+        self.logger = setup_logger("amil_bot", OUTPUT_DIR / "amil_bot.log")
+
+        self.max_navegadores = max_navegadores
+        self.pool_navegadores = ThreadPoolExecutor(max_navegadores, thread_name_prefix="navegador")
+        self.pool_render = ThreadPoolExecutor(max_renderizadores, thread_name_prefix="render")
+        self.pool_disco = ThreadPoolExecutor(max_escritores, thread_name_prefix="disco")
+        self.sem_navegadores = asyncio.Semaphore(max_navegadores)
+        self.sem_render = asyncio.Semaphore(max_renderizadores)
+        self.sem_disco = asyncio.Semaphore(max_escritores)
+
+        # Pausa estratégica global: enquanto "liberado" estiver limpo, nenhuma cidade nova começa
+        self.liberado = asyncio.Event()
+        self.liberado.set()
+
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.agendador: AgendadorTentativas | None = None
+        self.total = 0
+        self.concluidas = 0
+        self.resultado_por_cidade = []
+        self.cidades_com_erro = {}
+
+    # ---------------------- utils ----------------------
+
+    def _log(self, msg: str) -> None:
+        # 🔥 NOVO — O painel (callback_log) recebe da thread de escrita do log
+        self.logger.info(msg, extra={"painel": True})
+
+    def _parado(self) -> bool:
+        return bool(self.stop_flag and self.stop_flag.is_set())
+
+    # ---------------------- render ----------------------
+
+    async def _render(self, func, *args):
+        async with self.sem_render:
+            return await self.loop.run_in_executor(self.pool_render, partial(func, *args))
+
+    def _executar_render(self, func, *args):
+        """Chamado da thread do navegador: agenda o PDF no pool de renderizadores e aguarda."""
+        return asyncio.run_coroutine_threadsafe(self._render(func, *args), self.loop).result()
+
+    # ---------------------- cidade ----------------------
+
+    def _processar_bloqueante(self, uf: str, cidade: str) -> AmilBot:
+        bot = AmilBot(
+            uf,
+            pasta_base=DOCS_PDFS_DIR,
+            logger=self.logger,
+            stop_flag=self.stop_flag,
+            executar_render=self._executar_render,
+        )
+        with bot:
+            bot.processar_cidade(cidade)
+        return bot
+
+    async def _cidade(self, uf: str, cidade: str, tentativa: int) -> None:
+        async with self.sem_navegadores:
+            if self.callback_progresso:
+                self.callback_progresso(uf, cidade, self.total, self.concluidas)
+            if tentativa > 1:
+                self._log(f"🔁 {cidade}-{uf}: tentativa {tentativa}/{self.agendador.max_tentativas}")
+            try:
+                bot = await self.loop.run_in_executor(
+                    self.pool_navegadores, self._processar_bloqueante, uf, cidade
+                )
+            except Exception as e:
+                decisao = self.agendador.falhar(uf, cidade, e)
+                if self._parado():
+                    return
+                obter_previsao().falhar(uf, cidade, definitiva=not decisao["reagendada"])
+                if decisao["reagendada"]:
+                    self._log(
+                        f"🔁 {cidade}-{uf} volta para o fim da fila em {decisao['atraso']:.0f}s "
+                        f"({decisao['categoria']}, tentativa {decisao['tentativa']}/{self.agendador.max_tentativas})"
+                    )
+                else:
+                    self._log(f"❌ Falha definitiva em {cidade}-{uf} ({decisao['categoria']}): {e}")
+                    self.concluidas += 1
+                return
+
+        self.agendador.concluir(uf, cidade)
+        obter_previsao().concluir(uf, cidade)
+        self.resultado_por_cidade.extend(bot.resultado_por_cidade)
+
+        if bot.resultado_por_cidade:
+            async with self.sem_disco:
+                with medir("planilha", uf=uf):
+                    await self.loop.run_in_executor(
+                        self.pool_disco, partial(gerar_planilha_simples, bot.resultado_por_cidade, modo_append=True)
+                    )
+            for item in bot.resultado_por_cidade:
+                if item.get("prestadores", 0) > 0:
+                    self._log(f"✅ {item['cidade']}-{item['uf']}: {item['prestadores']} prestadores encontrados")
+                else:
+                    self._log(f"⚠️ {item['cidade']}-{item['uf']}: PDF vazio gerado (sem especialidade)")
+
+        self.concluidas += 1
+        if self.callback_progresso:
+            self.callback_progresso(uf, cidade, self.total, self.concluidas)
+
+        pausa = calcular_pausa_estrategica(self.concluidas)
+        if pausa and self.liberado.is_set():
+            self.liberado.clear()
+            self._log(f"♻️ Pausa estratégica ({self.concluidas} cidades processadas): {pausa}s")
+            await dormir_async(pausa, "pausa_estrategica", self.stop_flag)
+            self.liberado.set()
+
+    # ---------------------- execução ----------------------
+
+    async def _trabalhador(self) -> None:
+        """Pega cidades do agendador até acabar (retries adiados incluídos)."""
+        while not self._parado():
+            espera = self.agendador.espera()
+            if espera is None:
+                return
+            if espera > 0:
+                # Nada pronto: cidades adiadas (backoff) ou em andamento que podem voltar
+                await asyncio.sleep(min(espera, 1.0))
+                continue
+            await self.liberado.wait()
+            if self._parado():
+                return
+            item = self.agendador.proxima()
+            if item is None:
+                continue
+            await self._cidade(*item)
+
+    async def executar(self, tarefas: list[tuple[str, str]]) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.total = len(tarefas)
+        self.agendador = AgendadorTentativas(tarefas)
+        self._log(
+            f"Total de cidades a processar: {self.total} "
+            f"({self.max_navegadores} navegadores em paralelo)"
+        )
+        try:
+            await asyncio.gather(*(self._trabalhador() for _ in range(self.max_navegadores)))
+        finally:
+            self.pool_navegadores.shutdown(wait=False, cancel_futures=True)
+            self.pool_render.shutdown(wait=False, cancel_futures=True)
+            self.pool_disco.shutdown(wait=True)
+
+        self.cidades_com_erro = self.agendador.cidades_com_erro()
+        resumo = self.agendador.resumo()
+        if resumo["retries"] or resumo["falhas"]:
+            self._log(f"🔁 Retries: {resumo['retries']} | falhas definitivas por tipo: {resumo['falhas']}")
+        if self._parado():
+            self._log("⛔ Execução interrompida pelo usuário")
+
+
+def executar_bot_async_com_callbacks(callback_progresso=None, callback_log=None, stop_flag=None,
+                                     continuar_progresso: bool = True,
+                                     max_navegadores: int = 2,
+                                     max_renderizadores: int = 2,
+                                     max_escritores: int = 1) -> None:
+    """
+    Mesma interface de executar_bot_com_callbacks, com cidades em paralelo.
+
+    Cidades com PDF já gerado são puladas antes de ocupar um navegador; com
+    continuar_progresso=False elas também são puladas (o progresso por "última
+    cidade" não faz sentido com execução fora de ordem).
+    """
+    with encaminhar_painel(callback_log):
+        _executar(callback_progresso, stop_flag, max_navegadores, max_renderizadores, max_escritores)
+
+
+def _executar(callback_progresso, stop_flag, max_navegadores: int,
+              max_renderizadores: int, max_escritores: int) -> None:
+    mapa = carregar_mapa_estados()
+    iniciar_contabilidade()
+    iniciar_custos_log()
+    obter_armazem().iniciar_relatorio()
+
+    tarefas = []
+    puladas = 0
+    for uf, cidades in mapa.items():
+        for cidade in cidades:
+            # 🔥 NOVO — Com AMIL_ATUALIZAR_EXISTENTES=1 nada é pulado (re-render só se a lista mudou)
+            if not ATUALIZAR_EXISTENTES and get_pdf_path(uf, cidade, DOCS_PDFS_DIR).exists():
+                puladas += 1
+                try:
+                    atualizar_referencia_cidade(uf, cidade, DOCS_PDFS_DIR)
+                except Exception:
+                    pass
+                continue
+            tarefas.append((uf, cidade))
+
+    orquestrador = _Orquestrador(
+        callback_progresso, stop_flag,
+        max_navegadores, max_renderizadores, max_escritores,
+    )
+    # 🔥 NOVO — Chrome/chromedriver que uma execução anterior deixou para trás
+    obter_monitor().recolher_orfaos(orquestrador._log)
+    if puladas:
+        orquestrador._log(f"⏭️  {puladas} cidades com PDF já existente foram puladas")
+
+    # 🔥 NOVO — Mais longas primeiro (LPT): a capital não fica sozinha no fim da execução
+    ordem_arquivo = tarefas
+    tarefas, estimativas = obter_historico().ordenar_lpt(tarefas)
+    makespan_previsto = simular_makespan([estimativas[t] for t in tarefas], max_navegadores)
+    makespan_arquivo = simular_makespan([estimativas[t] for t in ordem_arquivo], max_navegadores)
+    # 🔥 NOVO — ETA ao vivo (/api/status), na ordem LPT
+    obter_previsao().iniciar(tarefas, estimativas, max_navegadores)
+    orquestrador._log(
+        f"📐 Duração prevista: {makespan_previsto / 3600:.1f}h em ordem LPT "
+        f"(na ordem do arquivo seria {makespan_arquivo / 3600:.1f}h)"
+    )
+
+    inicio = time.monotonic()
+    try:
+        # 🔥 NOVO — Amostragem pega as threads dos navegadores; cProfile só o laço asyncio
+        with obter_perfilador().execucao(todas_threads=True, log=orquestrador._log):
+            asyncio.run(orquestrador.executar(tarefas))
+    except KeyboardInterrupt:
+        orquestrador._log("⛔ Execução interrompida manualmente")
+
+    makespan = comparar_makespan(makespan_previsto, time.monotonic() - inicio)
+    orquestrador._log(f"📐 Makespan previsto {makespan['previsto_seg']:.0f}s | real {makespan['real_seg']:.0f}s")
+    salvar_logs_finais(orquestrador.resultado_por_cidade, orquestrador.cidades_com_erro, makespan)
+    orquestrador._log("✅ Execução finalizada")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bot Amil com cidades em paralelo (asyncio)")
+    parser.add_argument("--navegadores", type=int, default=2)
+    parser.add_argument("--renderizadores", type=int, default=2)
+    parser.add_argument("--escritores", type=int, default=1)
+    args = parser.parse_args()
+    executar_bot_async_com_callbacks(
+        max_navegadores=args.navegadores,
+        max_renderizadores=args.renderizadores,
+        max_escritores=args.escritores,
+    )
+
+
+if __name__ == "__main__":
+    main()
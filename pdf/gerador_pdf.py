@@ -1,13 +1,24 @@
+import hashlib
+import json
 import os
+import re
 import shutil
+import subprocess
+import sys
+import threading
+from functools import lru_cache
+from html import escape
 from pathlib import Path
 import pdfkit
+import fitz  # PyMuPDF
 from datetime import datetime
 import locale
 
 from utils.file_manager import (
     SCRIPT_DIR,
+    OUTPUT_DIR,
     REDE_COMPLETA_DIR,
+    DOCS_PDFS_DIR,
     get_estado_dir,
     get_pdf_path,
 )
@@ -34,11 +45,148 @@ WKHTMLTOPDF_PATH = os.getenv(
 PDFKIT_CONFIG = pdfkit.configuration(wkhtmltopdf=WKHTMLTOPDF_PATH)
 TEMPLATE_DIR = Path(__file__).parent / "templates"
 
+# 🔥 NOVO — Prazo do wkhtmltopdf (travado em página/recurso, ele nunca retorna)
+PRAZO_RENDER_SEG = float(os.getenv("AMIL_PRAZO_RENDER_SEG", "120"))
+_OPCOES_PDF = {"enable-local-file-access": ""}
 
-def _carregar_template(nome_arquivo: str) -> str:
+
+def _renderizar(html: str, destino: Path | None = None) -> bytes | None:
+    """
+    Mesmo comando do pdfkit.from_string, mas com timeout: estourou, o
+    processo é morto e sobe TimeoutError (o agendador trata como
+    tempo_esgotado). Sem destino, devolve os bytes do PDF.
+    """
+    renderizador = pdfkit.PDFKit(html, "string", options=dict(_OPCOES_PDF), configuration=PDFKIT_CONFIG)
+    args = renderizador.command(str(destino) if destino else None)
+    extras = {}
+    if sys.platform == "win32":
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        startupinfo.wShowWindow = subprocess.SW_HIDE
+        extras["startupinfo"] = startupinfo
+    try:
+        resultado = subprocess.run(args, input=html.encode("utf-8"), capture_output=True,
+                                   timeout=PRAZO_RENDER_SEG, env=renderizador.environ, **extras)
+    except subprocess.TimeoutExpired:
+        raise TimeoutError(f"wkhtmltopdf excedeu {PRAZO_RENDER_SEG:.0f}s")
+
+    stderr = (resultado.stderr or resultado.stdout or b"").decode("utf-8", errors="replace")
+    renderizador.handle_error(resultado.returncode, stderr)
+    if destino is None:
+        return resultado.stdout
+    if not Path(destino).exists() or Path(destino).stat().st_size == 0:
+        raise IOError(f"wkhtmltopdf não gerou {destino}\n{stderr}")
+    return None
+
+
+def referencia_atual() -> str:
+    """Mês/ano do cabeçalho dos PDFs (ex.: "Outubro / 2026")."""
+    return datetime.now().strftime("%B / %Y").capitalize()
+
+
+# ---------------------------------------------------------------------
+#    TEMPLATES COMPILADOS (lidos e quebrados uma vez por processo)
+# ---------------------------------------------------------------------
+_RE_MARCADOR = re.compile(r"\{\{(\w+)\}\}|<!--(\w+)-->")
+
+_SEP = "\x00"  # separador dos textos no escape em lote (não aparece no texto do site)
+_ESPECIAIS_HTML = "&<>\"'"
+
+
+class TemplateCompilado:
+    """
+    Template quebrado em literais + marcadores ({{NOME}} ou <!--NOME-->).
+    O render é um único join, em vez de um str.replace por marcador sobre o documento todo.
+    """
+
+    def __init__(self, texto: str) -> None:
+        self.literais: list[str] = []
+        self.marcadores: list[str] = []
+        inicio = 0
+        for m in _RE_MARCADOR.finditer(texto):
+            self.literais.append(texto[inicio:m.start()])
+            self.marcadores.append(m.group(1) or m.group(2))
+            inicio = m.end()
+        self.final = texto[inicio:]
+
+    def renderizar(self, valores: dict[str, str]) -> str:
+        partes = []
+        for literal, marcador in zip(self.literais, self.marcadores):
+            partes.append(literal)
+            partes.append(valores[marcador])
+        partes.append(self.final)
+        return "".join(partes)
+
+
+@lru_cache(maxsize=None)
+def _template(nome_arquivo: str) -> TemplateCompilado:
     caminho = TEMPLATE_DIR / nome_arquivo
     with open(caminho, "r", encoding="utf-8") as f:
-        return f.read()
+        return TemplateCompilado(f.read())
+
+
+@lru_cache(maxsize=None)
+def _logos() -> tuple[str, str]:
+    return (
+        (SCRIPT_DIR / "amil_dental.jpg").resolve().as_uri(),
+        (SCRIPT_DIR / "logo_ativa.jpg").resolve().as_uri(),
+    )
+
+
+def _campos_escapados(prestadores: list[dict]) -> list[str]:
+    """
+    nome, bairro, endereco, telefone de todos os prestadores, escapados.
+    Um único html.escape sobre os textos concatenados (e só se houver
+    caractere especial), em vez de 4 chamadas por prestador.
+    """
+    textos = _SEP.join(
+        f"{p['nome']}{_SEP}{p['bairro']}{_SEP}{p['endereco']}{_SEP}{p['telefone']}" for p in prestadores
+    )
+    if any(c in textos for c in _ESPECIAIS_HTML):
+        textos = escape(textos)
+    campos = textos.split(_SEP)
+    if len(campos) != 4 * len(prestadores):
+        # Algum texto trouxe o próprio separador: escapa campo a campo
+        campos = [escape(str(p[c]).replace(_SEP, ""))
+                  for p in prestadores for c in ("nome", "bairro", "endereco", "telefone")]
+    return campos
+
+
+def _blocos_prestadores(prestadores: list[dict]) -> str:
+    if not prestadores:
+        return ""
+    campos = iter(_campos_escapados(prestadores))
+    return "\n".join(
+        "<div class='prestador'>"
+        f"<strong>Nome:</strong> {nome}<br>"
+        f"<strong>Bairro:</strong> {bairro}<br>"
+        f"<strong>Endereço:</strong> {endereco}<br>"
+        f"<strong>Telefone:</strong> {telefone}"
+        "</div>"
+        for nome, bairro, endereco, telefone in zip(campos, campos, campos, campos)
+    )
+
+
+def montar_html_prestadores(uf: str, cidade: str, prestadores: list[dict]) -> str:
+    """HTML completo do PDF de prestadores (tudo escapado), pronto para o wkhtmltopdf."""
+    logo_amil, logo_ativa = _logos()
+    return _template("prestadores.html").renderizar({
+        "LOGO_AMIL": logo_amil,
+        "LOGO_ATIVA": logo_ativa,
+        "REFERENCIA": referencia_atual(),
+        "CIDADE": escape(cidade),
+        "UF": escape(uf),
+        "TOTAL_PRESTADORES": str(len(prestadores)),
+        "PRESTADORES": _blocos_prestadores(prestadores),
+    })
+
+
+def montar_html_sem_especialidade(uf: str, cidade: str, referencia: str | None = None) -> str:
+    return _template("sem_especialidade.html").renderizar({
+        "REFERENCIA": referencia or referencia_atual(),
+        "CIDADE": escape(cidade),
+        "UF": escape(uf),
+    })
 
 
 # =====================================================================
@@ -49,7 +197,7 @@ def _copiar_para_github_pages(pdf_path: Path, uf: str) -> None:
     Copia o PDF gerado para a pasta docs/pdfs para GitHub Pages.
     """
     try:
-        destino_base = SCRIPT_DIR / "docs" / "pdfs"
+        destino_base = DOCS_PDFS_DIR
         destino_uf = destino_base / uf
         destino_uf.mkdir(parents=True, exist_ok=True)
         
@@ -85,50 +233,120 @@ def gerar_pdf_prestadores(uf: str,
     get_estado_dir(uf, pasta_base)
     pdf_path = get_pdf_path(uf, cidade, pasta_base)
 
-    template = _carregar_template("prestadores.html")
-
-    # LOGOS
-    logo_amil = (SCRIPT_DIR / "amil_dental.jpg").resolve().as_uri()
-    logo_ativa = (SCRIPT_DIR / "logo_ativa.jpg").resolve().as_uri()
-
-    # Cabeçalho mês/ano
-    hoje = datetime.now()
-    mes_ano = hoje.strftime("%B / %Y").capitalize()
-
-    # Gera os blocos dos prestadores
-    html_prestadores = []
-    for p in prestadores:
-        bloco = (
-            "<div class='prestador'>"
-            f"<strong>Nome:</strong> {p['nome']}<br>"
-            f"<strong>Bairro:</strong> {p['bairro']}<br>"
-            f"<strong>Endereço:</strong> {p['endereco']}<br>"
-            f"<strong>Telefone:</strong> {p['telefone']}"
-            "</div>"
-        )
-        html_prestadores.append(bloco)
-
-    # Insere tudo no template
-    html = (
-        template
-        .replace("{{LOGO_AMIL}}", logo_amil)
-        .replace("{{LOGO_ATIVA}}", logo_ativa)
-        .replace("{{REFERENCIA}}", mes_ano)
-        .replace("{{CIDADE}}", cidade)
-        .replace("{{UF}}", uf)
-        .replace("{{TOTAL_PRESTADORES}}", str(len(prestadores)))
-        .replace("<!--PRESTADORES-->", "\n".join(html_prestadores))
-    )
-
-    options_pdf = {"enable-local-file-access": ""}
+    # 🔥 NOVO — Template compilado + blocos escapados (ver montar_html_prestadores)
+    html = montar_html_prestadores(uf, cidade, prestadores)
 
-    pdfkit.from_string(html, str(pdf_path), configuration=PDFKIT_CONFIG, options=options_pdf)
+    _renderizar(html, pdf_path)
     print(f"✅ PDF salvo: {pdf_path}")
     
     # 🔥 NOVO — copiar automaticamente para GitHub Pages
     _copiar_para_github_pages(pdf_path, uf)
 
 
+# =====================================================================
+#      BASE DO MÊS — SEM ESPECIALIDADE (renderizada uma vez, carimbada por cidade)
+# =====================================================================
+# Os PDFs sem especialidade só diferem no título "Rede Credenciada - CIDADE/UF".
+# A base é renderizada com marcadores no lugar de cidade/UF, o título é apagado
+# (redaction) e cada cidade só escreve o próprio título por cima (insert_text).
+# A base é endereçada pelo conteúdo (hash do template + REFERENCIA): muda o mês
+# ou o template, nasce outra base.
+PASTA_BASES_PDF = OUTPUT_DIR / "bases_pdf"
+
+_MARCADOR_CIDADE = "XCIDADEX"  # curtos: o título da base não pode quebrar linha
+_MARCADOR_UF = "XX"
+_FONTE_TITULO = "hebo"  # Helvetica Bold (embutida no PyMuPDF), no lugar do Arial bold do h1
+_TAMANHO_MINIMO_TITULO = 10.0
+
+_bases: dict[str, dict] = {}
+_lock_bases = threading.Lock()
+
+
+def _chave_base(referencia: str) -> str:
+    modelo = _template("sem_especialidade.html")
+    conteudo = json.dumps([modelo.literais, modelo.marcadores, modelo.final, referencia], ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()[:16]
+
+
+def _preparar_base(pdf_bytes: bytes) -> dict:
+    """Apaga o título (bloco com os marcadores) e guarda posição/tamanho/cor dele."""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        for numero, pagina in enumerate(doc):
+            for bloco in pagina.get_text("dict")["blocks"]:
+                linhas = bloco.get("lines", [])
+                texto = " ".join("".join(span["text"] for span in linha["spans"]).strip() for linha in linhas)
+                if _MARCADOR_CIDADE not in texto or _MARCADOR_UF not in texto:
+                    continue
+                primeiro = linhas[0]["spans"][0]
+                pagina.add_redact_annot(fitz.Rect(bloco["bbox"]), fill=(1, 1, 1))
+                pagina.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
+                return {
+                    "pdf": doc.tobytes(garbage=3, deflate=True),
+                    "pagina": numero,
+                    "titulo": texto,
+                    "origem": list(primeiro["origin"]),
+                    "tamanho": primeiro["size"],
+                    "cor": list(fitz.sRGB_to_pdf(primeiro["color"])),
+                    "largura_max": pagina.rect.width - 2 * primeiro["origin"][0],
+                }
+    finally:
+        doc.close()
+    raise ValueError("título com marcador não encontrado no PDF base")
+
+
+def _base_sem_especialidade() -> dict:
+    """Base do mês atual (memória → output/bases_pdf → render único no wkhtmltopdf)."""
+    referencia = referencia_atual()
+    chave = _chave_base(referencia)
+    with _lock_bases:
+        if chave in _bases:
+            return _bases[chave]
+
+        caminho_pdf = PASTA_BASES_PDF / f"sem_especialidade-{chave}.pdf"
+        caminho_meta = caminho_pdf.with_suffix(".json")
+        if caminho_pdf.exists() and caminho_meta.exists():
+            with open(caminho_meta, "r", encoding="utf-8") as f:
+                base = json.load(f)
+            base["pdf"] = caminho_pdf.read_bytes()
+        else:
+            html = montar_html_sem_especialidade(_MARCADOR_UF, _MARCADOR_CIDADE, referencia)
+            pdf_bytes = _renderizar(html)
+            base = _preparar_base(pdf_bytes)
+            PASTA_BASES_PDF.mkdir(parents=True, exist_ok=True)
+            for caminho, conteudo in ((caminho_pdf, base["pdf"]),
+                                      (caminho_meta, json.dumps({k: v for k, v in base.items() if k != "pdf"},
+                                                                ensure_ascii=False).encode("utf-8"))):
+                tmp = caminho.with_suffix(caminho.suffix + ".tmp")
+                tmp.write_bytes(conteudo)
+                os.replace(tmp, caminho)
+            print(f"🧩 Base sem especialidade de {referencia} renderizada ({caminho_pdf.name})")
+
+        _bases[chave] = base
+        return base
+
+
+def _carimbar_sem_especialidade(base: dict, uf: str, cidade: str, pdf_path: Path) -> None:
+    """Escreve o título da cidade na base e grava o PDF (tmp + replace)."""
+    titulo = base["titulo"].replace(_MARCADOR_CIDADE, cidade).replace(_MARCADOR_UF, uf)
+    tamanho = base["tamanho"]
+    largura = fitz.get_text_length(titulo, fontname=_FONTE_TITULO, fontsize=tamanho)
+    if largura > base["largura_max"]:
+        # Nome longo: reduz a fonte para caber numa linha (não desloca o resto da página)
+        tamanho = max(tamanho * base["largura_max"] / largura, _TAMANHO_MINIMO_TITULO)
+
+    doc = fitz.open(stream=base["pdf"], filetype="pdf")
+    try:
+        doc[base["pagina"]].insert_text(
+            base["origem"], titulo, fontsize=tamanho, fontname=_FONTE_TITULO, color=base["cor"]
+        )
+        tmp = pdf_path.with_suffix(".tmp.pdf")
+        doc.save(tmp, garbage=3, deflate=True)
+    finally:
+        doc.close()
+    os.replace(tmp, pdf_path)
+
+
 # =====================================================================
 #            GERAR PDF — SEM ESPECIALIDADE
 # =====================================================================
@@ -144,23 +362,55 @@ def gerar_pdf_sem_especialidade(uf: str,
     get_estado_dir(uf, pasta_base)
     pdf_path = get_pdf_path(uf, cidade, pasta_base)
 
-    template = _carregar_template("sem_especialidade.html")
+    # 🔥 NOVO — Carimba cidade/UF na base do mês (ms) em vez de um render por cidade
+    try:
+        _carimbar_sem_especialidade(_base_sem_especialidade(), uf, cidade, pdf_path)
+    except Exception as e:
+        print(f"⚠️ Base sem especialidade indisponível ({e}) — renderizando {cidade}-{uf}")
+        html = montar_html_sem_especialidade(uf, cidade)
+        _renderizar(html, pdf_path)
+    print(f"⚠️ PDF sem especialidade gerado: {pdf_path}")
+    
+    # 🔥 NOVO — copiar automaticamente para GitHub Pages
+    _copiar_para_github_pages(pdf_path, uf)
 
-    # Cabeçalho mês/ano
-    hoje = datetime.now()
-    mes_ano = hoje.strftime("%B / %Y").capitalize()
 
-    html = (
-        template
-        .replace("{{REFERENCIA}}", mes_ano)
-        .replace("{{CIDADE}}", cidade)
-        .replace("{{UF}}", uf)
-    )
+# =====================================================================
+#            ATUALIZAR REFERÊNCIA (MÊS) SEM RE-RENDERIZAR
+# =====================================================================
+def atualizar_referencia_pdf(pdf_path: Path, antiga: str, nova: str, uf: str | None = None) -> bool:
+    """
+    Troca o texto da REFERENCIA no PDF já gerado (PyMuPDF): apaga o trecho
+    antigo com redaction e escreve o novo na mesma posição/tamanho/cor.
+    Milissegundos, contra segundos de um render no wkhtmltopdf.
+    """
+    if not antiga or antiga == nova or not pdf_path.exists():
+        return False
 
-    options_pdf = {"enable-local-file-access": ""}
+    doc = fitz.open(pdf_path)
+    alterou = False
+    for pagina in doc:
+        trocas = []
+        for bloco in pagina.get_text("dict")["blocks"]:
+            for linha in bloco.get("lines", []):
+                for span in linha["spans"]:
+                    if antiga in span["text"]:
+                        pagina.add_redact_annot(fitz.Rect(span["bbox"]), fill=(1, 1, 1))
+                        trocas.append((span["origin"], span["text"].replace(antiga, nova),
+                                       span["size"], fitz.sRGB_to_pdf(span["color"])))
+        if trocas:
+            pagina.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
+            for origem, texto, tamanho, cor in trocas:
+                pagina.insert_text(origem, texto, fontsize=tamanho, fontname="helv", color=cor)
+            alterou = True
 
-    pdfkit.from_string(html, str(pdf_path), configuration=PDFKIT_CONFIG, options=options_pdf)
-    print(f"⚠️ PDF sem especialidade gerado: {pdf_path}")
-    
-    # 🔥 NOVO — copiar automaticamente para GitHub Pages
-    _copiar_para_github_pages(pdf_path, uf)
\ No newline at end of file
+    if alterou:
+        tmp = pdf_path.with_suffix(".tmp.pdf")
+        doc.save(tmp, garbage=3, deflate=True)
+        doc.close()
+        os.replace(tmp, pdf_path)
+        if uf:
+            _copiar_para_github_pages(pdf_path, uf)
+    else:
+        doc.close()
+    return alterou
@@ -0,0 +1,150 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from scraper.erros import BLOQUEIO, INTERROMPIDO, PERMANENTE, TRANSITORIO, classificar_erro
+from utils.delays import ESCALA_DELAYS
+
+# =====================================================
+# 🔹 Agendador de cidades com retry adiado
+# =====================================================
+# Em vez de repetir a cidade na hora (recursão + 1-2 min de sleep com o
+# navegador parado), a falha transitória volta para o FIM da fila com
+# backoff exponencial e um orçamento de tentativas por cidade. Enquanto
+# isso, as outras cidades seguem. Falha permanente não é repetida.
+
+MAX_TENTATIVAS = int(os.getenv("AMIL_MAX_TENTATIVAS", "3"))
+
+# Atraso antes da 2ª tentativa; dobra a cada nova falha (até BACKOFF_MAX_SEG)
+BACKOFF_BASE_SEG = {
+    TRANSITORIO: float(os.getenv("AMIL_BACKOFF_TRANSITORIO_SEG", "60")),
+    BLOQUEIO: float(os.getenv("AMIL_BACKOFF_BLOQUEIO_SEG", "300")),
+}
+BACKOFF_MAX_SEG = 1800.0
+
+
+def atraso_retry(categoria: str, tentativa: int) -> float:
+    """Segundos até a próxima tentativa depois da falha nº `tentativa` (com jitter)."""
+    base = BACKOFF_BASE_SEG.get(categoria, BACKOFF_BASE_SEG[TRANSITORIO])
+    atraso = min(base * 2 ** (tentativa - 1), BACKOFF_MAX_SEG)
+    return atraso * random.uniform(0.8, 1.2) * ESCALA_DELAYS
+
+
+class AgendadorTentativas:
+    """
+    Fila de (uf, cidade) com tentativas contadas por cidade.
+
+    proxima() entrega a próxima cidade pronta; falhar() decide entre
+    reenfileirar (com atraso) ou desistir; espera() diz quanto falta
+    para a próxima cidade adiada ficar pronta.
+    """
+
+    def __init__(self, tarefas: list[tuple[str, str]], max_tentativas: int = MAX_TENTATIVAS,
+                 relogio=time.monotonic) -> None:
+        self.max_tentativas = max_tentativas
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._prontas: deque[tuple[str, str]] = deque(tarefas)
+        self._adiadas: list[tuple[float, int, str, str]] = []
+        self._seq = itertools.count()
+        self._tentativas: dict[tuple[str, str], int] = {}
+        self._em_andamento = 0
+        self._falhas: dict[tuple[str, str], dict] = {}
+        self._retries = 0
+
+    def _liberar_adiadas(self, agora: float) -> None:
+        while self._adiadas and self._adiadas[0][0] <= agora:
+            _, _, uf, cidade = heapq.heappop(self._adiadas)
+            self._prontas.append((uf, cidade))
+
+    # ---------------------- fila ----------------------
+
+    def proxima(self) -> tuple[str, str, int] | None:
+        """(uf, cidade, nº da tentativa) ou None se nada está pronto agora."""
+        with self._lock:
+            self._liberar_adiadas(self._relogio())
+            if not self._prontas:
+                return None
+            uf, cidade = self._prontas.popleft()
+            tentativa = self._tentativas.get((uf, cidade), 0) + 1
+            self._tentativas[(uf, cidade)] = tentativa
+            self._em_andamento += 1
+            return uf, cidade, tentativa
+
+    def espera(self) -> float | None:
+        """
+        0 se há cidade pronta; segundos até a próxima adiada; 1s se só há
+        cidades em andamento (podem voltar para a fila); None se acabou.
+        """
+        with self._lock:
+            agora = self._relogio()
+            self._liberar_adiadas(agora)
+            if self._prontas:
+                return 0.0
+            if self._adiadas:
+                return max(self._adiadas[0][0] - agora, 0.0)
+            if self._em_andamento:
+                return 1.0
+            return None
+
+    def finalizado(self) -> bool:
+        return self.espera() is None
+
+    # ---------------------- resultado ----------------------
+
+    def concluir(self, uf: str, cidade: str) -> None:
+        with self._lock:
+            self._em_andamento -= 1
+            self._falhas.pop((uf, cidade), None)
+
+    def falhar(self, uf: str, cidade: str, erro: BaseException) -> dict:
+        """
+        Registra a falha e decide o destino da cidade.
+        Retorna {"categoria", "tentativa", "reagendada", "atraso"}.
+        """
+        categoria = classificar_erro(erro)
+        with self._lock:
+            self._em_andamento -= 1
+            chave = (uf, cidade)
+            tentativa = self._tentativas.get(chave, 1)
+
+            if categoria == INTERROMPIDO:
+                # Parada do usuário não gasta tentativa nem vira erro
+                self._tentativas[chave] = tentativa - 1
+                return {"categoria": categoria, "tentativa": tentativa, "reagendada": False, "atraso": 0.0}
+
+            if categoria == PERMANENTE or tentativa >= self.max_tentativas:
+                self._falhas[chave] = {"categoria": categoria, "tentativas": tentativa, "erro": str(erro)}
+                return {"categoria": categoria, "tentativa": tentativa, "reagendada": False, "atraso": 0.0}
+
+            atraso = atraso_retry(categoria, tentativa)
+            heapq.heappush(self._adiadas, (self._relogio() + atraso, next(self._seq), uf, cidade))
+            self._retries += 1
+            return {"categoria": categoria, "tentativa": tentativa, "reagendada": True, "atraso": atraso}
+
+    # ---------------------- consulta ----------------------
+
+    def cidades_com_erro(self) -> dict[str, list[str]]:
+        """Falhas definitivas por UF (mesmo formato de cidades_com_erro.json)."""
+        with self._lock:
+            erros: dict[str, list[str]] = {}
+            for uf, cidade in self._falhas:
+                erros.setdefault(uf, []).append(cidade)
+            return erros
+
+    def resumo(self) -> dict:
+        with self._lock:
+            por_categoria: dict[str, int] = {}
+            for falha in self._falhas.values():
+                por_categoria[falha["categoria"]] = por_categoria.get(falha["categoria"], 0) + 1
+            return {
+                "prontas": len(self._prontas),
+                "adiadas": len(self._adiadas),
+                "em_andamento": self._em_andamento,
+                "retries": self._retries,
+                "falhas": por_categoria,
+            }
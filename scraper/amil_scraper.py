@@ -7,18 +7,46 @@ from typing import Any
 import tempfile  # 🔥 NOVO
 
 import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
-from utils.delays import delay_humano
+from utils.delays import delay_humano, dormir, contexto_cidade, espera_ritmo
+from utils.metricas import medir, CIDADE
 from utils.file_manager import get_pdf_path, REDE_COMPLETA_DIR
 from scraper.anti_bot import build_chrome_options, apply_stealth
+from scraper.proxy_pool import PoolProxies, obter_pool
+from scraper.deteccao_bloqueio import obter_detector
+from scraper.captura_rede import CapturaRede, CAPTURA_REDE_ATIVA
+from scraper.cache_opcoes import obter_cache, ler_opcoes_abertas
+from scraper.localizadores import obter_registro, detectar_versao_site
+from scraper.paginacao import Paginador, ler_total_anunciado, normalizar_prestador
+from scraper.erros import (
+    ErroBloqueio,
+    ErroPermanente,
+    ErroTempoEsgotado,
+    ErroTransitorio,
+    BLOQUEIO,
+    INTERROMPIDO,
+    PERMANENTE,
+    classificar_erro,
+)
+from scraper.watchdog import obter_watchdog, pids_navegador
+from scraper.recursos import arvore, garantir_encerrados, obter_monitor
+from utils.perfilador import obter_perfilador
+from utils.logger import custo_log_cidade
 from scraper.navegacao import (
     aguardar_pagina_carregar,
+    EsperaInterrompivel,
 )
 
-from pdf.gerador_pdf import gerar_pdf_prestadores, gerar_pdf_sem_especialidade
+from pdf.gerador_pdf import (
+    gerar_pdf_prestadores,
+    gerar_pdf_sem_especialidade,
+    referencia_atual,
+    atualizar_referencia_pdf,
+)
+from utils.armazem_resultados import obter_armazem, INALTERADO, ALTERADO
+from utils.historico import obter_historico
+from utils.indice_busca import obter_indice
 
 
 # ============================================================
@@ -26,6 +54,38 @@ from pdf.gerador_pdf import gerar_pdf_prestadores, gerar_pdf_sem_especialidade
 # ============================================================
 PROXIES: list[str] = []
 
+# 🔥 NOVO — URL e binários sobrescrevíveis (replay offline contra o mock em bench/)
+URL_BUSCA = os.getenv(
+    "AMIL_URL_BUSCA",
+    "https://www.amil.com.br/institucional/#/servicos/saude/rede-credenciada/amil/busca-avancada",
+)
+CHROME_PATH = os.getenv("CHROME_PATH") or None
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH") or None
+
+# 🔥 NOVO — AMIL_ATUALIZAR_EXISTENTES=1 revisita cidades que já têm PDF
+# (só re-renderiza se a lista de prestadores mudou)
+ATUALIZAR_EXISTENTES = os.getenv("AMIL_ATUALIZAR_EXISTENTES", "0") == "1"
+
+
+def atualizar_referencia_cidade(uf: str, cidade: str, pasta_base: Path, registro: dict | None = None) -> str | None:
+    """
+    Carimba o mês atual no PDF existente (PyMuPDF, sem wkhtmltopdf) quando a
+    REFERENCIA guardada no armazém ficou velha. Retorna a nova referência ou None.
+    """
+    armazem = obter_armazem()
+    registro = registro or armazem.carregar(uf, cidade)
+    if not registro or not registro.get("referencia"):
+        return None
+    atual = referencia_atual()
+    if registro["referencia"] == atual:
+        return None
+    with medir("pdf_referencia", uf=uf):
+        alterou = atualizar_referencia_pdf(get_pdf_path(uf, cidade, pasta_base), registro["referencia"], atual, uf)
+    if not alterou:
+        return None
+    armazem.definir_referencia(uf, cidade, atual)
+    return atual
+
 
 # ============================================================
 #              BOT AMIL — ESTÁVEL FINAL (V.B)
@@ -38,6 +98,7 @@ class AmilBot:
         logger=None,
         proxies: list[str] | None = None,
         stop_flag=None,  # 🔥 NOVO
+        executar_render=None,
     ) -> None:
 
         self.uf = uf
@@ -50,28 +111,72 @@ class AmilBot:
         self.wait_dropdown: WebDriverWait | None = None
 
         self.resultado_por_cidade = []
-        self.cidades_com_erro = {}
 
         self.proxies = proxies if proxies is not None else PROXIES
 
+        # 🔥 NOVO — Pool com saúde por proxy (lista explícita → pool próprio)
+        self.pool_proxies = PoolProxies(proxies) if proxies is not None else obter_pool(PROXIES or None)
+        self._proxy: str | None = None
+        self.detector_bloqueio = obter_detector()
+        self.cache_opcoes = obter_cache()
+        self.localizadores = obter_registro()
+        self.armazem = obter_armazem()
+        # 🔥 NOVO — Prazo real por cidade/fase: estourou, o watchdog mata o Chrome travado
+        self.watchdog = obter_watchdog().registrar(
+            f"{uf}-{id(self):x}", lambda: pids_navegador(self.driver) if self.driver else [], self._log
+        )
+        # 🔥 NOVO — Memória da árvore do Chrome (recicla acima de AMIL_LIMITE_RSS_MB)
+        self.recursos = obter_monitor().registrar(self.watchdog)
+
+        # 🔥 NOVO — Quem executa a renderização do PDF (o orquestrador async
+        # injeta uma função que usa o pool/semáforo de renderizadores)
+        self._executar_render = executar_render or (lambda func, *args: func(*args))
+
     # ---------------------- utils ----------------------
 
-    def _log(self, msg: str) -> None:
+    def _log(self, msg: str, **campos) -> None:
+        # 🔥 NOVO — campos (etapa, duracao, ...) vão para o .jsonl (utils/logger.py)
         if self.logger:
-            self.logger.info(msg)
+            self.logger.info(msg, extra=campos or None)
         else:
             print(msg)
 
     def _escolher_proxy(self) -> str | None:
-        if not self.proxies:
-            return None
-        return random.choice(self.proxies)
+        # 🔥 NOVO — Sessão fixa: mantém o proxy atual enquanto ele estiver saudável
+        self._proxy = self.pool_proxies.escolher(self._proxy)
+        return self._proxy
+
+    def _dormir(self, segundos: float, motivo: str) -> None:
+        """
+        Sleep deliberado, contabilizado por motivo (ver utils.delays).
+        Interrompível: acorda assim que o stop_flag é acionado e levanta exceção.
+        """
+        if dormir(segundos, motivo, self.stop_flag):
+            raise Exception("Execução interrompida pelo usuário")
+
+    def _erro_watchdog(self, erro: Exception) -> Exception:
+        """Se o watchdog (prazo) ou o monitor (memória) matou o navegador, a falha real é essa."""
+        if self.watchdog.estouro:
+            return ErroTempoEsgotado(self.watchdog.mensagem_estouro())
+        if self.recursos.reciclagem:
+            return ErroTransitorio(self.recursos.mensagem_reciclagem())
+        return erro
+
+    def _espera(self, timeout: float) -> EsperaInterrompivel:
+        """WebDriverWait que aborta no stop_flag."""
+        return EsperaInterrompivel(self.driver, timeout, self.stop_flag)
+
+    def _localizar(self, nome: str, timeout: float, condicao: str = "clicavel", **params):
+        """Espera um localizador do registro (todas as variantes, vencedora primeiro)."""
+        return self.localizadores.esperar(
+            self.driver, nome, timeout, condicao, stop_flag=self.stop_flag, log=self._log, **params
+        )
 
     def _cooldown(self) -> None:
         """Cooldown entre cidades para parecer humano."""
         # 🔥 OTIMIZADO: Cooldown reduzido - perfil único garante fingerprint diferente
         # Base: 10-18 segundos (reduzido de 15-25s)
-        cooldown_base = random.uniform(10.0, 18.0)
+        cooldown_base = espera_ritmo("entre_cidades")
         
         # Cooldown progressivo: aumenta com o número de cidades processadas
         if hasattr(self, '_cidades_processadas_uf'):
@@ -81,7 +186,7 @@ class AmilBot:
             cooldown_time = cooldown_base
         
         self._log(f"⏳ Cooldown de {cooldown_time:.1f}s entre cidades...")
-        time.sleep(cooldown_time)
+        self._dormir(cooldown_time, "entre_cidades")
 
         # Não precisa fazer scroll se não há driver (já foi fechado)
         if not self.driver:
@@ -93,45 +198,23 @@ class AmilBot:
                 x = random.randint(0, 800)
                 y = random.randint(0, 600)
                 self.driver.execute_script(f"window.scrollTo({x}, {y});")
-                time.sleep(random.uniform(0.3, 0.7))
+                self._dormir(espera_ritmo("movimento_humano"), "movimento_humano")
             except:
                 pass
 
     # 🔥 NOVO — Verificar se há bloqueio/captcha
     def _verificar_bloqueio(self) -> bool:
-        """Verifica se o site bloqueou ou pediu captcha."""
-        try:
-            # Verificar textos comuns de bloqueio
-            bloqueios = [
-                "captcha",
-                "verificação",
-                "bloqueado",
-                "suspenso",
-                "acesso negado",
-                "too many requests",
-                "rate limit",
-            ]
-            
-            page_text = self.driver.page_source.lower()
-            for bloqueio in bloqueios:
-                if bloqueio in page_text:
-                    self._log(f"⚠️ Possível bloqueio detectado: {bloqueio}")
-                    return True
-            
-            # Verificar se há iframe de captcha
-            try:
-                iframes = self.driver.find_elements(By.TAG_NAME, "iframe")
-                for iframe in iframes:
-                    src = iframe.get_attribute("src") or ""
-                    if "captcha" in src.lower() or "recaptcha" in src.lower():
-                        self._log("⚠️ Captcha detectado!")
-                        return True
-            except:
-                pass
-                
+        """Verifica se o site bloqueou ou pediu captcha (um único script injetado)."""
+        if not self.driver:
             return False
-        except:
+        with medir("verificar_bloqueio", uf=self.uf):
+            veredito = self.detector_bloqueio.verificar(self.driver)
+        if not veredito["bloqueado"]:
             return False
+        detalhe = f" ({veredito['detalhe']})" if veredito["detalhe"] else ""
+        self._log(f"⚠️ Possível bloqueio detectado: {veredito['motivo']}{detalhe}")
+        self.pool_proxies.registrar_bloqueio(self._proxy)
+        return True
 
     # 🔥 NOVO — Limpar completamente dados do navegador
     def _limpar_dados_navegador(self):
@@ -170,6 +253,16 @@ class AmilBot:
         except:
             pass
 
+    def _encerrar_driver(self) -> None:
+        """driver.quit() e confere se a árvore do Chrome morreu mesmo (mata o que sobrou)."""
+        processos = arvore(pids_navegador(self.driver))
+        try:
+            self.driver.quit()
+        finally:
+            sobras = garantir_encerrados(processos)
+            if sobras:
+                self._log(f"🧹 {sobras} processos do navegador sobreviveram ao quit — encerrados")
+
     def _fechar_navegador_completamente(self):
         """Fecha o navegador e limpa completamente todos os dados."""
         import shutil
@@ -179,12 +272,10 @@ class AmilBot:
                 # Limpar dados do navegador
                 self._limpar_dados_navegador()
                 
-                # Fechar navegador
-                self.driver.quit()
-                
-                # 🔥 NOVO — Aguardar processo terminar
-                time.sleep(random.uniform(2.0, 4.0))
-                
+                # 🔥 NOVO — Fechar navegador e aguardar os processos terminarem de fato
+                # (espera ativa pela árvore, em vez de um sleep fixo de 2-4s)
+                self._encerrar_driver()
+
             except Exception as e:
                 self._log(f"⚠️ Erro ao fechar navegador: {e}")
             finally:
@@ -210,11 +301,14 @@ class AmilBot:
         return self
 
     def __exit__(self, exc_type, exc, tb):
+        obter_watchdog().remover(self.watchdog)
+        obter_monitor().remover(self.recursos)
         if self.driver:
             try:
-                self.driver.quit()
+                self._encerrar_driver()
             except:
                 pass
+            self.driver = None
 
     # ------------------------------------------------------
     #         ABRIR NAVEGADOR — SEMPRE LIMPO POR CIDADE
@@ -244,7 +338,7 @@ class AmilBot:
         else:
             self._log("🌐 Conexão direta (sem proxy).")
 
-        options = build_chrome_options(user_agent=ua, proxy=proxy)
+        options = build_chrome_options(user_agent=ua, proxy=proxy, log_rede=CAPTURA_REDE_ATIVA)
         
         # 🔥 CORREÇÃO — Usar perfil temporário apenas se habilitado
         if usar_perfil_temp and perfil_temp:
@@ -255,9 +349,20 @@ class AmilBot:
         viewport_height = random.randint(720, 1080)
         options.add_argument(f"--window-size={viewport_width},{viewport_height}")
 
-        self.driver = uc.Chrome(options=options, use_subprocess=True)
-        self.wait = WebDriverWait(self.driver, 25)
-        self.wait_dropdown = WebDriverWait(self.driver, 15)
+        self.driver = uc.Chrome(
+            options=options,
+            use_subprocess=True,
+            browser_executable_path=CHROME_PATH,
+            driver_executable_path=CHROMEDRIVER_PATH,
+        )
+        self.wait = self._espera(25)
+        self.wait_dropdown = self._espera(15)
+
+        # 🔥 NOVO — Limita comandos que não dá para interromper (driver.get)
+        try:
+            self.driver.set_page_load_timeout(45)
+        except Exception:
+            pass
         
         # 🔥 NOVO — Guardar caminho do perfil para limpar depois
         self._perfil_temp = perfil_temp
@@ -266,7 +371,7 @@ class AmilBot:
         # apply_stealth(self.driver)  # REMOVIDO - aplicar depois
 
         # 🔥 OTIMIZADO: Mais tempo antes de carregar página
-        time.sleep(random.uniform(2.0, 4.0))
+        self._dormir(espera_ritmo("abrir_navegador"), "abrir_navegador")
 
         # 🔥 CORREÇÃO — Tentar carregar a página com retry
         max_tentativas_carregar = 3
@@ -276,15 +381,14 @@ class AmilBot:
             try:
                 self._log(f"🌐 Tentando carregar página (tentativa {tentativa + 1}/{max_tentativas_carregar})...")
                 
-                self.driver.get(
-                    "https://www.amil.com.br/institucional/#/servicos/saude/rede-credenciada/amil/busca-avancada"
-                )
+                inicio_carregamento = time.perf_counter()
+                self.driver.get(URL_BUSCA)
 
                 # 🔥 CORREÇÃO — Melhorar verificação de carregamento para SPAs
-                aguardar_pagina_carregar(self.driver, self.wait)
+                aguardar_pagina_carregar(self.driver, self.wait, self.stop_flag)
                 
                 # 🔥 NOVO — Aguardar mais tempo para JavaScript carregar
-                time.sleep(random.uniform(3.0, 5.0))
+                self._dormir(espera_ritmo("carregamento_pagina"), "carregamento_pagina")
                 
                 # 🔥 CORREÇÃO — Verificar se a página não está em branco
                 page_source = self.driver.page_source
@@ -293,7 +397,7 @@ class AmilBot:
                 if len(page_source) < 1000:
                     self._log(f"⚠️ Página muito pequena ({len(page_source)} chars), tentando recarregar...")
                     if tentativa < max_tentativas_carregar - 1:
-                        time.sleep(random.uniform(2.0, 4.0))
+                        self._dormir(espera_ritmo("recarregar_pagina"), "recarregar_pagina")
                         continue
                     else:
                         raise Exception("Página não carregou corretamente (muito pequena)")
@@ -303,24 +407,27 @@ class AmilBot:
                 if "amil" not in page_lower and "rede" not in page_lower and "credenciada" not in page_lower:
                     self._log("⚠️ Conteúdo da página não parece correto, tentando recarregar...")
                     if tentativa < max_tentativas_carregar - 1:
-                        time.sleep(random.uniform(2.0, 4.0))
+                        self._dormir(espera_ritmo("recarregar_pagina"), "recarregar_pagina")
                         continue
                     else:
                         raise Exception("Conteúdo da página não parece correto")
                 
                 # Verificar se há body com conteúdo
                 try:
-                    body_text = self.driver.find_element(By.TAG_NAME, "body").text
+                    body_text = self.localizadores.encontrar(self.driver, "corpo").text
                     if len(body_text.strip()) < 50:
                         self._log("⚠️ Body da página está vazio, tentando recarregar...")
                         if tentativa < max_tentativas_carregar - 1:
-                            time.sleep(random.uniform(2.0, 4.0))
+                            self._dormir(espera_ritmo("recarregar_pagina"), "recarregar_pagina")
                             continue
                 except:
                     pass
                 
                 # Se chegou aqui, página carregou corretamente
                 pagina_carregou = True
+                self.localizadores.definir_versao(detectar_versao_site(self.driver))
+                # 🔥 NOVO — Latência do proxy = tempo do get até o DOM pronto
+                self.pool_proxies.registrar_sucesso(self._proxy, time.perf_counter() - inicio_carregamento)
                 self._log(f"✅ Página carregada com sucesso ({len(page_source)} chars)")
                 break
                 
@@ -328,8 +435,9 @@ class AmilBot:
                 self._log(f"⚠️ Erro ao carregar página (tentativa {tentativa + 1}): {e}")
                 if tentativa < max_tentativas_carregar - 1:
                     self._log("🔄 Tentando recarregar...")
-                    time.sleep(random.uniform(3.0, 5.0))
+                    self._dormir(espera_ritmo("recarregar_apos_erro"), "recarregar_pagina")
                 else:
+                    self.pool_proxies.registrar_falha(self._proxy)
                     raise Exception(f"Falha ao carregar página após {max_tentativas_carregar} tentativas: {e}")
         
         if not pagina_carregou:
@@ -342,26 +450,24 @@ class AmilBot:
             self._log(f"⚠️ Erro ao aplicar stealth: {e}")
         
         # 🔥 OTIMIZADO: Mais tempo após carregar
-        time.sleep(random.uniform(2.0, 3.0))
+        self._dormir(espera_ritmo("apos_carregar"), "abrir_navegador")
 
         try:
-            self.wait.until(
-                EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-            ).click()
-            time.sleep(random.uniform(1.0, 2.0))
+            self._localizar("aceitar_cookies", 25).click()
+            self._dormir(espera_ritmo("apos_interacao"), "abrir_navegador")
         except:
             pass
 
         try:
             self.driver.maximize_window()
-            time.sleep(random.uniform(1.0, 2.0))
+            self._dormir(espera_ritmo("apos_interacao"), "abrir_navegador")
         except:
             pass
         
         # Verificar bloqueio após abrir
         if self._verificar_bloqueio():
             self._log("⚠️ Bloqueio detectado após abrir navegador!")
-            raise Exception("Site bloqueou o acesso")
+            raise ErroBloqueio("Site bloqueou o acesso")
 
     # ------------------------------------------------------
     #                   PROCESSAR CIDADE
@@ -372,12 +478,58 @@ class AmilBot:
             raise Exception("Execução interrompida pelo usuário")
 
         caminho_pdf = get_pdf_path(self.uf, cidade, self.pasta_base)
-        if caminho_pdf.exists():
+        registro = self.armazem.carregar(self.uf, cidade)
+        if caminho_pdf.exists() and not ATUALIZAR_EXISTENTES:
             self._log(f"⏭️ PDF já existe — pulando {cidade}-{self.uf}")
+            self._atualizar_referencia(cidade, registro)
             # 🔥 OTIMIZADO: Cooldown mesmo quando pula
-            time.sleep(random.uniform(5.0, 10.0))
+            self._dormir(espera_ritmo("pdf_existente"), "pdf_existente")
             return
 
+        # 🔥 NOVO — PDF apagado, mas a lista deste mês está no armazém: recria sem navegador
+        if not caminho_pdf.exists() and registro and registro.get("referencia") == referencia_atual():
+            self._log(f"♻️ Recriando PDF de {cidade}-{self.uf} a partir do armazém de resultados")
+            if registro.get("sem_especialidade"):
+                self._gerar_pdf_sem_especialidade(cidade)
+            else:
+                self._gerar_pdf_prestadores(cidade, registro["prestadores"])
+            self.resultado_por_cidade.append({"cidade": cidade, "uf": self.uf, "prestadores": registro["total"]})
+            return
+
+        # 🔥 NOVO — Cache já sabe que não tem CLINICA GERAL: PDF direto, sem navegador
+        if self.cache_opcoes.sem_especialidade(self.uf, cidade):
+            self._log(f"⏭️ {cidade}-{self.uf} sem especialidade (cache de opções) — gerando PDF direto")
+            self._gerar_pdf_sem_especialidade(cidade)
+            self.resultado_por_cidade.append({"cidade": cidade, "uf": self.uf, "prestadores": 0})
+            return
+
+        # 🔥 NOVO — Span da cidade inteira (inclui retry e cooldowns)
+        inicio_cidade = time.perf_counter()
+        self.watchdog.iniciar_cidade(cidade)
+        self.recursos.iniciar_cidade()
+        try:
+            # 🔥 NOVO — Perfil de CPU opt-in (AMIL_PERFIL=cidade ou POST /api/perfil)
+            with contexto_cidade(self.uf, cidade), obter_perfilador().cidade(self.uf, cidade, self._log):
+                self._processar_cidade(cidade)
+        finally:
+            self.watchdog.encerrar_cidade()
+            # 🔥 NOVO — quit que falhou calado não deixa Chrome para trás
+            obter_monitor().recolher_orfaos(self._log)
+            duracao = time.perf_counter() - inicio_cidade
+            CIDADE.observar(duracao, uf=self.uf)
+            custo_log = custo_log_cidade(self.uf, cidade)
+            self._log(
+                f"⏱️ {cidade}-{self.uf} processada em {duracao:.1f}s "
+                f"(log: {custo_log['registros']} registros, {custo_log['chamador_ms']:.1f}ms)",
+                uf=self.uf, cidade=cidade, etapa="cidade", duracao=duracao,
+            )
+            for item in self.resultado_por_cidade:
+                if item["cidade"] == cidade and "duracao" not in item:
+                    item["duracao"] = round(duracao, 1)
+                    # 🔥 NOVO — Base da ordem LPT das próximas execuções (só cidade concluída)
+                    obter_historico().registrar(self.uf, cidade, duracao, item["prestadores"])
+
+    def _processar_cidade(self, cidade: str) -> None:
         self._log(f"\n🔄 Processando {cidade}-{self.uf}")
         self._current_city = cidade
 
@@ -387,52 +539,62 @@ class AmilBot:
 
         # 🔥 OTIMIZADO: Cooldown antes de abrir navegador (reduzido - perfil único agora)
         # Cooldown antes de abrir navegador
-        time.sleep(random.uniform(5.0, 10.0))  # Reduzido de 10-18s para 5-10s
+        self._dormir(espera_ritmo("antes_navegador"), "antes_navegador")  # Reduzido de 10-18s para 5-10s
 
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
 
-        # navegador limpo sempre
-        self._abrir_navegador()
-        
-        # Verificar bloqueio após abrir
-        if self._verificar_bloqueio():
-            self._log("⚠️ Bloqueio detectado! Aguardando muito mais tempo...")
-            time.sleep(random.uniform(60, 120))  # 1-2 minutos
-            if self._verificar_bloqueio():
-                raise Exception("Site bloqueou o acesso após espera")
+        # navegador limpo sempre (_abrir_navegador já levanta ErroBloqueio se a
+        # página veio bloqueada — o backoff fica com o agendador, sem navegador aberto)
+        try:
+            with medir("abrir_navegador", uf=self.uf), self.watchdog.fase("abrir_navegador"):
+                self._abrir_navegador()
+        except Exception as e:
+            # falha de carregamento já conta no proxy dentro de _abrir_navegador; bloqueio,
+            # em registrar_bloqueio
+            erro = self._erro_watchdog(e)
+            self._fechar_navegador_completamente()
+            if erro is not e:
+                raise erro from e
+            raise
 
+        # Falha só conta contra o proxy enquanto o navegador trabalha (render/disco, não)
+        falha_no_navegador = True
         try:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             
-            self._passo1()
-            time.sleep(random.uniform(1.5, 3.0))
+            with medir("passo1", uf=self.uf), self.watchdog.fase("formulario"):
+                self._passo1()
+            self._dormir(espera_ritmo("entre_passos"), "entre_passos")
             
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             
-            self._passo2(cidade)
-            time.sleep(random.uniform(1.5, 3.0))
+            with medir("passo2", uf=self.uf), self.watchdog.fase("formulario"):
+                self._passo2(cidade)
+            self._dormir(espera_ritmo("entre_passos"), "entre_passos")
             
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             
-            self._passo3(cidade)
-            time.sleep(random.uniform(2.0, 4.0))
+            with medir("passo3", uf=self.uf), self.watchdog.fase("formulario"):
+                self._passo3(cidade)
+            self._dormir(espera_ritmo("antes_captura"), "entre_passos")
             
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             
-            prestadores = self._capturar()
+            with medir("capturar", uf=self.uf), self.watchdog.fase("captura"):
+                prestadores = self._capturar()
 
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
 
             # VALIDAÇÃO: só gera PDF se houver prestadores válidos
             if prestadores and len(prestadores) > 0:
-                gerar_pdf_prestadores(self.uf, cidade, prestadores, self.pasta_base)
-                self._log(f"📄 PDF gerado: {cidade}-{self.uf} ({len(prestadores)} prestadores)")
+                falha_no_navegador = False
+                self._gerar_pdf_prestadores(cidade, prestadores)
                 
                 self.resultado_por_cidade.append({
                     "cidade": cidade,
@@ -473,7 +635,7 @@ class AmilBot:
                 if self.driver:
                     try:
                         self._limpar_dados_navegador()
-                        self.driver.quit()
+                        self._encerrar_driver()
                     except:
                         pass
                     finally:
@@ -485,33 +647,28 @@ class AmilBot:
                 return
             
             # Se não for exceção de especialidade, tratar como erro normal
-            self._log(f"⚠️ Falha em {cidade}-{self.uf}: {e}")
-            self._log("🛑 Fechando navegador antes do cooldown...")
-
-            # 🔥 CORREÇÃO — Fechar navegador completamente
-            self._fechar_navegador_completamente()
-
-            # 🔥 OTIMIZADO: Cooldown muito maior em caso de erro
-            cooldown = random.uniform(60, 120)  # 1-2 minutos
-            self._log(f"⏳ Aguardando {cooldown:.1f} segundos para limpar fingerprint...")
-            time.sleep(cooldown)
-
-            self._log("🔁 Reabrindo navegador e tentando novamente...")
-
-            try:
-                return self.processar_cidade(cidade)  # retry real
-            except Exception as e2:
-                self._log(f"❌ Falha definitiva em {cidade}-{self.uf}: {e2}")
-                self.cidades_com_erro.setdefault(self.uf, []).append(cidade)
+            erro = self._erro_watchdog(e)
+            self._log(f"⚠️ Falha em {cidade}-{self.uf}: {erro}")
+            # 🔥 CORREÇÃO — Cada falha conta uma vez: bloqueio já foi para registrar_bloqueio,
+            # parada do usuário e erro de página (permanente) não são culpa do proxy
+            if falha_no_navegador and classificar_erro(erro) not in (PERMANENTE, BLOQUEIO, INTERROMPIDO):
+                self.pool_proxies.registrar_falha(self._proxy)
+
+            # 🔥 NOVO — Sem retry aqui: quem chamou (agendador) decide se a cidade
+            # volta para o fim da fila, com backoff, ou se desiste
+            if erro is not e:
+                raise erro from e
+            raise
 
         finally:
             # 🔥 CORREÇÃO — Fechar navegador completamente
             self._fechar_navegador_completamente()
             
             # 🔥 OTIMIZADO: Cooldown maior no finally
-            cooldown_final = random.uniform(20.0, 35.0)
+            cooldown_final = espera_ritmo("final")
             self._log(f"⏳ Cooldown final de {cooldown_final:.1f}s...")
-            time.sleep(cooldown_final)
+            # 🔥 NOVO — Interrompível, mas sem levantar exceção dentro do finally
+            dormir(cooldown_final, "final", self.stop_flag)
 
             if self.driver:
                 try:
@@ -520,7 +677,66 @@ class AmilBot:
                     pass
                 self.driver = None
                 # 🔥 NOVO — Aguardar mais tempo após fechar navegador
-                time.sleep(random.uniform(5.0, 10.0))
+                dormir(espera_ritmo("apos_fechar"), "apos_fechar", self.stop_flag)
+
+    # ------------------------------------------------------
+    #          PDF (só re-renderiza se a lista mudou)
+    # ------------------------------------------------------
+    def _atualizar_referencia(self, cidade: str, registro: dict | None = None) -> None:
+        try:
+            atual = atualizar_referencia_cidade(self.uf, cidade, self.pasta_base, registro)
+        except Exception as e:
+            self._log(f"⚠️ Não foi possível atualizar a referência de {cidade}-{self.uf}: {e}")
+            return
+        if atual:
+            self._log(f"🗓️ Referência de {cidade}-{self.uf} atualizada para {atual}")
+
+    def _indexar(self, cidade: str, prestadores: list[dict], hash_lista: str) -> None:
+        """Atualiza a cidade no índice de busca (/api/prestadores); falha aqui não derruba a cidade."""
+        try:
+            obter_indice().indexar_cidade(self.uf, cidade, prestadores, hash_lista)
+        except Exception as e:
+            self._log(f"⚠️ Não foi possível indexar {cidade}-{self.uf} para busca: {e}")
+
+    def _gerar_pdf_prestadores(self, cidade: str, prestadores: list[dict]) -> None:
+        mudanca = self.armazem.comparar(self.uf, cidade, prestadores, referencia_atual())
+        self._indexar(cidade, prestadores, mudanca["hash"])
+        caminho_pdf = get_pdf_path(self.uf, cidade, self.pasta_base)
+
+        if mudanca["status"] == INALTERADO and caminho_pdf.exists():
+            self.armazem.confirmar(mudanca)
+            self._log(f"🟰 Lista de {cidade}-{self.uf} inalterada ({mudanca['total_depois']} prestadores) — PDF mantido")
+            self._atualizar_referencia(cidade)
+            return
+
+        with medir("pdf_prestadores", uf=self.uf):
+            self._executar_render(gerar_pdf_prestadores, self.uf, cidade, prestadores, self.pasta_base)
+        # 🔥 NOVO — só grava o hash novo com o PDF pronto (render que falha não vira "inalterado")
+        self.armazem.confirmar(mudanca)
+        self.armazem.definir_referencia(self.uf, cidade, referencia_atual())
+
+        if mudanca["status"] == ALTERADO:
+            self._log(
+                f"📄 PDF regerado: {cidade}-{self.uf} ({len(prestadores)} prestadores, "
+                f"+{len(mudanca['adicionados'])}/-{len(mudanca['removidos'])})"
+            )
+        else:
+            self._log(f"📄 PDF gerado: {cidade}-{self.uf} ({len(prestadores)} prestadores)")
+
+    def _gerar_pdf_sem_especialidade(self, cidade: str) -> None:
+        mudanca = self.armazem.comparar(self.uf, cidade, [], referencia_atual(), sem_especialidade=True)
+        self._indexar(cidade, [], mudanca["hash"])
+        caminho_pdf = get_pdf_path(self.uf, cidade, self.pasta_base)
+
+        if mudanca["status"] == INALTERADO and caminho_pdf.exists():
+            self.armazem.confirmar(mudanca)
+            self._atualizar_referencia(cidade)
+            return
+
+        with medir("pdf_sem_especialidade", uf=self.uf):
+            self._executar_render(gerar_pdf_sem_especialidade, self.uf, cidade, self.pasta_base)
+        self.armazem.confirmar(mudanca)
+        self.armazem.definir_referencia(self.uf, cidade, referencia_atual())
 
     # ------------------------------------------------------
     #                     PASSO 1
@@ -529,75 +745,66 @@ class AmilBot:
         # 🔥 NOVO — Verificar stop_flag antes de começar
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
-        
-        w = self.wait_dropdown
 
         try:
-            w.until(EC.element_to_be_clickable((By.CLASS_NAME, "rw-dropdown-list-input"))).click()
+            self._localizar("dropdown_tipo_rede", 15).click()
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             raise Exception(f"Erro ao clicar em dropdown: {e}")
         
-        delay_humano(0.15, 0.30)
+        delay_humano(0.15, 0.30, self.stop_flag)
         
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
 
         try:
-            w.until(EC.element_to_be_clickable((By.XPATH, "//li[text()='DENTAL']"))).click()
+            self._localizar("opcao", 15, texto="DENTAL").click()
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             raise Exception(f"Erro ao selecionar DENTAL: {e}")
         
-        delay_humano(0.15, 0.25)
+        delay_humano(0.15, 0.25, self.stop_flag)
         
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
 
         try:
-            selects = w.until(EC.presence_of_all_elements_located((By.CLASS_NAME, "rw-btn-select")))
+            selects = self._localizar("botoes_select", 15, "todos")
             selects[1].click()
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             raise Exception(f"Erro ao clicar em selects: {e}")
         
-        delay_humano(0.15, 0.25)
+        delay_humano(0.15, 0.25, self.stop_flag)
         
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
 
         try:
-            plano = w.until(EC.presence_of_element_located((By.XPATH, "//li[text()='Amil Dental Nacional']")))
+            plano = self._localizar("opcao", 15, "presente", texto="Amil Dental Nacional")
             self.driver.execute_script("arguments[0].click();", plano)
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             raise Exception(f"Erro ao selecionar plano: {e}")
         
-        delay_humano(0.18, 0.28)
+        delay_humano(0.18, 0.28, self.stop_flag)
         
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
 
         try:
-            btn = self.wait.until(EC.element_to_be_clickable((By.CLASS_NAME, "test_btn_firststep_submit")))
+            btn = self._localizar("submit_passo1", 25)
             self.driver.execute_script("arguments[0].click();", btn)
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             raise Exception(f"Erro ao clicar em botão submit: {e}")
         
-        delay_humano(0.18, 0.28)
-
-    def _escape_xpath_text(self, text: str) -> str:
-        """Permite usar texto com apóstrofos no XPATH."""
-        if "'" not in text:
-            return f"'{text}'"
-        parts = text.split("'")
-        return "concat(" + ", \"'\", ".join(f"'{p}'" for p in parts) + ")"
+        delay_humano(0.18, 0.28, self.stop_flag)
 
     # ------------------------------------------------------
     #                     PASSO 2
@@ -606,144 +813,140 @@ class AmilBot:
         # 🔥 NOVO — Verificar stop_flag antes de começar
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
-        
-        w = self.wait_dropdown
 
         try:
-            estado = w.until(EC.element_to_be_clickable((By.XPATH, "//label[contains(text(),'Estado')]/following::button[1]")))
+            estado = self._localizar("dropdown_rotulo", 15, rotulo="Estado")
             estado.click()
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             raise Exception(f"Erro ao clicar em Estado: {e}")
         
-        delay_humano(0.15, 0.25)
+        delay_humano(0.15, 0.25, self.stop_flag)
         
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
 
         try:
-            uf_op = w.until(EC.element_to_be_clickable((By.XPATH, f"//li[text()='{self.uf}']")))
+            uf_op = self._localizar("opcao", 15, texto=self.uf)
+            # 🔥 NOVO — Lista já carregada: guardar no cache de opções
+            self.cache_opcoes.registrar_estados(ler_opcoes_abertas(self.driver))
             uf_op.click()
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             raise Exception(f"Erro ao selecionar UF {self.uf}: {e}")
         
-        delay_humano(0.16, 0.28)
+        delay_humano(0.16, 0.28, self.stop_flag)
         
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
 
         try:
-            muni = w.until(EC.element_to_be_clickable((By.XPATH, "//label[contains(text(),'Municipio')]/following::button[1]")))
+            muni = self._localizar("dropdown_rotulo", 15, rotulo="Municipio")
             muni.click()
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             raise Exception(f"Erro ao clicar em Município: {e}")
         
-        delay_humano(0.15, 0.25)
+        delay_humano(0.15, 0.25, self.stop_flag)
         
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
 
-        xpath_cidade = self._escape_xpath_text(cidade)
         try:
-            cidade_op = w.until(
-                EC.element_to_be_clickable((By.XPATH, f"//li[text()={xpath_cidade}]"))
-            )
+            cidade_op = self._localizar("opcao", 15, texto=cidade)
+            # 🔥 NOVO — Lista completa de municípios da UF (detecta novos/removidos)
+            self.cache_opcoes.registrar_municipios(self.uf, ler_opcoes_abertas(self.driver))
             cidade_op.click()
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
+            # 🔥 NOVO — Lista carregou e a cidade não está nela: não adianta repetir
+            municipios = ler_opcoes_abertas(self.driver)
+            if municipios and cidade not in municipios:
+                self.cache_opcoes.registrar_municipios(self.uf, municipios)
+                raise ErroPermanente(f"Município {cidade} não existe no site ({self.uf})")
             raise Exception(f"Erro ao selecionar cidade {cidade}: {e}")
         
-        delay_humano(0.16, 0.28)
+        delay_humano(0.16, 0.28, self.stop_flag)
         
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
 
         try:
-            bairro = w.until(EC.element_to_be_clickable((By.XPATH, "//label[contains(text(),'Bairro')]/following::button[1]")))
+            bairro = self._localizar("dropdown_rotulo", 15, rotulo="Bairro")
             bairro.click()
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             raise Exception(f"Erro ao clicar em Bairro: {e}")
         
-        delay_humano(0.15, 0.25)
+        delay_humano(0.15, 0.25, self.stop_flag)
         
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
 
         try:
-            todos = w.until(EC.element_to_be_clickable((By.XPATH, "//li[text()='TODOS OS BAIRROS']")))
+            todos = self._localizar("opcao", 15, texto="TODOS OS BAIRROS")
             todos.click()
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             raise Exception(f"Erro ao selecionar TODOS OS BAIRROS: {e}")
         
-        delay_humano(0.18, 0.30)
+        delay_humano(0.18, 0.30, self.stop_flag)
         
         if self.stop_flag and self.stop_flag.is_set():
             raise Exception("Execução interrompida pelo usuário")
 
         try:
-            cont = self.wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "button.test_btn_secondstep_submit")))
+            cont = self._localizar("submit_passo2", 25)
             self.driver.execute_script("arguments[0].click();", cont)
         except Exception as e:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             raise Exception(f"Erro ao clicar em botão continuar: {e}")
         
-        delay_humano(0.20, 0.35)
+        delay_humano(0.20, 0.35, self.stop_flag)
 
     # ------------------------------------------------------
     #                     PASSO 3
     # ------------------------------------------------------
     def _passo3(self, cidade: str):
-        w = self.wait_dropdown
-
-        btn = w.until(
-            EC.element_to_be_clickable((By.XPATH, "//label[contains(text(),'Especialidade')]/following::button[1]"))
-        )
+        btn = self._localizar("dropdown_rotulo", 15, rotulo="Especialidade")
         btn.click()
-        delay_humano(0.15, 0.25)
+        delay_humano(0.15, 0.25, self.stop_flag)
 
-        w.until(EC.presence_of_element_located((By.XPATH, "//ul[contains(@id,'listbox')]//li")))
+        self._localizar("opcoes_listbox", 15, "presente")
+        # 🔥 NOVO — Especialidades disponíveis na cidade (próximas execuções pulam sem CLINICA GERAL)
+        self.cache_opcoes.registrar_especialidades(self.uf, cidade, ler_opcoes_abertas(self.driver))
 
-        candidatos = [
-            "//li[text()='CLINICA GERAL']",
-            "//li[contains(text(),'CLÍNICA GERAL')]",
-            "//li[contains(text(),'CLINICA GERAL')]",
-        ]
+        # 🔥 NOVO — Todas as variantes numa única espera de 2s (antes: 2s por candidato)
+        try:
+            op = self._localizar("clinica_geral", 2)
+        except Exception:
+            op = None
 
-        op = None
-        for xp in candidatos:
-            try:
-                op = WebDriverWait(self.driver, 2).until(
-                    EC.element_to_be_clickable((By.XPATH, xp))
-                )
-                break
-            except:
-                continue
+        # 🔥 NOVO — Espera interrompida não significa "sem especialidade"
+        if self.stop_flag and self.stop_flag.is_set():
+            raise Exception("Execução interrompida pelo usuário")
 
         if not op:
             self._log(f"⚠️ Especialidade não encontrada em {cidade}-{self.uf}")
-            gerar_pdf_sem_especialidade(self.uf, cidade, self.pasta_base)
+            self._gerar_pdf_sem_especialidade(cidade)
             raise Exception("Especialidade não encontrada")
 
         self.driver.execute_script("arguments[0].scrollIntoView();", op)
-        delay_humano(0.15, 0.25)
+        delay_humano(0.15, 0.25, self.stop_flag)
 
         try:
             op.click()
         except:
             self.driver.execute_script("arguments[0].click();", op)
 
-        delay_humano(0.20, 0.30)
+        delay_humano(0.20, 0.30, self.stop_flag)
 
     # ------------------------------------------------------
     #          BUSCAR + CAPTURAR RESULTADOS
@@ -753,8 +956,6 @@ class AmilBot:
         Tentativa REAL inicial (tempo padrão).
         Se falhar, entra no retry com restart progressivo.
         """
-        from selenium.webdriver.common.by import By
-        from selenium.webdriver.common.keys import Keys
         import time as time_module
         
         # 🔥 NOVO — Timeout máximo total para evitar travamento infinito
@@ -778,7 +979,7 @@ class AmilBot:
             # Verificar bloqueio antes de buscar
             if self._verificar_bloqueio():
                 self._log("⚠️ Bloqueio detectado antes de buscar!")
-                raise Exception("Bloqueio detectado")
+                raise ErroBloqueio("Bloqueio detectado")
 
             # 🔥 NOVO — Verificar stop_flag antes de clicar
             if self.stop_flag and self.stop_flag.is_set():
@@ -786,20 +987,13 @@ class AmilBot:
 
             # 🔥 CORREÇÃO — Timeout menor e verificação de stop_flag durante espera
             try:
-                btn = WebDriverWait(self.driver, 10).until(
-                    lambda d: (
-                        self.stop_flag.is_set() if self.stop_flag and self.stop_flag.is_set() else
-                        EC.element_to_be_clickable((By.CLASS_NAME, "test_btn_thirdstep_submit"))(d)
-                    )
-                )
-                if self.stop_flag and self.stop_flag.is_set():
-                    raise Exception("Execução interrompida pelo usuário")
+                btn = self._localizar("submit_passo3", 10)
             except Exception as e:
                 if "interrompida" in str(e):
                     raise
                 # Se não encontrou o botão, tentar encontrar de outra forma
                 try:
-                    btn = self.driver.find_element(By.CLASS_NAME, "test_btn_thirdstep_submit")
+                    btn = self.localizadores.encontrar(self.driver, "submit_passo3")
                 except:
                     raise Exception("Botão de buscar não encontrado")
             
@@ -808,7 +1002,7 @@ class AmilBot:
                 from selenium.webdriver.common.action_chains import ActionChains
                 actions = ActionChains(self.driver)
                 actions.move_to_element(btn).perform()
-                time.sleep(random.uniform(0.3, 0.7))
+                self._dormir(espera_ritmo("movimento_humano"), "movimento_humano")
             except:
                 pass
             
@@ -816,12 +1010,23 @@ class AmilBot:
             if self.stop_flag and self.stop_flag.is_set():
                 raise Exception("Execução interrompida pelo usuário")
             
+            # 🔥 NOVO — Só interessam as respostas de rede posteriores ao clique
+            captura = CapturaRede(self.driver) if CAPTURA_REDE_ATIVA else None
+            if captura and not captura.descartar():
+                captura = None
+
             self.driver.execute_script("arguments[0].click();", btn)
 
+            # 🔥 NOVO — Lista completa direto do XHR (sem scroll nem DOM)
+            if captura:
+                prestadores = self._capturar_da_rede(captura)
+                if prestadores is not None:
+                    return prestadores
+
             self._log("⏳ Aguardando resultados aparecerem...")
 
             # Aguardar mais tempo para JavaScript carregar
-            time.sleep(random.uniform(3.0, 5.0))
+            self._dormir(espera_ritmo("aguardar_resultados"), "aguardar_resultados")
 
             # 🔥 NOVO — Verificar stop_flag durante espera
             if self.stop_flag and self.stop_flag.is_set():
@@ -834,23 +1039,16 @@ class AmilBot:
             # Verificar bloqueio após buscar
             if self._verificar_bloqueio():
                 self._log("⚠️ Bloqueio detectado após buscar!")
-                raise Exception("Bloqueio após buscar")
+                raise ErroBloqueio("Bloqueio após buscar")
 
             # 🔥 NOVO — Aguardar um pouco mais para JavaScript carregar
-            time.sleep(2)
+            self._dormir(espera_ritmo("resultados_dom"), "aguardar_resultados")
 
             # 🔥 NOVO — Verificar se há mensagem de "sem resultados"
             try:
                 # Verificar se aparece mensagem de "nenhum resultado encontrado"
-                mensagens_sem_resultado = [
-                    "//*[contains(text(), 'nenhum resultado')]",
-                    "//*[contains(text(), 'Nenhum resultado')]",
-                    "//*[contains(text(), 'não encontrado')]",
-                    "//*[contains(text(), 'Não encontrado')]",
-                ]
-                for xpath in mensagens_sem_resultado:
+                for elemento in self.localizadores.encontrar_todos(self.driver, "sem_resultado"):
                     try:
-                        elemento = self.driver.find_element(By.XPATH, xpath)
                         if elemento.is_displayed():
                             self._log("⚠️ Site retornou mensagem de 'sem resultados'")
                             return []
@@ -861,107 +1059,51 @@ class AmilBot:
 
             # 🔥 CORREÇÃO — Timeout menor e verificação de stop_flag
             try:
-                WebDriverWait(self.driver, 15).until(  # Reduzido de 20 para 15
-                    lambda d: (
-                        self.stop_flag.is_set() if self.stop_flag and self.stop_flag.is_set() else
-                        EC.any_of(
-                            EC.presence_of_element_located((By.ID, "result-legend")),
-                            EC.presence_of_element_located((By.CLASS_NAME, "accredited-network__result")),
-                        )(d)
-                    )
-                )
-                if self.stop_flag and self.stop_flag.is_set():
-                    raise Exception("Execução interrompida pelo usuário")
+                self._localizar("indicador_resultados", 15, "presente")  # Reduzido de 20 para 15
             except Exception as e:
                 if "interrompida" in str(e):
                     raise
                 self._log("⚠️ Timeout aguardando indicadores de resultado")
 
-            # 🔥 NOVO — Fazer scroll para carregar resultados (scroll infinito)
-            try:
-                # Scroll até o final da página para carregar todos os resultados
-                last_height = self.driver.execute_script("return document.body.scrollHeight")
-                scroll_attempts = 0
-                max_scrolls = 5
-                
-                while scroll_attempts < max_scrolls:
-                    # 🔥 NOVO — Verificar timeout máximo e stop_flag durante scroll
-                    if time_module.time() - inicio_captura > timeout_maximo_total:
-                        self._log("⚠️ Timeout máximo atingido durante scroll")
-                        break
-                    
-                    if self.stop_flag and self.stop_flag.is_set():
-                        raise Exception("Execução interrompida pelo usuário")
-                    
-                    # Scroll para baixo
-                    self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(1.5)  # Aguardar carregar
-                    
-                    # Verificar se a página cresceu (novos resultados carregados)
-                    new_height = self.driver.execute_script("return document.body.scrollHeight")
-                    if new_height == last_height:
-                        break  # Não há mais conteúdo para carregar
-                    last_height = new_height
-                    scroll_attempts += 1
-                
-                # Scroll de volta para o topo
-                self.driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(0.5)
-            except Exception as e:
-                if "interrompida" in str(e):
-                    raise
-                self._log(f"⚠️ Erro ao fazer scroll: {e}")
-
             # 🔥 CORREÇÃO — Timeout menor e não bloquear se não encontrar
             try:
-                WebDriverWait(self.driver, 10).until(  # Reduzido de 20 para 10
-                    lambda d: (
-                        self.stop_flag.is_set() if self.stop_flag and self.stop_flag.is_set() else
-                        EC.presence_of_element_located((By.CLASS_NAME, "accredited-network__result"))(d)
-                    )
-                )
-                if self.stop_flag and self.stop_flag.is_set():
-                    raise Exception("Execução interrompida pelo usuário")
+                self._localizar("bloco_resultado", 10, "presente")  # Reduzido de 20 para 10
             except Exception as e:
                 if "interrompida" in str(e):
                     raise
                 self._log("⚠️ Timeout aguardando blocos de resultado - continuando mesmo assim")
 
-            # 🔥 NOVO — Tentar múltiplos seletores (caso a classe tenha mudado)
-            blocos = []
-            seletores = [
-                (By.CLASS_NAME, "accredited-network__result"),
-                (By.CSS_SELECTOR, "[class*='accredited-network']"),
-                (By.CSS_SELECTOR, "[class*='result']"),
-            ]
-            
-            for by, selector in seletores:
-                try:
-                    blocos = self.driver.find_elements(by, selector)
-                    if blocos:
-                        self._log(f"✅ Encontrados {len(blocos)} blocos com seletor: {selector}")
-                        break
-                except:
-                    continue
+            # 🔥 NOVO — Paginação: carrega e extrai segmento a segmento até o total anunciado
+            with medir("extrair_prestadores", uf=self.uf):
+                prestadores, info = self._paginar(prazo=time.monotonic() + max(
+                    timeout_maximo_total - (time_module.time() - inicio_captura), 0
+                ))
 
-            # 🔥 NOVO — Debug: salvar screenshot se não encontrar resultados
-            if not blocos:
-                try:
-                    screenshot_path = f"debug_no_results_{self.uf}_{self._current_city}.png"
-                    self.driver.save_screenshot(screenshot_path)
-                    self._log(f"📸 Screenshot salvo para debug: {screenshot_path}")
-                    
-                    # Salvar HTML da página para análise
-                    html_path = f"debug_no_results_{self.uf}_{self._current_city}.html"
-                    with open(html_path, "w", encoding="utf-8") as f:
-                        f.write(self.driver.page_source)
-                    self._log(f"📄 HTML salvo para debug: {html_path}")
-                except:
-                    pass
+            if prestadores:
+                self._log(
+                    f"✅ Resultados carregados na tentativa inicial ({info['extraidos']} prestadores, "
+                    f"{info['segmentos']} segmentos)."
+                )
+                if not info["completo"]:
+                    self._log(
+                        f"⚠️ Captura incompleta: {info['extraidos']} de {info['total_anunciado']} "
+                        f"resultados anunciados"
+                    )
+                return prestadores
 
-            if blocos:
-                self._log(f"✅ Resultados carregados na tentativa inicial ({len(blocos)} blocos).")
-                return self._extrair_prestadores(blocos)
+            # 🔥 NOVO — Debug: salvar screenshot se não encontrar resultados
+            try:
+                screenshot_path = f"debug_no_results_{self.uf}_{self._current_city}.png"
+                self.driver.save_screenshot(screenshot_path)
+                self._log(f"📸 Screenshot salvo para debug: {screenshot_path}")
+                
+                # Salvar HTML da página para análise
+                html_path = f"debug_no_results_{self.uf}_{self._current_city}.html"
+                with open(html_path, "w", encoding="utf-8") as f:
+                    f.write(self.driver.page_source)
+                self._log(f"📄 HTML salvo para debug: {html_path}")
+            except:
+                pass
 
             # nenhum bloco, mas tentativa feita → cai para retry
             self._log("⚠️ Nenhum bloco encontrado na tentativa inicial.")
@@ -992,8 +1134,6 @@ class AmilBot:
         
         self._log("🔁 Iniciando tentativas com restart progressivo...")
 
-        from selenium.webdriver.common.by import By
-
         tentativas = [15, 25, 45, 60]  # 🔥 Aumentado tempos de espera
 
         for idx, espera in enumerate(tentativas, start=1):
@@ -1009,62 +1149,91 @@ class AmilBot:
             # ... resto do código de retry ...
 
 
+    def _capturar_da_rede(self, captura: CapturaRede) -> list[dict] | None:
+        """
+        Prestadores lidos da resposta da API de resultados.
+        None quando nenhuma resposta compatível apareceu (→ extração pelo DOM).
+        """
+        with medir("capturar_rede", uf=self.uf):
+            resposta = captura.aguardar(timeout=15, stop_flag=self.stop_flag)
+
+        if resposta is None:
+            self._log("📡 Resposta da API de resultados não encontrada — usando o DOM")
+            return None
+
+        if resposta["status"] in self.detector_bloqueio.status_bloqueio:
+            self._log(f"⚠️ Bloqueio detectado na API de resultados (HTTP {resposta['status']})")
+            self.pool_proxies.registrar_bloqueio(self._proxy)
+            raise ErroBloqueio("Bloqueio após buscar")
+        if resposta["status"] and resposta["status"] >= 400:
+            self._log(f"⚠️ API de resultados respondeu HTTP {resposta['status']} — usando o DOM")
+            return None
+
+        prestadores = resposta["prestadores"]
+        # 🔥 CORREÇÃO — Só aceita captura completa: parcial (paginada) ou sem lista → DOM/_paginar
+        if not resposta["completa"]:
+            if resposta["reconhecida"]:
+                self._log(f"📡 API declarou {resposta['total']} resultados, recebidos {resposta['recebidos']} "
+                          f"— usando o DOM (paginação)")
+            else:
+                self._log("📡 Resposta da API sem lista de prestadores reconhecível — usando o DOM")
+            return None
+        self._log(f"📡 {len(prestadores)} prestadores lidos da resposta da API")
+        return prestadores
+
+    def _paginar(self, prazo: float | None = None) -> tuple[list[dict], dict]:
+        """Extração incremental pelo DOM, até o total anunciado (ver scraper/paginacao.py)."""
+        reg = self.localizadores
+        total = ler_total_anunciado(self.driver, reg.seletores_css("legenda_resultados"))
+        paginador = Paginador(
+            self.driver,
+            reg.seletores_css("bloco_resultado"),
+            {campo: reg.seletores_css(f"bloco_{campo}") for campo in ("nome", "endereco", "bairro", "telefone")},
+            seletores_proxima=reg.seletores_css("proxima_pagina"),
+            stop_flag=self.stop_flag,
+            log=self._log,
+        )
+        try:
+            return paginador.executar(total, prazo)
+        except Exception as e:
+            if "interrompida" in str(e):
+                raise
+            self._log(f"⚠️ Paginação falhou ({e}) — extraindo só os blocos visíveis")
+            prestadores = self._extrair_prestadores(reg.encontrar_todos(self.driver, "bloco_resultado"))
+            return prestadores, {
+                "total_anunciado": total,
+                "extraidos": len(prestadores),
+                "segmentos": 1,
+                "completo": total is None or len(prestadores) >= total,
+            }
+
     def _extrair_prestadores(self, blocos):
         prestadores = []
-        from selenium.webdriver.common.by import By
 
         for b in blocos:
             try: 
-                nome = b.find_element(By.TAG_NAME, "h3").text.strip()
+                nome = self.localizadores.encontrar(b, "bloco_nome").text.strip()
             except: 
                 nome = "NOME NÃO ENCONTRADO"
 
             try: 
-                endereco = b.find_element(
-                    By.CSS_SELECTOR,
-                    ".accredited-network__result__address-name p:nth-child(1)"
-                ).text.strip()
+                endereco = self.localizadores.encontrar(b, "bloco_endereco").text.strip()
             except: 
                 endereco = "ENDEREÇO NÃO ENCONTRADO"
 
             try: 
-                bairro = b.find_element(
-                    By.CSS_SELECTOR,
-                    ".accredited-network__result__neighbourhood p"
-                ).text.strip()
+                bairro = self.localizadores.encontrar(b, "bloco_bairro").text.strip()
             except: 
                 bairro = "BAIRRO NÃO ENCONTRADO"
 
             try: 
-                telefone = b.find_element(
-                    By.CSS_SELECTOR,
-                    ".accredited-network__result__address-name p:nth-child(3)"
-                ).text.strip()
+                telefone = self.localizadores.encontrar(b, "bloco_telefone").text.strip()
             except: 
                 telefone = "TELEFONE NÃO ENCONTRADO"
 
             # 🔥 VALIDAÇÃO: só adiciona se for prestador válido
-            textos_invalidos = [
-                "NOME NÃO ENCONTRADO",
-                "ENDEREÇO NÃO ENCONTRADO",
-                "Sua busca não localizou nenhum prestador",
-                "nenhum prestador",
-                "Nenhum prestador",
-                "Legenda de ícones",
-                "",
-            ]
-            
-            # Validar se é prestador válido
-            if (nome not in textos_invalidos and 
-                endereco not in textos_invalidos and
-                len(nome) > 3 and
-                len(endereco) > 5):
-                
-                prestadores.append({
-                    "nome": nome,
-                    "endereco": endereco,
-                    "bairro": bairro if bairro != "BAIRRO NÃO ENCONTRADO" else "",
-                    "telefone": telefone if telefone != "TELEFONE NÃO ENCONTRADO" else "",
-                })
+            prestador = normalizar_prestador(nome, endereco, bairro, telefone)
+            if prestador:
+                prestadores.append(prestador)
 
         return prestadores
\ No newline at end of file
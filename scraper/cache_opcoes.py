@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+from utils.file_manager import OUTPUT_DIR
+
+# =====================================================
+# 🔹 Cache das listas dos dropdowns (estados, municípios, especialidades)
+# =====================================================
+# Cada vez que um dropdown é aberto a lista inteira é lida (um execute_script)
+# e guardada com timestamp. Serve para:
+# - pular cidades sem CLINICA GERAL (PDF sem especialidade direto, sem navegador)
+# - achar municípios novos/removidos em relação ao estados_cidades_amil.json
+ARQUIVO_CACHE = OUTPUT_DIR / "cache_opcoes.json"
+TTL_PADRAO_SEG = float(os.getenv("AMIL_CACHE_OPCOES_TTL_HORAS", "168")) * 3600  # 7 dias
+
+ESPECIALIDADE_ALVO = "CLINICA GERAL"
+
+# Lê todas as opções do listbox aberto numa única ida ao navegador
+SCRIPT_OPCOES = """
+return Array.from(document.querySelectorAll("ul[id*='listbox'] li"))
+    .map(li => li.textContent.trim())
+    .filter(t => t.length > 0);
+"""
+
+
+def _normalizar(texto: str) -> str:
+    """CLÍNICA GERAL == CLINICA GERAL (sem acento, maiúsculas)."""
+    sem_acento = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sem_acento.upper().split())
+
+
+def ler_opcoes_abertas(driver) -> list[str]:
+    """Textos das opções do dropdown aberto ([] se não der para ler)."""
+    try:
+        return driver.execute_script(SCRIPT_OPCOES) or []
+    except Exception:
+        return []
+
+
+class CacheOpcoes:
+    """Listas dos dropdowns por UF/cidade, com expiração (TTL)."""
+
+    def __init__(self, caminho: Path | None = ARQUIVO_CACHE, ttl_seg: float = TTL_PADRAO_SEG) -> None:
+        self.caminho = caminho
+        self.ttl_seg = ttl_seg
+        self._lock = threading.Lock()
+        self._dados = {"estados": None, "municipios": {}, "especialidades": {}}
+        self._carregar()
+
+    # ---------------------- persistência ----------------------
+
+    def _ler_arquivo(self) -> dict:
+        if not self.caminho or not self.caminho.exists():
+            return {}
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _carregar(self) -> None:
+        salvos = self._ler_arquivo()
+        self._dados["estados"] = salvos.get("estados")
+        self._dados["municipios"] = salvos.get("municipios", {})
+        self._dados["especialidades"] = salvos.get("especialidades", {})
+
+    @staticmethod
+    def _mais_recente(a: dict | None, b: dict | None) -> dict | None:
+        if not a:
+            return b
+        if not b:
+            return a
+        return a if a["atualizado_em"] >= b["atualizado_em"] else b
+
+    def salvar(self) -> None:
+        """Grava mesclando com o arquivo (outros processos podem ter atualizado)."""
+        if not self.caminho:
+            return
+        with self._lock:
+            existentes = self._ler_arquivo()
+            dados = {
+                "estados": self._mais_recente(self._dados["estados"], existentes.get("estados")),
+                "municipios": dict(existentes.get("municipios", {})),
+                "especialidades": {
+                    uf: dict(cidades) for uf, cidades in existentes.get("especialidades", {}).items()
+                },
+            }
+            for uf, registro in self._dados["municipios"].items():
+                dados["municipios"][uf] = self._mais_recente(registro, dados["municipios"].get(uf))
+            for uf, cidades in self._dados["especialidades"].items():
+                destino = dados["especialidades"].setdefault(uf, {})
+                for cidade, registro in cidades.items():
+                    destino[cidade] = self._mais_recente(registro, destino.get(cidade))
+            self._dados = dados
+            try:
+                self.caminho.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.caminho.with_suffix(".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(dados, f, ensure_ascii=False, indent=2)
+                os.replace(tmp, self.caminho)
+            except Exception as e:
+                print(f"⚠️ Não foi possível salvar o cache de opções: {e}")
+
+    # ---------------------- registro ----------------------
+
+    def _valido(self, registro: dict | None) -> list[str] | None:
+        if not registro or not registro.get("lista"):
+            return None
+        if time.time() - registro["atualizado_em"] > self.ttl_seg:
+            return None
+        return registro["lista"]
+
+    def registrar_estados(self, lista: list[str]) -> None:
+        if lista:
+            with self._lock:
+                self._dados["estados"] = {"lista": lista, "atualizado_em": time.time()}
+            self.salvar()
+
+    def registrar_municipios(self, uf: str, lista: list[str]) -> None:
+        if lista:
+            with self._lock:
+                self._dados["municipios"][uf] = {"lista": lista, "atualizado_em": time.time()}
+            self.salvar()
+
+    def registrar_especialidades(self, uf: str, cidade: str, lista: list[str]) -> None:
+        if lista:
+            with self._lock:
+                self._dados["especialidades"].setdefault(uf, {})[cidade] = {
+                    "lista": lista, "atualizado_em": time.time(),
+                }
+            self.salvar()
+
+    # ---------------------- consulta ----------------------
+
+    def municipios(self, uf: str) -> list[str] | None:
+        """Municípios do site para a UF (None se nunca visto ou expirado)."""
+        with self._lock:
+            return self._valido(self._dados["municipios"].get(uf))
+
+    def especialidades(self, uf: str, cidade: str) -> list[str] | None:
+        with self._lock:
+            return self._valido(self._dados["especialidades"].get(uf, {}).get(cidade))
+
+    def sem_especialidade(self, uf: str, cidade: str, especialidade: str = ESPECIALIDADE_ALVO) -> bool:
+        """
+        True só quando o cache (válido) confirma que a cidade não tem a especialidade.
+        Mesmo critério do localizador "clinica_geral" (opção que CONTÉM o texto),
+        senão uma opção como "CLINICA GERAL ADULTO" viraria PDF sem especialidade.
+        """
+        lista = self.especialidades(uf, cidade)
+        if lista is None:
+            return False
+        alvo = _normalizar(especialidade)
+        return not any(alvo in _normalizar(op) for op in lista)
+
+    def diferencas(self, mapa: dict[str, list[str]]) -> dict[str, dict[str, list[str]]]:
+        """
+        Municípios novos (no site, fora do mapa) e removidos (no mapa, fora do site)
+        por UF — só para UFs com lista válida no cache.
+        """
+        diferencas = {}
+        for uf, cidades in mapa.items():
+            site = self.municipios(uf)
+            if site is None:
+                continue
+            novos = sorted(set(site) - set(cidades))
+            removidos = sorted(set(cidades) - set(site))
+            if novos or removidos:
+                diferencas[uf] = {"novos": novos, "removidos": removidos}
+        return diferencas
+
+
+_cache_padrao: CacheOpcoes | None = None
+_lock_cache = threading.Lock()
+
+
+def obter_cache() -> CacheOpcoes:
+    """Cache único do processo."""
+    global _cache_padrao
+    with _lock_cache:
+        if _cache_padrao is None:
+            _cache_padrao = CacheOpcoes()
+        return _cache_padrao
@@ -0,0 +1,201 @@
+import base64
+import json
+import os
+import re
+import time
+
+# =====================================================
+# 🔹 Captura da resposta XHR que popula os resultados
+# =====================================================
+# Com o log de performance do Chrome ligado, cada resposta de rede aparece
+# como evento CDP Network.responseReceived. Depois do clique em "buscar",
+# procura a resposta JSON da API de prestadores e lê o corpo direto com
+# Network.getResponseBody — sem scroll, sem lazy loading, sem parse do DOM.
+
+# 🔥 NOVO — Desligar com AMIL_CAPTURA_REDE=0 (volta a extrair só pelo DOM)
+CAPTURA_REDE_ATIVA = os.getenv("AMIL_CAPTURA_REDE", "1") != "0"
+
+# Captura incompleta (só parte das páginas): espera tanto sem resposta nova e desiste
+SILENCIO_SEG = 3.0
+
+# Regex da URL da API de resultados (o mock local usa /mock-api/prestadores)
+PADRAO_URL_RESULTADOS = os.getenv(
+    "AMIL_PADRAO_API_RESULTADOS", r"prestador|accredited-?network|rede-?credenciada"
+)
+
+CAMPOS = {
+    "nome": ["nome", "name", "nomeprestador", "nomefantasia", "razaosocial", "descricao"],
+    "endereco": ["endereco", "logradouro", "address", "enderecocompleto"],
+    "bairro": ["bairro", "neighbourhood", "neighborhood", "district"],
+    "telefone": ["telefone", "telefones", "phone", "fone", "telefoneprincipal"],
+}
+
+
+def _normalizar_chave(chave: str) -> str:
+    return re.sub(r"[^a-z]", "", chave.lower())
+
+
+def _valor_campo(item: dict, campo: str) -> str:
+    chaves = {_normalizar_chave(k): v for k, v in item.items()}
+    for alias in CAMPOS[campo]:
+        valor = chaves.get(alias)
+        if valor is None:
+            continue
+        if isinstance(valor, dict):
+            valor = ", ".join(str(v) for v in valor.values() if v not in (None, ""))
+        elif isinstance(valor, list):
+            valor = " / ".join(str(v) for v in valor if v not in (None, ""))
+        return str(valor).strip()
+    return ""
+
+
+def _listas_de_dicts(dados):
+    """Todas as listas de objetos dentro do JSON (em qualquer nível)."""
+    if isinstance(dados, list):
+        if dados and all(isinstance(i, dict) for i in dados):
+            yield dados
+        for item in dados:
+            yield from _listas_de_dicts(item)
+    elif isinstance(dados, dict):
+        for valor in dados.values():
+            yield from _listas_de_dicts(valor)
+
+
+def _lista_prestadores(dados) -> list[dict]:
+    """A maior lista de objetos do JSON que tenha campo de nome."""
+    candidatas = [lista for lista in _listas_de_dicts(dados) if _valor_campo(lista[0], "nome")]
+    return max(candidatas, key=len) if candidatas else []
+
+
+def extrair_prestadores_json(dados) -> list[dict]:
+    """Lista de prestadores do JSON, normalizada para o formato da extração do DOM."""
+    prestadores = []
+    for item in _lista_prestadores(dados):
+        nome = _valor_campo(item, "nome")
+        endereco = _valor_campo(item, "endereco")
+        # Mesma validação da extração pelo DOM
+        if len(nome) > 3 and len(endereco) > 5:
+            prestadores.append({
+                "nome": nome,
+                "endereco": endereco,
+                "bairro": _valor_campo(item, "bairro"),
+                "telefone": _valor_campo(item, "telefone"),
+            })
+    return prestadores
+
+
+def _completa(capturado: dict) -> bool:
+    """
+    Só vale a captura que prova estar completa: total declarado 0, ou lista
+    de prestadores reconhecida com todos os declarados recebidos (sem total
+    declarado, a lista reconhecida é tomada como inteira).
+    """
+    if capturado["total"] == 0:
+        return True
+    return capturado["reconhecida"] and (capturado["total"] is None or capturado["recebidos"] >= capturado["total"])
+
+
+def _total_declarado(dados) -> int | None:
+    if isinstance(dados, dict):
+        for chave in ("total", "totalElements", "totalRegistros", "count"):
+            if isinstance(dados.get(chave), int):
+                return dados[chave]
+    return None
+
+
+class CapturaRede:
+    """Lê do log de performance as respostas da API de resultados de uma busca."""
+
+    def __init__(self, driver, padrao_url: str = PADRAO_URL_RESULTADOS) -> None:
+        self.driver = driver
+        self.padrao_url = re.compile(padrao_url, re.IGNORECASE)
+
+    def _eventos(self) -> list[dict]:
+        eventos = []
+        for entrada in self.driver.get_log("performance"):
+            try:
+                eventos.append(json.loads(entrada["message"])["message"])
+            except (KeyError, ValueError):
+                continue
+        return eventos
+
+    def descartar(self) -> bool:
+        """
+        Esvazia o log antes do clique (só interessam respostas da busca).
+        False se o navegador não tem log de performance — aí nem vale esperar.
+        """
+        try:
+            self.driver.get_log("performance")
+            return True
+        except Exception:
+            return False
+
+    def _corpo(self, request_id: str):
+        resposta = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        corpo = resposta.get("body", "")
+        if resposta.get("base64Encoded"):
+            corpo = base64.b64decode(corpo).decode("utf-8", errors="replace")
+        return json.loads(corpo)
+
+    def aguardar(self, timeout: float = 15, stop_flag=None) -> dict | None:
+        """
+        Espera a(s) resposta(s) da API após a busca.
+
+        Retorna {"status", "url", "prestadores", "total", "recebidos", "reconhecida", "completa"}
+        ou None se nenhuma resposta compatível apareceu no prazo (→ fallback para o DOM).
+        Respostas paginadas são acumuladas até atingir o total declarado; se o
+        total não chega (só a 1ª página veio), sai após SILENCIO_SEG sem resposta
+        nova, com completa=False.
+        """
+        pendentes: dict[str, dict] = {}
+        prestadores: list[dict] = []
+        vistos = set()
+        capturado = None
+        limite = time.monotonic() + timeout
+        ultima_resposta = time.monotonic()
+
+        while time.monotonic() < limite:
+            if stop_flag is not None and stop_flag.is_set():
+                raise Exception("Execução interrompida pelo usuário")
+
+            for evento in self._eventos():
+                metodo = evento.get("method")
+                params = evento.get("params", {})
+                if metodo == "Network.responseReceived":
+                    resposta = params.get("response", {})
+                    if (self.padrao_url.search(resposta.get("url", ""))
+                            and "json" in resposta.get("mimeType", "").lower()):
+                        pendentes[params["requestId"]] = {
+                            "url": resposta.get("url"), "status": resposta.get("status"),
+                        }
+                elif metodo == "Network.loadingFinished" and params.get("requestId") in pendentes:
+                    info = pendentes.pop(params["requestId"])
+                    if info["status"] and info["status"] >= 400:
+                        # Erro/bloqueio na API: quem chamou decide (sem corpo útil)
+                        return {**info, "prestadores": [], "total": None, "recebidos": 0,
+                                "reconhecida": False, "completa": False}
+                    try:
+                        dados = self._corpo(params["requestId"])
+                    except Exception:
+                        continue  # corpo indisponível → não conta como captura
+                    ultima_resposta = time.monotonic()
+                    capturado = capturado or {**info, "prestadores": prestadores, "total": None,
+                                              "recebidos": 0, "reconhecida": False}
+                    if capturado["total"] is None:
+                        capturado["total"] = _total_declarado(dados)
+                    lista = _lista_prestadores(dados)
+                    capturado["reconhecida"] = capturado["reconhecida"] or bool(lista)
+                    capturado["recebidos"] += len(lista)
+                    for p in extrair_prestadores_json(dados):
+                        chave = (p["nome"], p["endereco"])
+                        if chave not in vistos:
+                            vistos.add(chave)
+                            prestadores.append(p)
+
+            if capturado and _completa(capturado):
+                return {**capturado, "completa": True}
+            if capturado and time.monotonic() - ultima_resposta >= SILENCIO_SEG:
+                break  # as outras páginas não vêm sozinhas (o site pagina no clique)
+            time.sleep(0.25)
+
+        return {**capturado, "completa": False} if capturado else None
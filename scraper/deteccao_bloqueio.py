@@ -0,0 +1,181 @@
+import json
+import os
+import re
+
+from selenium.webdriver.common.by import By
+
+# =====================================================
+# 🔹 Detecção de bloqueio/captcha em uma única ida ao navegador
+# =====================================================
+# Em vez de baixar o page_source inteiro (scripts, estilos, JSON embutido)
+# e varrer substring por substring, um script injetado olha só o texto
+# visível, os iframes e o status HTTP da navegação e devolve um veredito
+# pequeno. As assinaturas são frases inteiras (com limite de palavra), para
+# que "verificação" no meio do texto normal da página não conte como bloqueio.
+
+ASSINATURAS_PADRAO = {
+    "captcha": [
+        "captcha",
+        "não sou um robô",
+        "você não é um robô",
+        "i'm not a robot",
+    ],
+    "verificacao": [
+        "verificação de segurança",
+        "verifique se você é humano",
+        "verify you are human",
+        "checking your browser",
+    ],
+    "bloqueio": [
+        "acesso negado",
+        "access denied",
+        "acesso bloqueado",
+        "ip bloqueado",
+        "seu ip foi bloqueado",
+        "temporariamente bloqueado",
+        "acesso suspenso",
+        "temporariamente suspenso",
+    ],
+    "rate_limit": [
+        "too many requests",
+        "rate limit",
+        "rate limited",
+        "muitas requisições",
+        "muitas solicitações",
+    ],
+}
+
+IFRAMES_PADRAO = ["recaptcha", "hcaptcha", "captcha", "challenges.cloudflare.com"]
+
+STATUS_BLOQUEIO_PADRAO = [403, 429]
+
+# Arquivo JSON opcional com {"assinaturas": {...}, "iframes": [...], "status": [...]}
+ARQUIVO_ASSINATURAS = os.getenv("AMIL_ASSINATURAS_BLOQUEIO")
+
+_SCRIPT_VEREDITO = """
+const padrao = new RegExp(arguments[0], 'iu');
+const padraoIframe = new RegExp(arguments[1], 'i');
+const veredito = {iframe: null, status: null, motivo: null, trecho: null};
+
+for (const f of document.querySelectorAll('iframe[src]')) {
+    if (padraoIframe.test(f.src)) { veredito.iframe = f.src.slice(0, 120); break; }
+}
+try {
+    const nav = performance.getEntriesByType('navigation')[0];
+    if (nav && nav.responseStatus) veredito.status = nav.responseStatus;
+} catch (e) {}
+
+const texto = document.body ? document.body.innerText : '';
+const m = padrao.exec(texto);
+if (m) {
+    for (const [nome, valor] of Object.entries(m.groups || {})) {
+        if (valor !== undefined) { veredito.motivo = nome; break; }
+    }
+    veredito.trecho = m[0];
+}
+return veredito;
+"""
+
+
+_ESPECIAIS = re.compile(r"([\\^$.*+?()\[\]{}|/])")
+
+
+def _frase_para_regex(frase: str) -> str:
+    """
+    Frase literal → regex tolerante a espaços múltiplos/quebras de linha.
+    Escapa só o que é especial nas duas sintaxes (o JS com flag u rejeita
+    escapes desnecessários como os que re.escape gera).
+    """
+    return r"\s+".join(_ESPECIAIS.sub(r"\\\1", parte) for parte in frase.split())
+
+
+class DetectorBloqueio:
+    """
+    Assinaturas pré-compiladas (uma regex com um grupo nomeado por categoria).
+
+    - verificar(driver): uma chamada execute_script → veredito
+    - classificar_texto(texto): mesma regra em Python (fallback / testes)
+    """
+
+    def __init__(self,
+                 assinaturas: dict[str, list[str]] | None = None,
+                 iframes: list[str] | None = None,
+                 status_bloqueio: list[int] | None = None) -> None:
+        self.assinaturas = assinaturas or ASSINATURAS_PADRAO
+        self.iframes = iframes or IFRAMES_PADRAO
+        self.status_bloqueio = set(status_bloqueio or STATUS_BLOQUEIO_PADRAO)
+
+        grupos = {
+            categoria: "|".join(_frase_para_regex(f) for f in sorted(frases, key=len, reverse=True))
+            for categoria, frases in self.assinaturas.items() if frases
+        }
+        # Limite de palavra que entende acentos: \b do JS é só ASCII, então
+        # usa lookarounds com \p{L} (flag u). No Python \b já é Unicode.
+        self._fonte_js = "|".join(
+            f"(?<{c}>(?<![\\p{{L}}\\d])(?:{g})(?![\\p{{L}}\\d]))" for c, g in grupos.items()
+        )
+        self._regex_py = re.compile(
+            "|".join(f"(?P<{c}>\\b(?:{g})\\b)" for c, g in grupos.items()), re.IGNORECASE
+        )
+        self._fonte_iframe = "|".join(_frase_para_regex(i) for i in self.iframes)
+
+    @classmethod
+    def de_arquivo(cls, caminho: str | None = ARQUIVO_ASSINATURAS) -> "DetectorBloqueio":
+        """Carrega assinaturas extras de um JSON (mescladas às padrão)."""
+        if not caminho or not os.path.exists(caminho):
+            return cls()
+        with open(caminho, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        assinaturas = {k: list(v) for k, v in ASSINATURAS_PADRAO.items()}
+        for categoria, frases in config.get("assinaturas", {}).items():
+            assinaturas.setdefault(categoria, []).extend(frases)
+        return cls(
+            assinaturas,
+            IFRAMES_PADRAO + config.get("iframes", []),
+            config.get("status") or STATUS_BLOQUEIO_PADRAO,
+        )
+
+    def classificar_texto(self, texto: str) -> tuple[str, str] | None:
+        """(categoria, trecho) da primeira assinatura encontrada no texto, ou None."""
+        m = self._regex_py.search(texto or "")
+        if not m:
+            return None
+        return m.lastgroup, m.group(0)
+
+    def verificar(self, driver) -> dict:
+        """
+        Veredito compacto da página atual:
+        {"bloqueado": bool, "motivo": str | None, "detalhe": str | None, "status": int | None}
+        """
+        try:
+            bruto = driver.execute_script(_SCRIPT_VEREDITO, self._fonte_js, self._fonte_iframe) or {}
+        except Exception:
+            # Navegador sem suporte ao script (ou página trocando): texto visível via WebDriver
+            try:
+                texto = driver.find_element(By.TAG_NAME, "body").text
+            except Exception:
+                return {"bloqueado": False, "motivo": None, "detalhe": None, "status": None}
+            achado = self.classificar_texto(texto)
+            bruto = {"motivo": achado[0], "trecho": achado[1]} if achado else {}
+
+        status = bruto.get("status")
+        if bruto.get("iframe"):
+            motivo, detalhe = "captcha_iframe", bruto["iframe"]
+        elif status in self.status_bloqueio:
+            motivo, detalhe = f"http_{status}", None
+        elif bruto.get("motivo"):
+            motivo, detalhe = bruto["motivo"], bruto.get("trecho")
+        else:
+            motivo, detalhe = None, None
+        return {"bloqueado": motivo is not None, "motivo": motivo, "detalhe": detalhe, "status": status}
+
+
+_detector_padrao: DetectorBloqueio | None = None
+
+
+def obter_detector() -> DetectorBloqueio:
+    """Detector único do processo (assinaturas compiladas uma vez)."""
+    global _detector_padrao
+    if _detector_padrao is None:
+        _detector_padrao = DetectorBloqueio.de_arquivo()
+    return _detector_padrao
@@ -0,0 +1,58 @@
+import re
+import subprocess
+
+# =====================================================
+# 🔹 Classificação das falhas de uma cidade
+# =====================================================
+# O agendador decide pela categoria:
+# - transitorio: timeout, página que não carregou, driver caiu → volta pro fim da fila
+# - bloqueio: captcha / 403 / "acesso negado" → volta pro fim da fila com backoff maior
+# - permanente: a cidade não existe no dropdown de Município → falha na hora, sem retry
+# - tempo_esgotado: watchdog matou o navegador / wkhtmltopdf passou do prazo → retry
+# - interrompido: stop_flag do usuário → nem conta como falha
+
+TRANSITORIO = "transitorio"
+BLOQUEIO = "bloqueio"
+PERMANENTE = "permanente"
+INTERROMPIDO = "interrompido"
+TEMPO_ESGOTADO = "tempo_esgotado"
+
+
+class ErroCidade(Exception):
+    categoria = TRANSITORIO
+
+
+class ErroTransitorio(ErroCidade):
+    categoria = TRANSITORIO
+
+
+class ErroBloqueio(ErroCidade):
+    categoria = BLOQUEIO
+
+
+class ErroPermanente(ErroCidade):
+    categoria = PERMANENTE
+
+
+class ErroTempoEsgotado(ErroCidade):
+    categoria = TEMPO_ESGOTADO
+
+
+# Mensagens das exceções genéricas (Exception("...")) levantadas pelo bot
+_PADROES = [
+    (INTERROMPIDO, re.compile(r"interrompida pelo usu", re.IGNORECASE)),
+    (BLOQUEIO, re.compile(r"bloque|captcha|acesso negado|rate.?limit", re.IGNORECASE)),
+]
+
+
+def classificar_erro(erro: BaseException) -> str:
+    """Categoria da falha (na dúvida, transitória: vale mais uma tentativa)."""
+    if isinstance(erro, ErroCidade):
+        return erro.categoria
+    if isinstance(erro, (TimeoutError, subprocess.TimeoutExpired)):
+        return TEMPO_ESGOTADO
+    mensagem = str(erro)
+    for categoria, padrao in _PADROES:
+        if padrao.search(mensagem):
+            return categoria
+    return TRANSITORIO
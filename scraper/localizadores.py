@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+from scraper.navegacao import EsperaInterrompivel
+from utils.file_manager import OUTPUT_DIR
+
+# =====================================================
+# 🔹 Registro único de localizadores (seletores) do site
+# =====================================================
+# Cada localizador tem uma ou mais variantes. A espera testa todas as
+# variantes a cada poll (na ordem "última vencedora primeiro"), então uma
+# variante velha não custa mais um timeout inteiro por cidade. A vencedora
+# é guardada por versão do site em output/localizadores.json.
+# Parâmetros ({texto}, {rotulo}) viram literais XPath escapados.
+
+ARQUIVO_LOCALIZADORES = OUTPUT_DIR / "localizadores.json"
+
+LOCALIZADORES: dict[str, list[tuple[str, str]]] = {
+    # página
+    "aceitar_cookies": [(By.ID, "onetrust-accept-btn-handler")],
+    "corpo": [(By.TAG_NAME, "body")],
+    # dropdowns
+    "dropdown_tipo_rede": [(By.CLASS_NAME, "rw-dropdown-list-input")],
+    "botoes_select": [(By.CLASS_NAME, "rw-btn-select")],
+    "dropdown_rotulo": [
+        (By.XPATH, "//label[contains(text(),{rotulo})]/following::button[1]"),
+        (By.XPATH, "//label[contains(normalize-space(.),{rotulo})]/following::button[1]"),
+    ],
+    "opcao": [
+        (By.XPATH, "//li[text()={texto}]"),
+        (By.XPATH, "//ul[contains(@id,'listbox')]//li[normalize-space(.)={texto}]"),
+    ],
+    "opcoes_listbox": [(By.XPATH, "//ul[contains(@id,'listbox')]//li")],
+    "clinica_geral": [
+        (By.XPATH, "//li[text()='CLINICA GERAL']"),
+        (By.XPATH, "//li[contains(text(),'CLÍNICA GERAL')]"),
+        (By.XPATH, "//li[contains(text(),'CLINICA GERAL')]"),
+    ],
+    # botões dos passos
+    "submit_passo1": [(By.CLASS_NAME, "test_btn_firststep_submit")],
+    "submit_passo2": [(By.CSS_SELECTOR, "button.test_btn_secondstep_submit")],
+    "submit_passo3": [(By.CLASS_NAME, "test_btn_thirdstep_submit")],
+    # resultados
+    "legenda_resultados": [(By.ID, "result-legend")],
+    "indicador_resultados": [
+        (By.ID, "result-legend"),
+        (By.CLASS_NAME, "accredited-network__result"),
+    ],
+    "bloco_resultado": [
+        (By.CLASS_NAME, "accredited-network__result"),
+        (By.CSS_SELECTOR, "[class*='accredited-network']"),
+        (By.CSS_SELECTOR, "[class*='result']"),
+    ],
+    "proxima_pagina": [
+        (By.CSS_SELECTOR, "button[aria-label*='róxima']"),
+        (By.CSS_SELECTOR, "button[aria-label*='next' i]"),
+        (By.CSS_SELECTOR, ".pagination .next:not(.disabled) a"),
+        (By.CSS_SELECTOR, "button.load-more"),
+    ],
+    "sem_resultado": [
+        (By.XPATH, "//*[contains(text(), 'nenhum resultado')]"),
+        (By.XPATH, "//*[contains(text(), 'Nenhum resultado')]"),
+        (By.XPATH, "//*[contains(text(), 'não encontrado')]"),
+        (By.XPATH, "//*[contains(text(), 'Não encontrado')]"),
+    ],
+    # dentro de cada bloco de resultado
+    "bloco_nome": [(By.TAG_NAME, "h3")],
+    "bloco_endereco": [(By.CSS_SELECTOR, ".accredited-network__result__address-name p:nth-child(1)")],
+    "bloco_bairro": [(By.CSS_SELECTOR, ".accredited-network__result__neighbourhood p")],
+    "bloco_telefone": [(By.CSS_SELECTOR, ".accredited-network__result__address-name p:nth-child(3)")],
+}
+
+CONDICOES = {
+    "clicavel": EC.element_to_be_clickable,
+    "presente": EC.presence_of_element_located,
+    "todos": EC.presence_of_all_elements_located,
+    "visivel": EC.visibility_of_element_located,
+}
+
+_PARA_CSS = {
+    By.CSS_SELECTOR: lambda v: v,
+    By.CLASS_NAME: lambda v: f".{v}",
+    By.ID: lambda v: f"#{v}",
+    By.TAG_NAME: lambda v: v,
+}
+
+# Versão do site = hash dos bundles JS carregados (muda a cada deploy)
+_SCRIPT_VERSAO = """
+return Array.from(document.scripts).map(s => s.src).filter(Boolean).sort().join('|');
+"""
+
+
+def literal_xpath(texto: str) -> str:
+    """Literal XPath 1.0 para qualquer texto (aspas simples e duplas)."""
+    if "'" not in texto:
+        return f"'{texto}'"
+    if '"' not in texto:
+        return f'"{texto}"'
+    partes = texto.split("'")
+    return "concat(" + ", \"'\", ".join(f"'{p}'" for p in partes) + ")"
+
+
+@lru_cache(maxsize=4096)
+def _variantes(nome: str, params: tuple = ()) -> tuple[tuple[str, str], ...]:
+    """Variantes do localizador com os parâmetros já aplicados (cache por parâmetros)."""
+    if not params:
+        return tuple(LOCALIZADORES[nome])
+    valores = {k: literal_xpath(v) for k, v in params}
+    return tuple((by, valor.format(**valores)) for by, valor in LOCALIZADORES[nome])
+
+
+def detectar_versao_site(driver) -> str:
+    try:
+        fontes = driver.execute_script(_SCRIPT_VERSAO) or ""
+    except Exception:
+        return "desconhecida"
+    return hashlib.sha1(fontes.encode("utf-8")).hexdigest()[:10]
+
+
+class RegistroLocalizadores:
+    """Ordem das variantes por versão do site + contadores de acerto/erro."""
+
+    def __init__(self, caminho: Path | None = ARQUIVO_LOCALIZADORES) -> None:
+        self.caminho = caminho
+        self.versao = "desconhecida"
+        self._lock = threading.Lock()
+        self._vencedoras: dict[str, dict[str, int]] = {}
+        self._contadores: dict[str, dict] = {}
+        if caminho and caminho.exists():
+            try:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    self._vencedoras = json.load(f).get("vencedoras", {})
+            except Exception:
+                pass
+
+    def definir_versao(self, versao: str) -> None:
+        self.versao = versao
+
+    # ---------------------- ordem / contadores ----------------------
+
+    def _ordem(self, nome: str, total: int) -> list[int]:
+        vencedora = self._vencedoras.get(self.versao, {}).get(nome, 0)
+        if not 0 <= vencedora < total:
+            vencedora = 0
+        return [vencedora] + [i for i in range(total) if i != vencedora]
+
+    def _contador(self, nome: str) -> dict:
+        return self._contadores.setdefault(nome, {"acertos": {}, "falhas": 0, "trocas": 0})
+
+    def _registrar_acerto(self, nome: str, indice: int, ordem: list[int]) -> bool:
+        """Conta o acerto; True se a vencedora mudou (para logar)."""
+        with self._lock:
+            c = self._contador(nome)
+            c["acertos"][indice] = c["acertos"].get(indice, 0) + 1
+            if indice == ordem[0]:
+                return False
+            c["trocas"] += 1
+            self._vencedoras.setdefault(self.versao, {})[nome] = indice
+        self.salvar()
+        return True
+
+    def _registrar_falha(self, nome: str) -> None:
+        with self._lock:
+            self._contador(nome)["falhas"] += 1
+
+    def salvar(self) -> None:
+        if not self.caminho:
+            return
+        with self._lock:
+            dados = {"vencedoras": json.loads(json.dumps(self._vencedoras))}
+        try:
+            self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.caminho.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(dados, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.caminho)
+        except Exception as e:
+            print(f"⚠️ Não foi possível salvar localizadores: {e}")
+
+    # ---------------------- busca ----------------------
+
+    def esperar(self, driver, nome: str, timeout: float, condicao: str = "clicavel",
+                stop_flag=None, log=None, **params):
+        """
+        Espera até alguma variante satisfazer a condição; retorna o elemento
+        (ou a lista, com condicao="todos"). TimeoutException se nenhuma satisfez.
+        """
+        variantes = _variantes(nome, tuple(sorted(params.items())))
+        ordem = self._ordem(nome, len(variantes))
+        fabrica = CONDICOES[condicao]
+        testes = [(i, fabrica(variantes[i])) for i in ordem]
+
+        def alguma_variante(drv):
+            for indice, teste in testes:
+                try:
+                    resultado = teste(drv)
+                except Exception:
+                    continue
+                if resultado:
+                    return indice, resultado
+            return False
+
+        try:
+            indice, elemento = EsperaInterrompivel(driver, timeout, stop_flag).until(alguma_variante)
+        except TimeoutException:
+            self._registrar_falha(nome)
+            raise
+        if self._registrar_acerto(nome, indice, ordem) and log:
+            log(f"🔁 Localizador '{nome}': variante {indice} passou a ser a preferida (site {self.versao})")
+        return elemento
+
+    def encontrar_todos(self, contexto, nome: str, **params) -> list:
+        """find_elements sem espera: primeira variante (na ordem) com resultado."""
+        variantes = _variantes(nome, tuple(sorted(params.items())))
+        ordem = self._ordem(nome, len(variantes))
+        for indice in ordem:
+            try:
+                elementos = contexto.find_elements(*variantes[indice])
+            except Exception:
+                continue
+            if elementos:
+                self._registrar_acerto(nome, indice, ordem)
+                return elementos
+        self._registrar_falha(nome)
+        return []
+
+    def encontrar(self, contexto, nome: str, **params):
+        """find_element sem espera (contexto pode ser o driver ou um WebElement)."""
+        elementos = self.encontrar_todos(contexto, nome, **params)
+        if not elementos:
+            raise NoSuchElementException(f"Localizador '{nome}' não encontrado")
+        return elementos[0]
+
+    def seletores_css(self, nome: str) -> list[str]:
+        """Variantes em CSS (vencedora primeiro), para uso dentro de scripts injetados."""
+        variantes = _variantes(nome)
+        css = []
+        for indice in self._ordem(nome, len(variantes)):
+            by, valor = variantes[indice]
+            if by in _PARA_CSS:
+                css.append(_PARA_CSS[by](valor))
+        return css
+
+    # ---------------------- consulta ----------------------
+
+    def resumo(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                nome: {
+                    "acertos": sum(c["acertos"].values()),
+                    "falhas": c["falhas"],
+                    "trocas": c["trocas"],
+                    "por_variante": dict(c["acertos"]),
+                }
+                for nome, c in sorted(self._contadores.items())
+            }
+
+    def logar_resumo(self, log) -> None:
+        for nome, c in self.resumo().items():
+            variantes = ", ".join(f"v{i}={n}" for i, n in sorted(c["por_variante"].items()))
+            log(f"🎯 Localizador {nome}: {c['acertos']} acertos / {c['falhas']} falhas ({variantes})")
+
+
+_registro_padrao: RegistroLocalizadores | None = None
+_lock_registro = threading.Lock()
+
+
+def obter_registro() -> RegistroLocalizadores:
+    """Registro único do processo (todas as sessões compartilham a ordem)."""
+    global _registro_padrao
+    with _lock_registro:
+        if _registro_padrao is None:
+            _registro_padrao = RegistroLocalizadores()
+        return _registro_padrao
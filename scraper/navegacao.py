@@ -1,7 +1,33 @@
-import time
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from utils.delays import dormir, espera_ritmo
+
+
+# 🔥 NOVO — WebDriverWait que aborta assim que o stop_flag é acionado
+class EsperaInterrompivel(WebDriverWait):
+    """
+    Igual ao WebDriverWait, mas confere o stop_flag a cada polling (0.25s)
+    e levanta "Execução interrompida pelo usuário" em vez de esperar o timeout.
+    """
+
+    def __init__(self, driver, timeout: float, stop_flag=None, poll_frequency: float = 0.25) -> None:
+        super().__init__(driver, timeout, poll_frequency=poll_frequency)
+        self.stop_flag = stop_flag
+
+    def _checar(self, method):
+        def condicao(driver):
+            if self.stop_flag and self.stop_flag.is_set():
+                raise Exception("Execução interrompida pelo usuário")
+            return method(driver)
+        return condicao
+
+    def until(self, method, message: str = ""):
+        return super().until(self._checar(method), message)
+
+    def until_not(self, method, message: str = ""):
+        return super().until_not(self._checar(method), message)
+
 
 def fechar_abas_extras(driver) -> None:
     """
@@ -14,7 +40,7 @@ def fechar_abas_extras(driver) -> None:
                 driver.switch_to.window(janelas[i])
                 driver.close()
             driver.switch_to.window(janelas[0])
-            time.sleep(0.5)
+            dormir(0.5, "abas")
     except Exception as e:
         print(f"⚠️ Aviso ao fechar abas extras: {e}")
 
@@ -31,7 +57,7 @@ def garantir_aba_principal(driver) -> None:
         print(f"⚠️ Aviso ao garantir aba principal: {e}")
 
 
-def aguardar_pagina_carregar(driver, wait: WebDriverWait) -> None:
+def aguardar_pagina_carregar(driver, wait: WebDriverWait, stop_flag=None) -> None:
     """
     Aguarda o carregamento completo da página (document.readyState == 'complete').
     Para SPAs, também aguarda o JavaScript carregar.
@@ -41,7 +67,7 @@ def aguardar_pagina_carregar(driver, wait: WebDriverWait) -> None:
         wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
         
         # 🔥 CORREÇÃO — Aguardar mais tempo para SPAs carregarem
-        time.sleep(1.0)
+        dormir(espera_ritmo("spa_pronta"), "carregamento_pagina", stop_flag)
         
         # 🔥 CORREÇÃO — Verificar se há conteúdo no body
         try:
@@ -53,7 +79,7 @@ def aguardar_pagina_carregar(driver, wait: WebDriverWait) -> None:
             """))
         except:
             # Se não houver conteúdo, aguardar mais um pouco
-            time.sleep(2.0)
+            dormir(espera_ritmo("spa_vazia"), "carregamento_pagina", stop_flag)
             # Verificar novamente
             try:
                 body_content = driver.execute_script("return document.body ? document.body.innerHTML.length : 0")
@@ -62,7 +88,7 @@ def aguardar_pagina_carregar(driver, wait: WebDriverWait) -> None:
             except:
                 pass
         
-        time.sleep(0.5)
+        dormir(espera_ritmo("spa_estabilizar"), "carregamento_pagina", stop_flag)
     except Exception as e:
         print(f"⚠️ Aviso ao aguardar carregamento: {e}")
         # Não levantar exceção, apenas logar
@@ -81,5 +107,5 @@ def clicar_com_retry(locator, driver, wait: WebDriverWait, max_tentativas: int =
         except Exception:
             if tentativa == max_tentativas - 1:
                 raise
-            time.sleep(0.5)
+            dormir(0.5, "retry_clique")
     return False
\ No newline at end of file
@@ -0,0 +1,216 @@
+import re
+import time
+
+# =====================================================
+# 🔹 Paginação / scroll virtual dos resultados com checagem de total
+# =====================================================
+# Lê o total anunciado em result-legend e vai carregando segmentos (scroll
+# infinito, páginas ou lista virtual que recicla blocos) até extrair esse
+# total ou parar de avançar. Cada segmento é extraído assim que aparece,
+# numa única chamada execute_script (em vez de 4 find_element por bloco).
+
+TEXTOS_INVALIDOS = {
+    "NOME NÃO ENCONTRADO",
+    "ENDEREÇO NÃO ENCONTRADO",
+    "Sua busca não localizou nenhum prestador",
+    "nenhum prestador",
+    "Nenhum prestador",
+    "Legenda de ícones",
+    "",
+}
+
+_RE_TOTAL = re.compile(r"(\d[\d.]*)\s+resultado", re.IGNORECASE)
+
+# Extrai os blocos a partir de `inicio` e já rola para pedir o próximo segmento.
+# Se o primeiro bloco mudou (página nova / lista virtual reciclada), recomeça do 0.
+_SCRIPT_SEGMENTO = """
+const [seletores, campos, inicio, assinaturaAnterior] = arguments;
+let blocos = [];
+for (const s of seletores) {
+    blocos = document.querySelectorAll(s);
+    if (blocos.length) break;
+}
+const texto = (b, sels) => {
+    for (const s of sels) {
+        const e = b.querySelector(s);
+        if (e) return (e.innerText || e.textContent || '').trim();
+    }
+    return '';
+};
+const assinatura = blocos.length ? (blocos[0].innerText || '').slice(0, 200) : null;
+const de = (assinaturaAnterior !== null && assinatura !== assinaturaAnterior) ? 0 : inicio;
+const itens = [];
+for (let i = de; i < blocos.length; i++) {
+    const item = {};
+    for (const [campo, sels] of Object.entries(campos)) item[campo] = texto(blocos[i], sels);
+    itens.push(item);
+}
+const ultimo = blocos[blocos.length - 1];
+if (ultimo) {
+    ultimo.scrollIntoView({block: 'end'});
+    let p = ultimo.parentElement;
+    while (p && p !== document.body) {
+        if (p.scrollHeight > p.clientHeight + 5) { p.scrollTop = p.scrollHeight; break; }
+        p = p.parentElement;
+    }
+}
+window.scrollTo(0, document.body.scrollHeight);
+return {quantidade: blocos.length, assinatura: assinatura, itens: itens};
+"""
+
+_SCRIPT_ESTADO = """
+const [seletores] = arguments;
+for (const s of seletores) {
+    const blocos = document.querySelectorAll(s);
+    if (blocos.length) return [blocos.length, (blocos[0].innerText || '').slice(0, 200)];
+}
+return [0, null];
+"""
+
+
+# Botão de próxima página / "carregar mais", quando o site pagina em vez de rolar
+_SCRIPT_PROXIMA = """
+const [seletores] = arguments;
+for (const s of seletores) {
+    const b = document.querySelector(s);
+    if (b && !b.disabled && b.getAttribute('aria-disabled') !== 'true' && b.offsetParent !== null) {
+        b.click();
+        return true;
+    }
+}
+return false;
+"""
+
+
+def normalizar_prestador(nome: str, endereco: str, bairro: str, telefone: str) -> dict | None:
+    """Dict do prestador, ou None se o bloco não for um prestador válido."""
+    if (nome in TEXTOS_INVALIDOS or endereco in TEXTOS_INVALIDOS
+            or len(nome) <= 3 or len(endereco) <= 5):
+        return None
+    return {
+        "nome": nome,
+        "endereco": endereco,
+        "bairro": bairro if bairro != "BAIRRO NÃO ENCONTRADO" else "",
+        "telefone": telefone if telefone != "TELEFONE NÃO ENCONTRADO" else "",
+    }
+
+
+def ler_total_anunciado(driver, seletores_legenda: list[str]) -> int | None:
+    """Total que o site diz ter encontrado ("388 resultados encontrados")."""
+    for seletor in seletores_legenda:
+        try:
+            texto = driver.execute_script(
+                "const e = document.querySelector(arguments[0]); return e ? e.innerText : null;", seletor
+            )
+        except Exception:
+            continue
+        if texto:
+            m = _RE_TOTAL.search(texto)
+            if m:
+                return int(m.group(1).replace(".", ""))
+    return None
+
+
+class Paginador:
+    """
+    Carrega e extrai segmento a segmento até:
+    - atingir o total anunciado, ou
+    - `max_sem_progresso` segmentos seguidos sem blocos novos, ou
+    - `max_segmentos` / prazo (time.monotonic) esgotados.
+    """
+
+    def __init__(self, driver, seletores_bloco: list[str], campos: dict[str, list[str]],
+                 seletores_proxima: list[str] | None = None, stop_flag=None, log=print,
+                 timeout_segmento: float = 4.0, max_segmentos: int = 200, max_sem_progresso: int = 2) -> None:
+        self.driver = driver
+        self.seletores_bloco = seletores_bloco
+        self.campos = campos
+        self.seletores_proxima = seletores_proxima or []
+        self.stop_flag = stop_flag
+        self.log = log
+        self.timeout_segmento = timeout_segmento
+        self.max_segmentos = max_segmentos
+        self.max_sem_progresso = max_sem_progresso
+
+    def _parado(self) -> bool:
+        return bool(self.stop_flag and self.stop_flag.is_set())
+
+    def _aguardar_mudanca(self, quantidade: int, assinatura) -> bool:
+        """Polling curto até aparecerem blocos novos (ou a lista trocar)."""
+        limite = time.monotonic() + self.timeout_segmento
+        while time.monotonic() < limite:
+            if self._parado():
+                raise Exception("Execução interrompida pelo usuário")
+            try:
+                atual = self.driver.execute_script(_SCRIPT_ESTADO, self.seletores_bloco)
+            except Exception:
+                return False
+            if atual[0] > quantidade or atual[1] != assinatura:
+                return True
+            time.sleep(0.25)
+        return False
+
+    def _proxima_pagina(self) -> bool:
+        if not self.seletores_proxima:
+            return False
+        try:
+            return bool(self.driver.execute_script(_SCRIPT_PROXIMA, self.seletores_proxima))
+        except Exception:
+            return False
+
+    def executar(self, total: int | None = None, prazo: float | None = None) -> tuple[list[dict], dict]:
+        prestadores: list[dict] = []
+        vistos = set()
+        inicio, assinatura = 0, None
+        segmentos = sem_progresso = 0
+
+        while segmentos < self.max_segmentos:
+            if self._parado():
+                raise Exception("Execução interrompida pelo usuário")
+            segmentos += 1
+
+            lote = self.driver.execute_script(
+                _SCRIPT_SEGMENTO, self.seletores_bloco, self.campos, inicio, assinatura
+            )
+            novos = 0
+            for item in lote["itens"]:
+                prestador = normalizar_prestador(
+                    item.get("nome", ""), item.get("endereco", ""),
+                    item.get("bairro", ""), item.get("telefone", ""),
+                )
+                if not prestador:
+                    continue
+                chave = (prestador["nome"], prestador["endereco"], prestador["telefone"])
+                if chave in vistos:
+                    continue
+                vistos.add(chave)
+                prestadores.append(prestador)
+                novos += 1
+            inicio, assinatura = lote["quantidade"], lote["assinatura"]
+
+            if total is not None and len(prestadores) >= total:
+                break
+            if prazo is not None and time.monotonic() > prazo:
+                self.log("⚠️ Prazo da captura esgotado durante a paginação")
+                break
+
+            sem_progresso = 0 if novos else sem_progresso + 1
+            if sem_progresso >= self.max_sem_progresso:
+                break
+            if self._aguardar_mudanca(lote["quantidade"], lote["assinatura"]):
+                continue
+            # Scroll não trouxe nada: tenta próxima página / "carregar mais"
+            if self._proxima_pagina() and self._aguardar_mudanca(lote["quantidade"], lote["assinatura"]):
+                continue
+            # Nada novo no prazo do segmento: mais uma volta para confirmar o fim
+            sem_progresso += 1
+            if sem_progresso >= self.max_sem_progresso:
+                break
+
+        info = {
+            "total_anunciado": total,
+            "extraidos": len(prestadores),
+            "segmentos": segmentos,
+            "completo": total is None or len(prestadores) >= total,
+        }
+        return prestadores, info
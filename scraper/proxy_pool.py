@@ -0,0 +1,203 @@
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+
+from utils.file_manager import OUTPUT_DIR
+
+# =====================================================
+# 🔹 Pool de proxies com score de saúde e sessões fixas
+# =====================================================
+ARQUIVO_STATS = OUTPUT_DIR / "proxies_stats.json"
+
+ALFA_LATENCIA = 0.3          # peso da última medição na média móvel (EWMA)
+FALHAS_PARA_QUARENTENA = 3   # falhas seguidas (sem bloqueio) antes da quarentena
+BACKOFF_BASE_SEG = 120       # 1ª quarentena; dobra a cada reincidência
+BACKOFF_MAX_SEG = 6 * 3600
+
+
+def _stats_vazias() -> dict:
+    return {
+        "latencia_media": None,
+        "sucessos": 0,
+        "falhas": 0,
+        "bloqueios": 0,
+        "falhas_seguidas": 0,
+        "nivel_backoff": 0,
+        "quarentena_ate": 0.0,
+        "ultimo_uso": None,
+    }
+
+
+class PoolProxies:
+    """
+    Acompanha latência, taxa de sucesso e bloqueios de cada proxy.
+
+    - escolher(): o proxy saudável com melhor score (proxies nunca medidos vão primeiro)
+    - registrar_bloqueio(): quarentena imediata com backoff exponencial
+    - estatísticas persistidas em JSON entre execuções
+    """
+
+    def __init__(self, proxies: list[str], caminho: Path | None = ARQUIVO_STATS) -> None:
+        self.proxies = list(dict.fromkeys(proxies))
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._lock_arquivo = threading.Lock()  # ler-mesclar-gravar do JSON, um por vez
+        self._stats: dict[str, dict] = {p: _stats_vazias() for p in self.proxies}
+        self._carregar()
+
+    # ---------------------- persistência ----------------------
+
+    def _carregar(self) -> None:
+        if not self.caminho or not self.caminho.exists():
+            return
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                salvos = json.load(f)
+        except Exception:
+            return
+        for proxy in self.proxies:
+            if proxy in salvos:
+                self._stats[proxy].update(salvos[proxy])
+
+    def salvar(self) -> None:
+        if not self.caminho or not self.proxies:
+            return
+        # 🔥 CORREÇÃO — Navegadores em paralelo salvam ao mesmo tempo: a leitura, a
+        # mescla e a gravação ficam sob um lock próprio (escolher() não espera o disco)
+        # e o .tmp leva o pid (workers de distribuido.py podem dividir a pasta)
+        with self._lock_arquivo:
+            with self._lock:
+                dados = json.loads(json.dumps(self._stats))
+            try:
+                existentes = {}
+                if self.caminho.exists():
+                    with open(self.caminho, "r", encoding="utf-8") as f:
+                        existentes = json.load(f)
+                existentes.update(dados)
+                self.caminho.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.caminho.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(existentes, f, ensure_ascii=False, indent=2)
+                os.replace(tmp, self.caminho)
+            except Exception as e:
+                print(f"⚠️ Não foi possível salvar estatísticas de proxies: {e}")
+
+    # ---------------------- saúde ----------------------
+
+    def _saudavel(self, proxy: str, agora: float) -> bool:
+        return self._stats[proxy]["quarentena_ate"] <= agora
+
+    def _score(self, proxy: str) -> float:
+        """Menor é melhor: latência média penalizada pela taxa de falha."""
+        s = self._stats[proxy]
+        if s["latencia_media"] is None:
+            return -1.0  # nunca medido → explorar primeiro
+        tentativas = s["sucessos"] + s["falhas"] + s["bloqueios"]
+        taxa_sucesso = (s["sucessos"] + 1) / (tentativas + 2)  # suavização de Laplace
+        return s["latencia_media"] / taxa_sucesso
+
+    def escolher(self, atual: str | None = None) -> str | None:
+        """
+        Proxy para uma nova sessão. Sessão fixa: se `atual` ainda está saudável,
+        continua nele. Se todos estiverem em quarentena, usa o que libera primeiro.
+        """
+        if not self.proxies:
+            return None
+        agora = time.time()
+        with self._lock:
+            if atual in self._stats and self._saudavel(atual, agora):
+                escolhido = atual
+            else:
+                saudaveis = [p for p in self.proxies if self._saudavel(p, agora)]
+                if saudaveis:
+                    melhor = min(self._score(p) for p in saudaveis)
+                    escolhido = random.choice([p for p in saudaveis if self._score(p) == melhor])
+                else:
+                    escolhido = min(self.proxies, key=lambda p: self._stats[p]["quarentena_ate"])
+            self._stats[escolhido]["ultimo_uso"] = agora
+            return escolhido
+
+    def registrar_sucesso(self, proxy: str | None, latencia_seg: float) -> None:
+        if proxy not in self._stats:
+            return
+        with self._lock:
+            s = self._stats[proxy]
+            s["sucessos"] += 1
+            s["falhas_seguidas"] = 0
+            s["nivel_backoff"] = max(s["nivel_backoff"] - 1, 0)
+            if s["latencia_media"] is None:
+                s["latencia_media"] = latencia_seg
+            else:
+                s["latencia_media"] = ALFA_LATENCIA * latencia_seg + (1 - ALFA_LATENCIA) * s["latencia_media"]
+        self.salvar()
+
+    def registrar_falha(self, proxy: str | None) -> None:
+        if proxy not in self._stats:
+            return
+        with self._lock:
+            s = self._stats[proxy]
+            s["falhas"] += 1
+            s["falhas_seguidas"] += 1
+            if s["falhas_seguidas"] >= FALHAS_PARA_QUARENTENA:
+                self._quarentena(s)
+        self.salvar()
+
+    def registrar_bloqueio(self, proxy: str | None) -> None:
+        if proxy not in self._stats:
+            return
+        with self._lock:
+            s = self._stats[proxy]
+            s["bloqueios"] += 1
+            self._quarentena(s)
+        self.salvar()
+
+    def _quarentena(self, s: dict) -> None:
+        duracao = min(BACKOFF_BASE_SEG * (2 ** s["nivel_backoff"]), BACKOFF_MAX_SEG)
+        s["quarentena_ate"] = time.time() + duracao
+        s["nivel_backoff"] += 1
+        s["falhas_seguidas"] = 0
+
+    # ---------------------- consulta ----------------------
+
+    def resumo(self) -> list[dict]:
+        agora = time.time()
+        with self._lock:
+            return [
+                {
+                    "proxy": p,
+                    "saudavel": self._saudavel(p, agora),
+                    "quarentena_restante_seg": round(max(self._stats[p]["quarentena_ate"] - agora, 0), 1),
+                    "latencia_media_seg": (
+                        round(self._stats[p]["latencia_media"], 2)
+                        if self._stats[p]["latencia_media"] is not None else None
+                    ),
+                    "sucessos": self._stats[p]["sucessos"],
+                    "falhas": self._stats[p]["falhas"],
+                    "bloqueios": self._stats[p]["bloqueios"],
+                }
+                for p in self.proxies
+            ]
+
+
+# =====================================================
+# Pool compartilhado do processo
+# =====================================================
+_pool_padrao: PoolProxies | None = None
+_lock_pool = threading.Lock()
+
+
+def obter_pool(proxies: list[str] | None = None) -> PoolProxies:
+    """
+    Pool único do processo (todas as sessões compartilham as estatísticas).
+    Proxies vêm de `proxies` ou da variável AMIL_PROXIES (separados por vírgula).
+    """
+    global _pool_padrao
+    with _lock_pool:
+        if _pool_padrao is None:
+            if proxies is None:
+                proxies = [p.strip() for p in os.getenv("AMIL_PROXIES", "").split(",") if p.strip()]
+            _pool_padrao = PoolProxies(proxies)
+        return _pool_padrao
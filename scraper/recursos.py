@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:  # opcional: sem psutil não há medição nem recolhimento de órfãos
+    psutil = None
+
+from scraper.watchdog import SessaoWatchdog, _NOMES_NAVEGADOR, matar_arvore
+
+# =====================================================
+# 🔹 Memória dos navegadores + recolhimento de órfãos
+# =====================================================
+# uc.Chrome(use_subprocess=True) sobe uma árvore de processos que só o
+# driver.quit() derruba — e o quit pode falhar calado. Aqui:
+# - uma thread amostra o RSS da árvore de cada sessão; passou do limite,
+#   o navegador é reciclado (árvore morta, cidade volta para o agendador);
+# - depois de fechar o navegador, confere se a árvore morreu mesmo;
+# - no início da execução e após cada cidade, recolhe chrome/chromedriver
+#   órfãos (pai morto, ou filhos nossos que não pertencem a sessão viva).
+
+LIMITE_RSS_MB = float(os.getenv("AMIL_LIMITE_RSS_MB", "1500"))
+INTERVALO_AMOSTRA_SEG = float(os.getenv("AMIL_INTERVALO_RECURSOS_SEG", "5"))
+
+_MB = 1024 * 1024
+
+
+def _e_navegador(proc) -> bool:
+    try:
+        return any(n in proc.name().lower() for n in _NOMES_NAVEGADOR)
+    except psutil.Error:
+        return False
+
+
+def arvore(pids: list[int]) -> list:
+    """Processos raiz + descendentes (psutil.Process), sem repetição."""
+    if psutil is None:
+        return []
+    processos = {}
+    for pid in pids:
+        try:
+            raiz = psutil.Process(pid)
+            processos[raiz.pid] = raiz
+            for filho in raiz.children(recursive=True):
+                processos[filho.pid] = filho
+        except psutil.Error:
+            continue
+    return list(processos.values())
+
+
+def memoria_arvore(processos: list) -> int:
+    """RSS somado da árvore, em bytes (conta a memória compartilhada mais de uma vez)."""
+    total = 0
+    for proc in processos:
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            continue
+    return total
+
+
+def garantir_encerrados(processos: list, timeout: float = 5.0) -> int:
+    """
+    Espera a árvore (capturada ANTES do quit) terminar; mata quem sobrou.
+    Retorna quantos precisaram ser mortos.
+    """
+    if psutil is None or not processos:
+        return 0
+    _, vivos = psutil.wait_procs(processos, timeout=timeout)
+    if not vivos:
+        return 0
+    return matar_arvore([p.pid for p in vivos])
+
+
+def _orfao(proc) -> bool:
+    """Pai morto (ou PID do pai reaproveitado por outro processo mais novo)."""
+    try:
+        pai = proc.parent()
+        if pai is None or pai.pid in (0, 1):
+            return True
+        return pai.create_time() > proc.create_time()
+    except psutil.Error:
+        return False
+
+
+class SessaoRecursos:
+    """Memória da árvore de um navegador (uma por AmilBot)."""
+
+    def __init__(self, sessao: SessaoWatchdog) -> None:
+        self.sessao = sessao
+        self.rss_mb = 0.0
+        self.pico_mb = 0.0
+        self.processos = 0
+        self.reciclagens = 0
+        self.reciclagem: dict | None = None
+
+    def amostrar(self) -> float:
+        try:
+            pids = self.sessao.obter_pids()
+        except Exception:
+            pids = []
+        processos = arvore(pids)
+        self.processos = len(processos)
+        self.rss_mb = memoria_arvore(processos) / _MB
+        self.pico_mb = max(self.pico_mb, self.rss_mb)
+        return self.rss_mb
+
+    def iniciar_cidade(self) -> None:
+        self.reciclagem = None
+
+    def mensagem_reciclagem(self) -> str | None:
+        if not self.reciclagem:
+            return None
+        return (f"Navegador reciclado em {self.reciclagem['cidade']}: "
+                f"{self.reciclagem['rss_mb']:.0f}MB > {self.reciclagem['limite_mb']:.0f}MB")
+
+    def resumo(self) -> dict:
+        return {
+            "sessao": self.sessao.nome,
+            "cidade": self.sessao.cidade,
+            "fase": self.sessao.fase_atual,
+            "rss_mb": round(self.rss_mb, 1),
+            "pico_mb": round(self.pico_mb, 1),
+            "processos": self.processos,
+            "reciclagens": self.reciclagens,
+        }
+
+
+class MonitorRecursos:
+    """Thread única que mede a memória de todas as sessões e recolhe órfãos."""
+
+    def __init__(self, limite_mb: float = LIMITE_RSS_MB, intervalo: float = INTERVALO_AMOSTRA_SEG) -> None:
+        self.limite_mb = limite_mb
+        self.intervalo = intervalo
+        self._sessoes: list[SessaoRecursos] = []
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.orfaos_recolhidos = 0
+        self.reciclagens = 0
+
+    def registrar(self, sessao: SessaoWatchdog) -> SessaoRecursos:
+        recursos = SessaoRecursos(sessao)
+        with self._lock:
+            self._sessoes.append(recursos)
+            if self._thread is None and psutil is not None:
+                self._thread = threading.Thread(target=self._vigiar, name="monitor_recursos", daemon=True)
+                self._thread.start()
+        return recursos
+
+    def remover(self, recursos: SessaoRecursos) -> None:
+        with self._lock:
+            if recursos in self._sessoes:
+                self._sessoes.remove(recursos)
+
+    # ---------------------- memória ----------------------
+
+    def _vigiar(self) -> None:
+        while True:
+            time.sleep(self.intervalo)
+            with self._lock:
+                sessoes = list(self._sessoes)
+            for recursos in sessoes:
+                if recursos.amostrar() > self.limite_mb and recursos.reciclagem is None:
+                    self._reciclar(recursos)
+
+    def _reciclar(self, recursos: SessaoRecursos) -> None:
+        recursos.reciclagem = {
+            "cidade": recursos.sessao.cidade,
+            "rss_mb": recursos.rss_mb,
+            "limite_mb": self.limite_mb,
+        }
+        recursos.reciclagens += 1
+        with self._lock:
+            self.reciclagens += 1
+        try:
+            pids = recursos.sessao.obter_pids()
+        except Exception:
+            pids = []
+        mortos = matar_arvore(pids) if pids else 0
+        recursos.sessao.log(f"♻️ {recursos.mensagem_reciclagem()} — {mortos} processos encerrados")
+
+    # ---------------------- órfãos ----------------------
+
+    def _protegidos(self) -> tuple[set[int], float | None]:
+        """PIDs das sessões vivas + início da abertura mais antiga em andamento."""
+        with self._lock:
+            sessoes = list(self._sessoes)
+        pids, abrindo_desde = [], None
+        for recursos in sessoes:
+            try:
+                pids.extend(recursos.sessao.obter_pids())
+            except Exception:
+                pass
+            sessao = recursos.sessao
+            if sessao.fase_atual == "abrir_navegador" and sessao.inicio_fase:
+                abrindo_desde = min(abrindo_desde or sessao.inicio_fase, sessao.inicio_fase)
+        return {p.pid for p in arvore(pids)}, abrindo_desde
+
+    def recolher_orfaos(self, log=print) -> int:
+        """
+        Mata chrome/chromedriver órfãos: de execuções anteriores (pai morto) e
+        filhos deste processo fora de qualquer sessão viva (quit que falhou).
+        Navegador sendo aberto agora ainda não tem PID conhecido: tudo criado
+        depois do início da abertura fica de fora.
+        """
+        if psutil is None:
+            return 0
+        protegidos, abrindo_desde = self._protegidos()
+        limite_criacao = abrindo_desde if abrindo_desde is not None else time.time()
+        candidatos = set()
+
+        for proc in psutil.Process().children(recursive=True):
+            try:
+                if (proc.pid not in protegidos and _e_navegador(proc)
+                        and proc.create_time() < limite_criacao):
+                    candidatos.add(proc.pid)
+            except psutil.Error:
+                continue
+
+        for proc in psutil.process_iter(["name"]):
+            # Só chromedriver ou Chrome de automação: o Chrome do usuário fica em paz
+            try:
+                if proc.pid in protegidos or not _e_navegador(proc) or not _orfao(proc):
+                    continue
+                if "chromedriver" in proc.name().lower() or any(
+                    a.startswith("--remote-debugging-port") for a in proc.cmdline()
+                ):
+                    candidatos.add(proc.pid)
+            except psutil.Error:
+                continue
+
+        if not candidatos:
+            return 0
+        mortos = matar_arvore(sorted(candidatos))
+        with self._lock:
+            self.orfaos_recolhidos += mortos
+        log(f"🧹 {mortos} processos órfãos de chrome/chromedriver encerrados")
+        return mortos
+
+    # ---------------------- status ----------------------
+
+    def resumo(self) -> dict:
+        with self._lock:
+            sessoes = [r.resumo() for r in self._sessoes]
+            orfaos, reciclagens = self.orfaos_recolhidos, self.reciclagens
+        resumo = {
+            "psutil": psutil is not None,
+            "limite_mb": self.limite_mb,
+            "sessoes": sessoes,
+            "total_mb": round(sum(s["rss_mb"] for s in sessoes), 1),
+            "orfaos_recolhidos": orfaos,
+            "reciclagens": reciclagens,
+        }
+        if psutil is not None:
+            memoria = psutil.virtual_memory()
+            resumo["host"] = {
+                "total_mb": round(memoria.total / _MB),
+                "disponivel_mb": round(memoria.available / _MB),
+            }
+        return resumo
+
+
+_monitor_padrao: MonitorRecursos | None = None
+_lock_monitor = threading.Lock()
+
+
+def obter_monitor() -> MonitorRecursos:
+    """Monitor único do processo."""
+    global _monitor_padrao
+    with _lock_monitor:
+        if _monitor_padrao is None:
+            _monitor_padrao = MonitorRecursos()
+        return _monitor_padrao
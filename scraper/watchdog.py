@@ -0,0 +1,221 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:  # opcional: sem psutil mata só os PIDs conhecidos
+    psutil = None
+
+# =====================================================
+# 🔹 Watchdog de prazos por cidade / fase
+# =====================================================
+# Uma thread única confere, a cada segundo, o prazo de todas as sessões
+# (um AmilBot = uma sessão). Estourou: mata a árvore de processos do
+# Chrome + chromedriver. A chamada Selenium que estava travada falha na
+# hora, e o bot levanta ErroTempoEsgotado — o agendador segue o jogo.
+# A fase "render" não passa por aqui: o wkhtmltopdf roda com timeout
+# próprio (AMIL_PRAZO_RENDER_SEG, ver pdf/gerador_pdf.py).
+
+
+def _prazo(fase: str, padrao: float) -> float:
+    return float(os.getenv(f"AMIL_PRAZO_{fase.upper()}_SEG", padrao))
+
+
+# 🔥 NOVO — Sobrescrevíveis com AMIL_PRAZO_<FASE>_SEG (ex.: AMIL_PRAZO_CAPTURA_SEG=300)
+PRAZOS_FASES = {
+    "abrir_navegador": _prazo("abrir_navegador", 90),
+    "formulario": _prazo("formulario", 90),   # cada passo (1, 2 e 3)
+    "captura": _prazo("captura", 240),
+}
+PRAZO_CIDADE_SEG = _prazo("cidade", 420)  # cidade inteira, cooldowns incluídos
+
+_NOMES_NAVEGADOR = ("chrome", "chromedriver")
+
+
+def pids_navegador(driver) -> list[int]:
+    """PIDs do chromedriver e do Chrome da sessão (uc.Chrome expõe browser_pid)."""
+    pids = []
+    for pid in (getattr(getattr(driver, "service", None), "process", None), getattr(driver, "browser_pid", None)):
+        pid = getattr(pid, "pid", pid)
+        if isinstance(pid, int) and pid > 0:
+            pids.append(pid)
+    return pids
+
+
+def matar_arvore(pids: list[int]) -> int:
+    """Mata os processos e todos os descendentes. Retorna quantos foram mortos."""
+    if psutil is not None:
+        processos = []
+        for pid in pids:
+            try:
+                raiz = psutil.Process(pid)
+            except psutil.Error:
+                continue
+            processos.extend(raiz.children(recursive=True))
+            processos.append(raiz)
+        for proc in processos:
+            try:
+                proc.kill()
+            except psutil.Error:
+                pass
+        psutil.wait_procs(processos, timeout=5)
+        return len(processos)
+
+    mortos = 0
+    for pid in pids:
+        try:
+            if os.name == "nt":
+                subprocess.run(["taskkill", "/T", "/F", "/PID", str(pid)], capture_output=True, timeout=15)
+            else:
+                os.kill(pid, signal.SIGKILL)
+            mortos += 1
+        except (OSError, subprocess.SubprocessError):
+            pass
+    return mortos
+
+
+def _pids_lancados_desde(inicio: float, excluir: set[int]) -> list[int]:
+    """
+    Chrome/chromedriver filhos deste processo criados depois de `inicio`
+    (uc.Chrome travado ainda não devolveu o driver, então não há PID conhecido).
+    """
+    if psutil is None:
+        return []
+    pids = []
+    for proc in psutil.Process().children(recursive=True):
+        try:
+            if (proc.pid not in excluir and proc.create_time() >= inicio
+                    and any(n in proc.name().lower() for n in _NOMES_NAVEGADOR)):
+                pids.append(proc.pid)
+        except psutil.Error:
+            continue
+    return pids
+
+
+class SessaoWatchdog:
+    """Prazos de uma sessão: cidade inteira + fase atual (o que vencer primeiro)."""
+
+    def __init__(self, nome: str, obter_pids, log=print) -> None:
+        self.nome = nome
+        self.obter_pids = obter_pids
+        self.log = log
+        self.cidade: str | None = None
+        self.fim_cidade: float | None = None
+        self.fase_atual: str | None = None
+        self.inicio_fase: float | None = None
+        self.fim_fase: float | None = None
+        self.estouro: dict | None = None
+        self._lock = threading.Lock()
+
+    def iniciar_cidade(self, cidade: str, prazo: float = PRAZO_CIDADE_SEG) -> None:
+        with self._lock:
+            self.cidade = cidade
+            self.fim_cidade = time.monotonic() + prazo
+            self.estouro = None
+
+    def encerrar_cidade(self) -> None:
+        with self._lock:
+            self.cidade = self.fim_cidade = None
+            self.fase_atual = self.inicio_fase = self.fim_fase = None
+
+    @contextmanager
+    def fase(self, nome: str):
+        with self._lock:
+            self.fase_atual = nome
+            self.inicio_fase = time.time()
+            self.fim_fase = time.monotonic() + PRAZOS_FASES[nome]
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.fase_atual = self.inicio_fase = self.fim_fase = None
+
+    def _vencida(self, agora: float) -> dict | None:
+        with self._lock:
+            if self.estouro is not None:
+                return None
+            if self.fim_fase is not None and agora > self.fim_fase:
+                self.estouro = {"cidade": self.cidade, "fase": self.fase_atual,
+                                "prazo": PRAZOS_FASES[self.fase_atual]}
+            elif self.fim_cidade is not None and agora > self.fim_cidade:
+                self.estouro = {"cidade": self.cidade, "fase": self.fase_atual or "cidade",
+                                "prazo": PRAZO_CIDADE_SEG}
+            else:
+                return None
+            return {**self.estouro, "inicio_fase": self.inicio_fase}
+
+    def mensagem_estouro(self) -> str | None:
+        if not self.estouro:
+            return None
+        return f"Tempo esgotado em {self.estouro['cidade']} (fase {self.estouro['fase']}, {self.estouro['prazo']:.0f}s)"
+
+
+class Watchdog:
+    """Thread única que vigia todas as sessões registradas."""
+
+    def __init__(self, intervalo: float = 1.0) -> None:
+        self.intervalo = intervalo
+        self._sessoes: list[SessaoWatchdog] = []
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def registrar(self, nome: str, obter_pids, log=print) -> SessaoWatchdog:
+        sessao = SessaoWatchdog(nome, obter_pids, log)
+        with self._lock:
+            self._sessoes.append(sessao)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._vigiar, name="watchdog", daemon=True)
+                self._thread.start()
+        return sessao
+
+    def remover(self, sessao: SessaoWatchdog) -> None:
+        with self._lock:
+            if sessao in self._sessoes:
+                self._sessoes.remove(sessao)
+
+    def _pids_conhecidos(self) -> set[int]:
+        pids = set()
+        for sessao in list(self._sessoes):
+            try:
+                pids.update(sessao.obter_pids())
+            except Exception:
+                continue
+        return pids
+
+    def _vigiar(self) -> None:
+        while True:
+            time.sleep(self.intervalo)
+            agora = time.monotonic()
+            with self._lock:
+                sessoes = list(self._sessoes)
+            for sessao in sessoes:
+                estouro = sessao._vencida(agora)
+                if estouro:
+                    self._encerrar(sessao, estouro)
+
+    def _encerrar(self, sessao: SessaoWatchdog, estouro: dict) -> None:
+        try:
+            pids = sessao.obter_pids()
+        except Exception:
+            pids = []
+        if not pids and estouro["fase"] == "abrir_navegador" and estouro["inicio_fase"]:
+            pids = _pids_lancados_desde(estouro["inicio_fase"], self._pids_conhecidos())
+        mortos = matar_arvore(pids) if pids else 0
+        sessao.log(f"⏱️ {sessao.mensagem_estouro()} — {mortos} processos do navegador encerrados")
+
+
+_watchdog_padrao: Watchdog | None = None
+_lock_watchdog = threading.Lock()
+
+
+def obter_watchdog() -> Watchdog:
+    """Watchdog único do processo."""
+    global _watchdog_padrao
+    with _lock_watchdog:
+        if _watchdog_padrao is None:
+            _watchdog_padrao = Watchdog()
+        return _watchdog_padrao
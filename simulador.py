@@ -0,0 +1,309 @@
+"""
+Planejamento de capacidade: simula uma execução em tempo virtual.
+
+Repete a lógica de agendamento do orquestrador sem abrir navegador:
+trabalhadores (navegadores) puxando cidades do AgendadorTentativas real
+(relógio virtual), esperas do RITMO (utils/delays.py), pausa estratégica,
+falhas com retry adiado (atraso_retry) e fila de renderização de PDF.
+O tempo ativo de cada cidade vem de execuções anteriores: esperas.json
+(ativo por cidade) ou o histórico de durações (utils/historico.py) menos
+as esperas; sem histórico, DURACAO_PADRAO_SEG.
+
+Cada combinação de navegadores × escala do ritmo é simulada algumas vezes
+(sementes diferentes) e o resultado é a mediana/p90 do tempo total e a
+vazão em cidades por hora.
+
+Uso:  python simulador.py --navegadores 1 2 4 --escala 1 0.5 --repeticoes 5
+"""
+import argparse
+import heapq
+import itertools
+import json
+import math
+import random
+import statistics
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from main import carregar_mapa_estados
+from scraper.agendador import AgendadorTentativas
+from scraper.erros import ErroBloqueio, ErroTransitorio
+from utils.delays import (
+    PAUSA_BASE,
+    PAUSA_INTERVALO,
+    PAUSA_MAX,
+    PAUSA_PASSO,
+    RITMO,
+    calcular_pausa_estrategica,
+)
+from utils.file_manager import OUTPUT_DIR
+from utils.historico import obter_historico
+
+# Esperas do caminho normal de AmilBot._processar_cidade (captura pelo XHR),
+# na ordem: antes da captura / depois de fechar o navegador
+ESPERAS_ANTES = ("antes_navegador", "abrir_navegador", "spa_pronta", "spa_estabilizar",
+                 "carregamento_pagina", "apos_carregar", "apos_interacao", "apos_interacao",
+                 "entre_passos", "entre_passos", "antes_captura")
+ESPERAS_DEPOIS = ("final",)
+# Quando o XHR não é capturado e os resultados são lidos do DOM (taxa_sem_xhr)
+ESPERAS_SEM_XHR = ("aguardar_resultados", "resultados_dom")
+
+RENDER_PADRAO_SEG = 4.0  # wkhtmltopdf de uma cidade típica
+ATIVO_MINIMO = 0.1       # fração da duração histórica que sempre conta como trabalho
+
+
+def _media_esperas(chaves) -> float:
+    return sum((RITMO[c][0] + RITMO[c][1]) / 2 for c in chaves)
+
+
+def carregar_tempos_ativos(tarefas: list[tuple[str, str]], render_seg: float) -> dict[tuple[str, str], float]:
+    """
+    Segundos de navegador trabalhando (sem esperas nem render) por cidade:
+    ativo_seg de output/esperas.json quando a cidade está lá; senão a
+    estimativa do histórico menos as esperas médias do RITMO.
+    """
+    medidos = {}
+    caminho = OUTPUT_DIR / "esperas.json"
+    if caminho.exists():
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                for item in json.load(f).get("cidades", []):
+                    if item.get("duracao_seg"):
+                        medidos[(item["uf"], item["cidade"])] = item["ativo_seg"]
+        except (OSError, ValueError):
+            medidos = {}
+
+    esperas = _media_esperas(ESPERAS_ANTES + ESPERAS_DEPOIS)
+    estimativas = obter_historico().estimativas(tarefas)
+    ativos = {}
+    for tarefa in tarefas:
+        if tarefa in medidos:
+            ativo = medidos[tarefa]
+        else:
+            ativo = estimativas[tarefa] - esperas
+        ativo = max(ativo - render_seg, estimativas[tarefa] * ATIVO_MINIMO)
+        ativos[tarefa] = ativo
+    return ativos
+
+
+@dataclass
+class Cenario:
+    navegadores: int = 1
+    renderizadores: int = 2
+    escala_ritmo: float = 1.0   # multiplica RITMO e a pausa estratégica
+    pausa_intervalo: int = PAUSA_INTERVALO
+    pausa_base: int = PAUSA_BASE
+    pausa_max: int = PAUSA_MAX
+    taxa_falha: float = 0.05    # tentativas que falham (transitório)
+    taxa_bloqueio: float = 0.0  # tentativas que falham por bloqueio (backoff maior)
+    taxa_sem_xhr: float = 0.0   # cidades lidas pelo DOM (esperas de ESPERAS_SEM_XHR)
+    variacao: float = 0.3       # sigma do lognormal em volta do tempo ativo
+    render_seg: float = RENDER_PADRAO_SEG
+    ordem: str = "auto"         # lpt | arquivo | auto (lpt com >1 navegador, como o orquestrador)
+
+
+class Simulacao:
+    """Uma execução em tempo virtual (eventos em heap, sem threads nem sleeps)."""
+
+    def __init__(self, tarefas: list[tuple[str, str]], ativos: dict, cenario: Cenario, semente: int) -> None:
+        self.cenario = cenario
+        self.ativos = ativos
+        self.rnd = random.Random(semente)
+        random.seed(semente)  # jitter de atraso_retry
+        self.agora = 0.0
+        self._eventos: list = []
+        self._seq = itertools.count()
+        self.agendador = AgendadorTentativas(tarefas, relogio=lambda: self.agora)
+
+        self.renders_livres = cenario.renderizadores
+        self.fila_render: list = []
+        self.bloqueado_ate = 0.0  # pausa estratégica: nenhuma cidade nova começa antes disso
+        self.concluidas = 0
+        self.ocupado = 0.0        # soma do tempo com navegador ocupado
+        self.dormindo = 0.0       # parte disso em esperas deliberadas
+        self.espera_render = 0.0
+        self.pausas = 0.0
+
+    # ---------------------- sorteios ----------------------
+
+    def _esperas(self, chaves) -> float:
+        escala = self.cenario.escala_ritmo
+        return sum(self.rnd.uniform(*RITMO[c]) * escala for c in chaves)
+
+    def _ativo(self, tarefa) -> float:
+        return self.ativos[tarefa] * math.exp(self.rnd.gauss(0, self.cenario.variacao))
+
+    # ---------------------- eventos ----------------------
+
+    def _agendar(self, tempo: float, acao, *args) -> None:
+        heapq.heappush(self._eventos, (tempo, next(self._seq), acao, args))
+
+    def _livre(self, _navegador: int) -> None:
+        """Navegador pede a próxima cidade (mesma lógica de _Orquestrador._trabalhador)."""
+        if self.agora < self.bloqueado_ate:
+            self._agendar(self.bloqueado_ate, self._livre, _navegador)
+            return
+        espera = self.agendador.espera()
+        if espera is None:
+            return
+        if espera > 0:
+            self._agendar(self.agora + min(espera, 1.0), self._livre, _navegador)
+            return
+        uf, cidade, _ = self.agendador.proxima()
+        antes = self._esperas(ESPERAS_ANTES)
+        if self.rnd.random() < self.cenario.taxa_sem_xhr:
+            antes += self._esperas(ESPERAS_SEM_XHR)
+        ativo = self._ativo((uf, cidade))
+        sorteio = self.rnd.random()
+        if sorteio < self.cenario.taxa_falha + self.cenario.taxa_bloqueio:
+            # falha no meio da cidade: parte do trabalho + cooldown final (está no finally)
+            erro = ErroBloqueio("simulado") if sorteio < self.cenario.taxa_bloqueio else ErroTransitorio("simulado")
+            depois = self._esperas(ESPERAS_DEPOIS)
+            fim = self.agora + antes + ativo * self.rnd.uniform(0.2, 1.0) + depois
+            self._contar(fim - self.agora, antes + depois)
+            self._agendar(fim, self._falhou, _navegador, uf, cidade, erro)
+        else:
+            self._contar(antes + ativo, antes)
+            self._agendar(self.agora + antes + ativo, self._pedir_render, _navegador, uf, cidade)
+
+    def _contar(self, ocupado: float, dormindo: float) -> None:
+        self.ocupado += ocupado
+        self.dormindo += dormindo
+
+    def _falhou(self, navegador: int, uf: str, cidade: str, erro: Exception) -> None:
+        self.agendador.falhar(uf, cidade, erro)
+        self._livre(navegador)
+
+    def _pedir_render(self, navegador: int, uf: str, cidade: str) -> None:
+        # o navegador fica preso esperando o renderizador (run_coroutine_threadsafe(...).result())
+        if self.renders_livres:
+            self.renders_livres -= 1
+            self._renderizar(navegador, uf, cidade, self.agora)
+        else:
+            self.fila_render.append((navegador, uf, cidade, self.agora))
+
+    def _renderizar(self, navegador: int, uf: str, cidade: str, pedido_em: float) -> None:
+        duracao = self.cenario.render_seg * math.exp(self.rnd.gauss(0, self.cenario.variacao))
+        self.espera_render += self.agora - pedido_em
+        self._contar(self.agora - pedido_em + duracao, 0.0)
+        self._agendar(self.agora + duracao, self._renderizado, navegador, uf, cidade)
+
+    def _renderizado(self, navegador: int, uf: str, cidade: str) -> None:
+        if self.fila_render:
+            self._renderizar(*self.fila_render.pop(0))
+        else:
+            self.renders_livres += 1
+        depois = self._esperas(ESPERAS_DEPOIS)
+        self._contar(depois, depois)
+        self._agendar(self.agora + depois, self._concluida, navegador, uf, cidade)
+
+    def _concluida(self, navegador: int, uf: str, cidade: str) -> None:
+        self.agendador.concluir(uf, cidade)
+        self.concluidas += 1
+        c = self.cenario
+        pausa = calcular_pausa_estrategica(self.concluidas, c.pausa_intervalo, c.pausa_base,
+                                           c.pausa_max, PAUSA_PASSO) * c.escala_ritmo
+        if pausa and self.agora >= self.bloqueado_ate:
+            self.bloqueado_ate = self.agora + pausa
+            self.pausas += pausa
+        self._livre(navegador)
+
+    # ---------------------- execução ----------------------
+
+    def executar(self) -> dict:
+        for navegador in range(self.cenario.navegadores):
+            self._agendar(0.0, self._livre, navegador)
+        while self._eventos:
+            self.agora, _, acao, args = heapq.heappop(self._eventos)
+            acao(*args)
+        resumo = self.agendador.resumo()
+        capacidade = self.agora * self.cenario.navegadores
+        return {
+            "tempo_total_seg": self.agora,
+            "concluidas": self.concluidas,
+            "retries": resumo["retries"],
+            "falhas": sum(resumo["falhas"].values()),
+            "ocupacao_navegadores": self.ocupado / capacidade if capacidade else 0.0,
+            "proporcao_dormindo": self.dormindo / self.ocupado if self.ocupado else 0.0,
+            "espera_render_seg": self.espera_render,
+            "pausa_estrategica_seg": self.pausas,
+        }
+
+
+def simular(tarefas: list[tuple[str, str]], ativos: dict, cenario: Cenario,
+            repeticoes: int = 5, semente: int = 42) -> dict:
+    """Mediana/p90 de `repeticoes` simulações do cenário."""
+    ordem = cenario.ordem if cenario.ordem != "auto" else ("lpt" if cenario.navegadores > 1 else "arquivo")
+    if ordem == "lpt":
+        tarefas = sorted(tarefas, key=lambda t: -ativos[t])
+    rodadas = [Simulacao(tarefas, ativos, cenario, semente + i).executar() for i in range(repeticoes)]
+    tempos = sorted(r["tempo_total_seg"] for r in rodadas)
+    mediana = statistics.median(tempos)
+    return {
+        **asdict(cenario),
+        "ordem": ordem,
+        "cidades": len(tarefas),
+        "tempo_mediano_seg": round(mediana, 1),
+        "tempo_p90_seg": round(tempos[min(int(len(tempos) * 0.9), len(tempos) - 1)], 1),
+        "cidades_por_hora": round(statistics.median(r["concluidas"] for r in rodadas) / mediana * 3600, 2)
+        if mediana else 0.0,
+        "ocupacao_navegadores": round(statistics.median(r["ocupacao_navegadores"] for r in rodadas), 3),
+        "proporcao_dormindo": round(statistics.median(r["proporcao_dormindo"] for r in rodadas), 3),
+        "espera_render_seg": round(statistics.median(r["espera_render_seg"] for r in rodadas), 1),
+        "pausa_estrategica_seg": round(statistics.median(r["pausa_estrategica_seg"] for r in rodadas), 1),
+        "retries": statistics.median(r["retries"] for r in rodadas),
+        "falhas": statistics.median(r["falhas"] for r in rodadas),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simula a execução (tempo virtual) para vários cenários")
+    parser.add_argument("--navegadores", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--renderizadores", type=int, nargs="+", default=[2])
+    parser.add_argument("--escala", type=float, nargs="+", default=[1.0],
+                        help="Fator do ritmo (esperas e pausa estratégica)")
+    parser.add_argument("--pausa-intervalo", type=int, default=PAUSA_INTERVALO, help="0 desliga a pausa estratégica")
+    parser.add_argument("--taxa-falha", type=float, default=0.05)
+    parser.add_argument("--taxa-bloqueio", type=float, default=0.0)
+    parser.add_argument("--taxa-sem-xhr", type=float, default=0.0,
+                        help="Fração das cidades lidas pelo DOM (sem a resposta XHR)")
+    parser.add_argument("--render-seg", type=float, default=RENDER_PADRAO_SEG)
+    parser.add_argument("--ordem", choices=("auto", "lpt", "arquivo"), default="auto")
+    parser.add_argument("--uf", nargs="*", help="Só estas UFs (padrão: o mapa inteiro)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--json", help="Grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    # só leitura: sem sincronizar com o site (não grava nada em output/)
+    mapa = carregar_mapa_estados(sincronizar_site=False)
+    tarefas = [(uf, cidade) for uf, cidades in mapa.items() if not args.uf or uf in args.uf for cidade in cidades]
+    ativos = carregar_tempos_ativos(tarefas, args.render_seg)
+    print(f"\n🧮 {len(tarefas)} cidades | tempo ativo médio {statistics.mean(ativos.values()):.0f}s "
+          f"+ esperas ~{_media_esperas(ESPERAS_ANTES + ESPERAS_DEPOIS):.0f}s por cidade (escala 1)")
+
+    resultados = []
+    print(f"\n{'nav':>4} {'render':>6} {'escala':>6} {'ordem':>7} {'total (h)':>10} {'p90 (h)':>8} "
+          f"{'cid/h':>7} {'ocup.':>6} {'dorm.':>6} {'retries':>7}")
+    for navegadores, renderizadores, escala in itertools.product(args.navegadores, args.renderizadores, args.escala):
+        cenario = Cenario(
+            navegadores=navegadores, renderizadores=renderizadores, escala_ritmo=escala,
+            pausa_intervalo=args.pausa_intervalo, taxa_falha=args.taxa_falha,
+            taxa_bloqueio=args.taxa_bloqueio, taxa_sem_xhr=args.taxa_sem_xhr, render_seg=args.render_seg, ordem=args.ordem,
+        )
+        r = simular(tarefas, ativos, cenario, args.repeticoes, args.semente)
+        resultados.append(r)
+        print(f"{navegadores:>4} {renderizadores:>6} {escala:>6.2f} {r['ordem']:>7} "
+              f"{r['tempo_mediano_seg'] / 3600:>10.2f} {r['tempo_p90_seg'] / 3600:>8.2f} "
+              f"{r['cidades_por_hora']:>7.1f} {r['ocupacao_navegadores']:>6.0%} "
+              f"{r['proporcao_dormindo']:>6.0%} {r['retries']:>7}")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from utils.file_manager import OUTPUT_DIR
+
+# =====================================================
+# 🔹 Armazém de resultados por cidade (lista canônica + hash)
+# =====================================================
+# Um JSON por cidade com a lista de prestadores ordenada, o hash dessa
+# lista e a REFERENCIA (mês) do PDF gerado. Com isso o pipeline só
+# re-renderiza quando a lista muda, recria PDFs apagados sem abrir o
+# navegador e gera o relatório de mudanças da execução.
+PASTA_RESULTADOS = OUTPUT_DIR / "resultados"
+
+NOVO = "novo"
+ALTERADO = "alterado"
+INALTERADO = "inalterado"
+
+# o que entra no relatório da execução (sem a lista/registro completos)
+_CAMPOS_MUDANCA = ("uf", "cidade", "status", "total_antes", "total_depois", "adicionados", "removidos")
+
+CAMPOS = ("nome", "endereco", "bairro", "telefone")
+
+
+def _chave(p: dict) -> tuple:
+    return tuple((p.get(c) or "").strip() for c in CAMPOS)
+
+
+def lista_canonica(prestadores: list[dict]) -> list[dict]:
+    """Prestadores sem duplicatas, só com os campos do PDF, em ordem estável."""
+    unicos = {_chave(p): p for p in prestadores}
+    return [dict(zip(CAMPOS, chave)) for chave in sorted(unicos)]
+
+
+def hash_prestadores(prestadores: list[dict]) -> str:
+    canonica = lista_canonica(prestadores)
+    texto = json.dumps(canonica, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+class ArmazemResultados:
+    """Lê/grava o resultado de cada cidade e acumula as mudanças da execução."""
+
+    def __init__(self, pasta: Path = PASTA_RESULTADOS) -> None:
+        self.pasta = Path(pasta)
+        self._lock = threading.Lock()
+        self._mudancas: list[dict] = []
+
+    def caminho(self, uf: str, cidade: str) -> Path:
+        nome_arquivo = f"{cidade}-{uf}".replace(" ", "_")
+        return self.pasta / uf / f"{nome_arquivo}.json"
+
+    def carregar(self, uf: str, cidade: str) -> dict | None:
+        caminho = self.caminho(uf, cidade)
+        if not caminho.exists():
+            return None
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _gravar(self, registro: dict) -> None:
+        caminho = self.caminho(registro["uf"], registro["cidade"])
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        tmp = caminho.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(registro, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, caminho)
+
+    def comparar(self, uf: str, cidade: str, prestadores: list[dict],
+                 referencia: str | None = None, sem_especialidade: bool = False) -> dict:
+        """
+        Compara a lista nova com a gravada, SEM gravar (ver confirmar()).
+        Retorna {"status", "hash", "adicionados", "removidos", "referencia_anterior", "registro"}.
+        """
+        canonica = lista_canonica(prestadores)
+        novo_hash = hash_prestadores(canonica)
+        anterior = self.carregar(uf, cidade)
+
+        if anterior is None:
+            status, adicionados, removidos = NOVO, canonica, []
+        elif anterior["hash"] == novo_hash:
+            status, adicionados, removidos = INALTERADO, [], []
+        else:
+            chaves_antes = {_chave(p) for p in anterior["prestadores"]}
+            chaves_agora = {_chave(p) for p in canonica}
+            status = ALTERADO
+            adicionados = [p for p in canonica if _chave(p) not in chaves_antes]
+            removidos = [p for p in anterior["prestadores"] if _chave(p) not in chaves_agora]
+
+        registro = {
+            "uf": uf,
+            "cidade": cidade,
+            "hash": novo_hash,
+            "total": len(canonica),
+            "sem_especialidade": sem_especialidade,
+            # REFERENCIA é a do PDF em disco: só muda quando o PDF é (re)gerado/carimbado
+            "referencia": anterior.get("referencia") if anterior and status == INALTERADO else referencia,
+            "atualizado_em": time.time(),
+            "alterado_em": anterior.get("alterado_em") if status == INALTERADO else time.time(),
+            "prestadores": canonica,
+        }
+        mudanca = {
+            "uf": uf,
+            "cidade": cidade,
+            "status": status,
+            "total_antes": anterior["total"] if anterior else 0,
+            "total_depois": len(canonica),
+            "adicionados": adicionados,
+            "removidos": removidos,
+        }
+        return {
+            **mudanca,
+            "hash": novo_hash,
+            "referencia_anterior": anterior.get("referencia") if anterior else None,
+            "registro": registro,
+        }
+
+    def confirmar(self, mudanca: dict) -> None:
+        """
+        Grava o registro de comparar() e conta a mudança no relatório. Chamado
+        só depois do PDF gerado: se o render falhar, o hash antigo continua
+        gravado e a próxima tentativa ainda vê a lista como nova/alterada.
+        """
+        self._gravar(mudanca["registro"])
+        with self._lock:
+            self._mudancas.append({c: mudanca[c] for c in _CAMPOS_MUDANCA})
+
+    def registrar(self, uf: str, cidade: str, prestadores: list[dict],
+                  referencia: str | None = None, sem_especialidade: bool = False) -> dict:
+        """comparar() + confirmar() de uma vez (quando não há PDF a gerar)."""
+        mudanca = self.comparar(uf, cidade, prestadores, referencia, sem_especialidade)
+        self.confirmar(mudanca)
+        return mudanca
+
+    def definir_referencia(self, uf: str, cidade: str, referencia: str) -> None:
+        """Atualiza só a REFERENCIA do PDF (após render ou carimbo)."""
+        registro = self.carregar(uf, cidade)
+        if registro is not None and registro.get("referencia") != referencia:
+            registro["referencia"] = referencia
+            self._gravar(registro)
+
+    def iterar(self, uf: str | None = None, cidade: str | None = None, desde: float | None = None):
+        """
+        Registros das cidades, um por vez (só um JSON na memória), em ordem de UF/arquivo.
+        `desde`: só cidades cuja lista mudou a partir desse timestamp (alterado_em).
+        """
+        if uf and cidade:
+            caminhos = [self.caminho(uf, cidade)]
+        else:
+            padrao = f"{cidade.replace(' ', '_')}-*.json" if cidade else "*.json"
+            caminhos = sorted(self.pasta.glob(f"{uf or '*'}/{padrao}"))
+        for caminho in caminhos:
+            try:
+                # mtime < desde → alterado_em (≤ atualizado_em ≤ mtime) também: nem abre
+                if desde is not None and caminho.stat().st_mtime < desde:
+                    continue
+                with open(caminho, "r", encoding="utf-8") as f:
+                    registro = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if cidade and registro["cidade"] != cidade:
+                continue
+            if desde is not None and (registro.get("alterado_em") or 0) < desde:
+                continue
+            yield registro
+
+    # ---------------------- relatório da execução ----------------------
+
+    def iniciar_relatorio(self) -> None:
+        with self._lock:
+            self._mudancas = []
+
+    def relatorio(self) -> dict:
+        with self._lock:
+            mudancas = list(self._mudancas)
+        resumo = {NOVO: 0, ALTERADO: 0, INALTERADO: 0}
+        for m in mudancas:
+            resumo[m["status"]] += 1
+        return {
+            "resumo": resumo,
+            # NOVO também soma: na primeira vez, todos os prestadores da cidade são adicionados
+            "prestadores_adicionados": sum(len(m["adicionados"]) for m in mudancas),
+            "prestadores_removidos": sum(len(m["removidos"]) for m in mudancas),
+            "cidades": [m for m in mudancas if m["status"] != INALTERADO],
+        }
+
+    def salvar_relatorio(self, caminho: Path) -> dict:
+        relatorio = self.relatorio()
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        return relatorio
+
+
+_armazem_padrao: ArmazemResultados | None = None
+_lock_armazem = threading.Lock()
+
+
+def obter_armazem() -> ArmazemResultados:
+    """Armazém único do processo."""
+    global _armazem_padrao
+    with _lock_armazem:
+        if _armazem_padrao is None:
+            _armazem_padrao = ArmazemResultados()
+        return _armazem_padrao
@@ -1,25 +1,237 @@
+import asyncio
+import json
+import os
 import time
 import random
+import threading
+from contextlib import contextmanager
 
+from utils.metricas import COOLDOWN
 
-def delay_humano(min_seg: float = 0.5, max_seg: float = 2.0) -> None:
+
+# =====================================================
+# 🔹 Contabilidade de esperas (dormindo vs trabalhando)
+# =====================================================
+_lock_esperas = threading.Lock()
+_local = threading.local()  # cidade atual da thread (para atribuir as esperas)
+
+# 🔥 NOVO — Fator aplicado a todas as esperas (ex.: 0 no benchmark offline)
+ESCALA_DELAYS = float(os.getenv("AMIL_ESCALA_DELAYS", "1.0"))
+
+_execucao: dict = {"inicio": None, "por_motivo": {}, "dormindo_fora_cidade": 0.0}
+_por_cidade: dict[str, dict] = {}
+
+
+def iniciar_contabilidade() -> None:
+    """Zera os acumuladores no início de uma execução."""
+    with _lock_esperas:
+        _execucao["inicio"] = time.time()
+        _execucao["por_motivo"] = {}
+        _execucao["dormindo_fora_cidade"] = 0.0
+        _por_cidade.clear()
+
+
+def _registrar_espera(segundos: float, motivo: str) -> None:
+    chave = getattr(_local, "cidade", None)
+    with _lock_esperas:
+        _execucao["por_motivo"][motivo] = _execucao["por_motivo"].get(motivo, 0.0) + segundos
+        if chave and chave in _por_cidade:
+            cidade = _por_cidade[chave]
+            cidade["dormindo"] += segundos
+            cidade["por_motivo"][motivo] = cidade["por_motivo"].get(motivo, 0.0) + segundos
+        else:
+            _execucao["dormindo_fora_cidade"] += segundos
+    COOLDOWN.observar(segundos, motivo=motivo)
+
+
+@contextmanager
+def contexto_cidade(uf: str, cidade: str):
+    """Atribui à cidade todas as esperas feitas por esta thread dentro do bloco."""
+    chave = f"{cidade}-{uf}"
+    anterior = getattr(_local, "cidade", None)
+    with _lock_esperas:
+        registro = _por_cidade.setdefault(
+            chave, {"uf": uf, "cidade": cidade, "duracao": 0.0, "dormindo": 0.0, "por_motivo": {}}
+        )
+    anterior_uf_cidade = getattr(_local, "uf_cidade", None)
+    _local.cidade = chave
+    _local.uf_cidade = (uf, cidade)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.cidade = anterior
+        _local.uf_cidade = anterior_uf_cidade
+        with _lock_esperas:
+            registro["duracao"] += time.perf_counter() - inicio
+
+
+def cidade_atual() -> tuple[str, str] | None:
+    """(uf, cidade) do contexto_cidade desta thread, se houver (campos do log estruturado)."""
+    return getattr(_local, "uf_cidade", None)
+
+
+def resumo_esperas() -> dict:
+    """
+    Totais da execução. "ativo" é o tempo dentro das cidades que não foi sleep;
+    com várias cidades em paralelo os tempos somam entre threads.
+    """
+    with _lock_esperas:
+        em_cidades = sum(c["duracao"] for c in _por_cidade.values())
+        dormindo_cidades = sum(c["dormindo"] for c in _por_cidade.values())
+        dormindo = dormindo_cidades + _execucao["dormindo_fora_cidade"]
+        ativo = max(em_cidades - dormindo_cidades, 0.0)
+        contabilizado = ativo + dormindo
+        inicio = _execucao["inicio"]
+        return {
+            "tempo_total_seg": round(time.time() - inicio, 1) if inicio else 0.0,
+            "ativo_seg": round(ativo, 1),
+            "dormindo_seg": round(dormindo, 1),
+            "proporcao_ativo": round(ativo / contabilizado, 3) if contabilizado else 0.0,
+            "proporcao_dormindo": round(dormindo / contabilizado, 3) if contabilizado else 0.0,
+            "por_motivo": {m: round(s, 1) for m, s in sorted(_execucao["por_motivo"].items(), key=lambda x: -x[1])},
+        }
+
+
+def resumo_esperas_por_cidade() -> list[dict]:
+    with _lock_esperas:
+        return [
+            {
+                "uf": c["uf"],
+                "cidade": c["cidade"],
+                "duracao_seg": round(c["duracao"], 1),
+                "dormindo_seg": round(c["dormindo"], 1),
+                "ativo_seg": round(max(c["duracao"] - c["dormindo"], 0.0), 1),
+                "por_motivo": {m: round(s, 1) for m, s in c["por_motivo"].items()},
+            }
+            for c in _por_cidade.values()
+        ]
+
+
+# =====================================================
+# 🔹 Ritmo: faixas (min, max) de cada espera deliberada
+# =====================================================
+# Todas as esperas de AmilBot, de scraper/navegacao.py e a pausa estratégica
+# saem daqui, para que o simulador (simulador.py) e a execução real usem os
+# mesmos números.
+# AMIL_RITMO='{"final": [10, 20]}' sobrescreve faixas sem mexer no código.
+RITMO: dict[str, tuple[float, float]] = {
+    "antes_navegador": (5.0, 10.0),      # antes de abrir o Chrome da cidade
+    "abrir_navegador": (2.0, 4.0),       # Chrome aberto, antes do get()
+    "spa_pronta": (1.0, 1.0),            # readyState complete → conferir o body (navegacao)
+    "spa_vazia": (2.0, 2.0),             # body ainda sem conteúdo (navegacao)
+    "spa_estabilizar": (0.5, 0.5),       # fim de aguardar_pagina_carregar (navegacao)
+    "carregamento_pagina": (3.0, 5.0),   # JS da SPA depois do DOM pronto
+    "apos_carregar": (2.0, 3.0),         # depois do stealth
+    "apos_interacao": (1.0, 2.0),        # cookies / maximizar (cada)
+    "recarregar_pagina": (2.0, 4.0),     # página pequena/vazia
+    "recarregar_apos_erro": (3.0, 5.0),  # get() falhou
+    "entre_passos": (1.5, 3.0),          # passo1 → passo2 → passo3
+    "antes_captura": (2.0, 4.0),         # passo3 → buscar
+    "aguardar_resultados": (3.0, 5.0),   # resultados pelo DOM (sem XHR)
+    "resultados_dom": (2.0, 2.0),        # resultados pelo DOM, depois do checar bloqueio
+    "movimento_humano": (0.3, 0.7),
+    "final": (20.0, 35.0),               # depois de fechar o navegador (sempre)
+    "apos_fechar": (5.0, 10.0),
+    "pdf_existente": (5.0, 10.0),
+    "entre_cidades": (10.0, 18.0),
+}
+RITMO.update({k: tuple(v) for k, v in json.loads(os.getenv("AMIL_RITMO", "{}")).items()})
+
+# Pausa estratégica: a cada PAUSA_INTERVALO cidades, PAUSA_BASE + PAUSA_PASSO por bloco (até PAUSA_MAX)
+PAUSA_INTERVALO = int(os.getenv("AMIL_PAUSA_INTERVALO", "10"))
+PAUSA_BASE = int(os.getenv("AMIL_PAUSA_BASE_SEG", "60"))
+PAUSA_PASSO = int(os.getenv("AMIL_PAUSA_PASSO_SEG", "30"))
+PAUSA_MAX = int(os.getenv("AMIL_PAUSA_MAX_SEG", "300"))
+
+
+def espera_ritmo(chave: str) -> float:
+    """Segundos sorteados na faixa do RITMO (antes de ESCALA_DELAYS, que dormir() aplica)."""
+    minimo, maximo = RITMO[chave]
+    return random.uniform(minimo, maximo)
+
+
+# =====================================================
+# 🔹 Esperas
+# =====================================================
+def dormir(segundos: float, motivo: str, stop_flag=None, escalar: bool = True) -> bool:
+    """
+    Sleep deliberado, marcado com o motivo para a contabilidade de esperas.
+    Com stop_flag (threading.Event) a espera é interrompida assim que o flag
+    é acionado. Retorna True se foi interrompida.
+    escalar=False para esperas já calculadas com ESCALA_DELAYS.
+    """
+    if escalar:
+        segundos *= ESCALA_DELAYS
+    if stop_flag is not None and stop_flag.is_set():
+        return True
+    if segundos <= 0:
+        return False
+    inicio = time.perf_counter()
+    if stop_flag is not None:
+        interrompido = stop_flag.wait(segundos)
+    else:
+        time.sleep(segundos)
+        interrompido = False
+    _registrar_espera(time.perf_counter() - inicio, motivo)
+    return interrompido
+
+
+async def dormir_async(segundos: float, motivo: str, stop_flag=None) -> bool:
+    """
+    Versão asyncio de dormir(): não prende thread. Confere o stop_flag
+    (threading.Event) a cada 0.25s. Retorna True se foi interrompida.
+    """
+    segundos *= ESCALA_DELAYS
+    if stop_flag is not None and stop_flag.is_set():
+        return True
+    if segundos <= 0:
+        return False
+    inicio = time.perf_counter()
+    interrompido = False
+    while True:
+        restante = segundos - (time.perf_counter() - inicio)
+        if restante <= 0:
+            break
+        await asyncio.sleep(min(restante, 0.25))
+        if stop_flag is not None and stop_flag.is_set():
+            interrompido = True
+            break
+    _registrar_espera(time.perf_counter() - inicio, motivo)
+    return interrompido
+
+
+def delay_humano(min_seg: float = 0.5, max_seg: float = 2.0, stop_flag=None) -> bool:
     """Delay aleatório para simular comportamento humano."""
-    time.sleep(random.uniform(min_seg, max_seg))
+    return dormir(random.uniform(min_seg, max_seg), "humano", stop_flag)
+
+
+def calcular_pausa_estrategica(contador_cidades: int,
+                               intervalo: int = PAUSA_INTERVALO,
+                               pausa_base: int = PAUSA_BASE,
+                               pausa_max: int = PAUSA_MAX,
+                               passo: int = PAUSA_PASSO) -> int:
+    """Segundos da pausa estratégica após `contador_cidades` (0 = sem pausa)."""
+    if not intervalo or not contador_cidades or contador_cidades % intervalo != 0:
+        return 0
+    # 🔥 NOVO — Pausa progressiva: aumenta com o número de cidades
+    pausa_extra = min((contador_cidades // intervalo) * passo, pausa_max - pausa_base)
+    return pausa_base + pausa_extra
 
 
 def pausa_estrategica(contador_cidades: int,
-                      intervalo: int = 10,  # 🔥 REDUZIDO: a cada 10 cidades
-                      pausa_base: int = 60,  # 🔥 AUMENTADO: 60 segundos base
-                      pausa_max: int = 300) -> None:  # 🔥 NOVO: máximo 5 minutos
+                      intervalo: int = PAUSA_INTERVALO,  # 🔥 REDUZIDO: a cada 10 cidades
+                      pausa_base: int = PAUSA_BASE,  # 🔥 AUMENTADO: 60 segundos base
+                      pausa_max: int = PAUSA_MAX,  # 🔥 NOVO: máximo 5 minutos
+                      stop_flag=None) -> None:
     """
     A cada `intervalo` cidades, faz uma pausa maior para ajudar a driblar bloqueios.
     Pausa aumenta progressivamente.
     """
-    if contador_cidades and contador_cidades % intervalo == 0:
-        # 🔥 NOVO — Pausa progressiva: aumenta com o número de cidades
-        pausa_extra = min((contador_cidades // intervalo) * 30, pausa_max - pausa_base)
-        pausa_total = pausa_base + pausa_extra
-        
+    pausa_total = calcular_pausa_estrategica(contador_cidades, intervalo, pausa_base, pausa_max)
+    if pausa_total:
         print(f"♻️ Pausa estratégica ({contador_cidades} cidades processadas): {pausa_total}s para reiniciar sessão...")
-        time.sleep(pausa_total)
-        print("✅ Pausa concluída, continuando...")
\ No newline at end of file
+        if dormir(pausa_total, "pausa_estrategica", stop_flag):
+            print("⛔ Pausa interrompida pelo usuário")
+            return
+        print("✅ Pausa concluída, continuando...")
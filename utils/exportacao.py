@@ -0,0 +1,55 @@
+import csv
+import io
+import json
+import zlib
+
+from utils.armazem_resultados import CAMPOS, obter_armazem
+
+# =====================================================
+# 🔹 Exportação dos prestadores (NDJSON / CSV, gzip em streaming)
+# =====================================================
+# Geradores em cima do armazém de resultados: uma cidade por vez na
+# memória, cada cidade comprimida e descarregada (Z_SYNC_FLUSH) assim que
+# sai — o cliente recebe bytes desde a primeira cidade, e a memória não
+# cresce com o tamanho da exportação. Uma linha por prestador, com o
+# mesmo formato de _extrair_prestadores + uf/cidade.
+FORMATOS = ("ndjson", "csv")
+COLUNAS = ("uf", "cidade", *CAMPOS)
+
+
+def _linhas_ndjson(registros):
+    for registro in registros:
+        uf, cidade = registro["uf"], registro["cidade"]
+        yield "".join(
+            json.dumps({"uf": uf, "cidade": cidade, **p}, ensure_ascii=False) + "\n"
+            for p in registro["prestadores"]
+        )
+
+
+def _linhas_csv(registros):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUNAS)
+    for registro in registros:
+        uf, cidade = registro["uf"], registro["cidade"]
+        escritor.writerows((uf, cidade, *(p[c] for c in CAMPOS)) for p in registro["prestadores"])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def exportar(formato: str = "ndjson", uf: str | None = None, cidade: str | None = None,
+             desde: float | None = None, armazem=None):
+    """Gerador de blocos gzip (um por cidade) com os prestadores filtrados."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato} (use {', '.join(FORMATOS)})")
+    registros = (armazem or obter_armazem()).iterar(uf, cidade, desde)
+    linhas = _linhas_ndjson(registros) if formato == "ndjson" else _linhas_csv(registros)
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = cabeçalho gzip
+    yield compressor.flush(zlib.Z_SYNC_FLUSH)  # cabeçalho já sai antes da primeira cidade
+    for texto in linhas:
+        if texto:
+            yield compressor.compress(texto.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,213 @@
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# =====================================================
+# 🔹 Fila de tarefas (uf, cidade) compartilhada entre hosts
+# =====================================================
+# SQLite em volume compartilhado: cada operação é uma transação
+# BEGIN IMMEDIATE curta, então vários workers podem arrendar tarefas
+# sem pegar a mesma cidade. Sem WAL de propósito (não funciona em NFS/SMB).
+
+PENDENTE = "pendente"
+EM_ANDAMENTO = "em_andamento"
+CONCLUIDA = "concluida"
+FALHOU = "falhou"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tarefas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uf TEXT NOT NULL,
+    cidade TEXT NOT NULL,
+    prioridade REAL NOT NULL DEFAULT 0,
+    estado TEXT NOT NULL DEFAULT 'pendente',
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_ate REAL,
+    disponivel_em REAL NOT NULL DEFAULT 0,
+    resultado TEXT,
+    pdf_path TEXT,
+    erro TEXT,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL,
+    UNIQUE (uf, cidade)
+);
+CREATE INDEX IF NOT EXISTS idx_tarefas_estado ON tarefas (estado, disponivel_em, prioridade);
+"""
+
+
+class FilaTarefas:
+    """
+    Fila com lease e visibility timeout.
+
+    Um worker arrenda uma tarefa por `visibilidade_seg`; se não concluir nem
+    renovar nesse prazo (host caiu, processo travou), a tarefa volta para
+    pendente (ou falhou, sem tentativas) na próxima chamada de arrendar() ou
+    de resumo()/finalizada() — o coordenador não fica preso se todos os
+    workers caírem.
+    """
+
+    def __init__(self, caminho: str | Path, visibilidade_seg: float = 900, max_tentativas: int = 3) -> None:
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.visibilidade_seg = visibilidade_seg
+        self.max_tentativas = max_tentativas
+        with self._conexao() as con:
+            con.executescript(_SCHEMA)
+
+    @contextmanager
+    def _conexao(self):
+        con = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        try:
+            yield con
+        finally:
+            con.close()
+
+    @contextmanager
+    def _transacao(self):
+        with self._conexao() as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                yield con
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+
+    # ---------------------- coordenador ----------------------
+
+    def enfileirar(self, tarefas: list[tuple[str, str]], prioridades: dict | None = None) -> int:
+        """Adiciona (uf, cidade); as já existentes são ignoradas. Retorna quantas entraram."""
+        agora = time.time()
+        prioridades = prioridades or {}
+        with self._transacao() as con:
+            antes = con.total_changes
+            con.executemany(
+                "INSERT OR IGNORE INTO tarefas (uf, cidade, prioridade, criado_em, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(uf, cidade, prioridades.get((uf, cidade), 0), agora, agora) for uf, cidade in tarefas],
+            )
+            return con.total_changes - antes
+
+    def limpar(self) -> None:
+        with self._transacao() as con:
+            con.execute("DELETE FROM tarefas")
+
+    # ---------------------- worker ----------------------
+
+    def _reenfileirar_expiradas(self, con, agora: float) -> None:
+        expiradas = con.execute(
+            "SELECT id, tentativas FROM tarefas WHERE estado = ? AND lease_ate < ?",
+            (EM_ANDAMENTO, agora),
+        ).fetchall()
+        for row in expiradas:
+            estado = FALHOU if row["tentativas"] >= self.max_tentativas else PENDENTE
+            con.execute(
+                "UPDATE tarefas SET estado = ?, worker = NULL, lease_ate = NULL, "
+                "erro = 'lease expirado', atualizado_em = ? WHERE id = ?",
+                (estado, agora, row["id"]),
+            )
+
+    def arrendar(self, worker: str) -> dict | None:
+        """Pega a próxima tarefa disponível (maior prioridade primeiro) ou None."""
+        agora = time.time()
+        with self._transacao() as con:
+            self._reenfileirar_expiradas(con, agora)
+            row = con.execute(
+                "SELECT * FROM tarefas WHERE estado = ? AND disponivel_em <= ? "
+                "ORDER BY prioridade DESC, id LIMIT 1",
+                (PENDENTE, agora),
+            ).fetchone()
+            if row is None:
+                return None
+            con.execute(
+                "UPDATE tarefas SET estado = ?, worker = ?, lease_ate = ?, "
+                "tentativas = tentativas + 1, atualizado_em = ? WHERE id = ?",
+                (EM_ANDAMENTO, worker, agora + self.visibilidade_seg, agora, row["id"]),
+            )
+            tarefa = dict(row)
+            tarefa["tentativas"] += 1
+            return tarefa
+
+    def renovar(self, tarefa_id: int, worker: str) -> bool:
+        """Estende o lease (heartbeat). False se o lease já foi perdido."""
+        agora = time.time()
+        with self._transacao() as con:
+            cur = con.execute(
+                "UPDATE tarefas SET lease_ate = ?, atualizado_em = ? "
+                "WHERE id = ? AND worker = ? AND estado = ?",
+                (agora + self.visibilidade_seg, agora, tarefa_id, worker, EM_ANDAMENTO),
+            )
+            return cur.rowcount == 1
+
+    def concluir(self, tarefa_id: int, worker: str, resultado: dict, pdf_path: str | None = None) -> bool:
+        agora = time.time()
+        with self._transacao() as con:
+            cur = con.execute(
+                "UPDATE tarefas SET estado = ?, resultado = ?, pdf_path = ?, erro = NULL, "
+                "lease_ate = NULL, atualizado_em = ? WHERE id = ? AND worker = ?",
+                (CONCLUIDA, json.dumps(resultado, ensure_ascii=False), pdf_path, agora, tarefa_id, worker),
+            )
+            return cur.rowcount == 1
+
+    def falhar(self, tarefa_id: int, worker: str, erro: str, atraso_seg: float = 0,
+               definitivo: bool = False) -> None:
+        """
+        Registra falha: volta para a fila (após `atraso_seg`) até esgotar as
+        tentativas. definitivo=True (erro permanente) encerra na hora.
+        """
+        agora = time.time()
+        with self._transacao() as con:
+            row = con.execute(
+                "SELECT tentativas FROM tarefas WHERE id = ? AND worker = ?", (tarefa_id, worker)
+            ).fetchone()
+            if row is None:
+                return
+            estado = FALHOU if definitivo or row["tentativas"] >= self.max_tentativas else PENDENTE
+            con.execute(
+                "UPDATE tarefas SET estado = ?, worker = NULL, lease_ate = NULL, erro = ?, "
+                "disponivel_em = ?, atualizado_em = ? WHERE id = ?",
+                (estado, erro, agora + atraso_seg, agora, tarefa_id),
+            )
+
+    def liberar(self, tarefa_id: int, worker: str) -> None:
+        """Devolve a tarefa sem gastar tentativa (ex.: worker encerrado pelo usuário)."""
+        agora = time.time()
+        with self._transacao() as con:
+            con.execute(
+                "UPDATE tarefas SET estado = ?, worker = NULL, lease_ate = NULL, "
+                "tentativas = MAX(tentativas - 1, 0), atualizado_em = ? "
+                "WHERE id = ? AND worker = ? AND estado = ?",
+                (PENDENTE, agora, tarefa_id, worker, EM_ANDAMENTO),
+            )
+
+    # ---------------------- consulta ----------------------
+
+    def resumo(self) -> dict:
+        # 🔥 CORREÇÃO — Expira leases aqui também: sem worker vivo, ninguém chama arrendar()
+        with self._transacao() as con:
+            self._reenfileirar_expiradas(con, time.time())
+            contagens = {PENDENTE: 0, EM_ANDAMENTO: 0, CONCLUIDA: 0, FALHOU: 0}
+            for row in con.execute("SELECT estado, COUNT(*) AS n FROM tarefas GROUP BY estado"):
+                contagens[row["estado"]] = row["n"]
+            return contagens
+
+    def finalizada(self) -> bool:
+        resumo = self.resumo()
+        return resumo[PENDENTE] == 0 and resumo[EM_ANDAMENTO] == 0
+
+    def tarefas(self, estado: str | None = None) -> list[dict]:
+        with self._conexao() as con:
+            if estado:
+                rows = con.execute("SELECT * FROM tarefas WHERE estado = ? ORDER BY id", (estado,))
+            else:
+                rows = con.execute("SELECT * FROM tarefas ORDER BY id")
+            tarefas = []
+            for row in rows:
+                tarefa = dict(row)
+                tarefa["resultado"] = json.loads(tarefa["resultado"]) if tarefa["resultado"] else None
+                tarefas.append(tarefa)
+            return tarefas
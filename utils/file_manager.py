@@ -1,14 +1,16 @@
+import os
 from pathlib import Path
 
 # Raiz do projeto (pasta onde fica o main.py)
 SCRIPT_DIR = Path(__file__).resolve().parents[1]
 
-OUTPUT_DIR = SCRIPT_DIR / "output"
+# 🔥 NOVO — Diretórios sobrescrevíveis por variável de ambiente (benchmark/replay offline)
+OUTPUT_DIR = Path(os.getenv("AMIL_OUTPUT_DIR", SCRIPT_DIR / "output"))
 REDE_COMPLETA_DIR = OUTPUT_DIR / "Rede_Amil_Completa"
 REDE_SEM_TEL_DIR = OUTPUT_DIR / "Rede_Amil_Sem_Telefone"
 
 # 🔥 NOVO — Diretório para PDFs no GitHub Pages
-DOCS_PDFS_DIR = SCRIPT_DIR / "docs" / "pdfs"
+DOCS_PDFS_DIR = Path(os.getenv("AMIL_DOCS_PDFS_DIR", SCRIPT_DIR / "docs" / "pdfs"))
 
 
 def ensure_dir(path: Path) -> Path:
@@ -0,0 +1,158 @@
+import heapq
+import json
+import math
+import os
+import statistics
+import threading
+import time
+from pathlib import Path
+
+from utils.armazem_resultados import obter_armazem
+from utils.file_manager import OUTPUT_DIR
+
+# =====================================================
+# 🔹 Histórico de duração por cidade + ordem LPT
+# =====================================================
+# Cada cidade concluída grava quanto tempo levou (cooldowns incluídos) e
+# quantos prestadores tinha. Na execução seguinte as cidades saem da
+# mais longa para a mais curta (LPT): a capital enorme começa junto com
+# as outras, em vez de sobrar sozinha no fim com os outros navegadores
+# parados. Cidade sem histórico é estimada pelas vizinhas em número de
+# prestadores (mesma UF primeiro).
+ARQUIVO_HISTORICO = OUTPUT_DIR / "historico_cidades.json"
+
+DURACOES_GUARDADAS = 5      # últimas N execuções por cidade (usa a mediana)
+VIZINHOS = 5                # cidades parecidas usadas na estimativa
+DURACAO_PADRAO_SEG = 120.0  # sem histórico nenhum
+
+
+def _chave(uf: str, cidade: str) -> str:
+    return f"{uf}|{cidade}"
+
+
+def simular_makespan(duracoes: list[float], trabalhadores: int) -> float:
+    """Fim da última cidade se cada uma vai para o trabalhador livre primeiro, na ordem dada."""
+    if not duracoes:
+        return 0.0
+    cargas = [0.0] * max(trabalhadores, 1)
+    for duracao in duracoes:
+        heapq.heapreplace(cargas, cargas[0] + duracao)
+    return max(cargas)
+
+
+class HistoricoCidades:
+    """Durações e prestadores por cidade, persistidos entre execuções."""
+
+    def __init__(self, caminho: Path = ARQUIVO_HISTORICO) -> None:
+        self.caminho = Path(caminho)
+        self._lock = threading.Lock()
+        self._cidades: dict[str, dict] = {}
+        self._carregar()
+
+    def _carregar(self) -> None:
+        if not self.caminho.exists():
+            return
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                self._cidades = json.load(f)
+        except Exception:
+            self._cidades = {}
+
+    def _salvar(self) -> None:
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.caminho.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._cidades, f, ensure_ascii=False)
+        os.replace(tmp, self.caminho)
+
+    def registrar(self, uf: str, cidade: str, duracao: float, prestadores: int | None) -> None:
+        with self._lock:
+            entrada = self._cidades.setdefault(_chave(uf, cidade), {"duracoes": []})
+            entrada["duracoes"] = (entrada["duracoes"] + [round(duracao, 1)])[-DURACOES_GUARDADAS:]
+            if prestadores is not None:
+                entrada["prestadores"] = prestadores
+            entrada["atualizado_em"] = time.time()
+            self._salvar()
+
+    # ---------------------- estimativa ----------------------
+
+    def duracao_conhecida(self, uf: str, cidade: str) -> float | None:
+        entrada = self._cidades.get(_chave(uf, cidade))
+        if not entrada or not entrada["duracoes"]:
+            return None
+        return statistics.median(entrada["duracoes"])
+
+    def _prestadores(self, uf: str, cidade: str) -> int | None:
+        entrada = self._cidades.get(_chave(uf, cidade))
+        if entrada and entrada.get("prestadores") is not None:
+            return entrada["prestadores"]
+        registro = obter_armazem().carregar(uf, cidade)
+        return registro["total"] if registro else None
+
+    def _conhecidas(self) -> list[tuple[str, int | None, float]]:
+        """(uf, prestadores, duração mediana) de cada cidade com histórico."""
+        conhecidas = []
+        for chave, entrada in self._cidades.items():
+            if entrada["duracoes"]:
+                uf = chave.split("|", 1)[0]
+                conhecidas.append((uf, entrada.get("prestadores"), statistics.median(entrada["duracoes"])))
+        return conhecidas
+
+    def estimativas(self, tarefas: list[tuple[str, str]]) -> dict[tuple[str, str], float]:
+        """
+        Segundos esperados por cidade: mediana do histórico; sem histórico, mediana
+        das VIZINHOS cidades com número de prestadores mais próximo (escala log,
+        mesma UF se houver cidades suficientes); sem prestadores, mediana da UF.
+        """
+        with self._lock:
+            conhecidas = self._conhecidas()
+            duracoes = {t: self.duracao_conhecida(*t) for t in tarefas}
+        geral = statistics.median([d for _, _, d in conhecidas]) if conhecidas else DURACAO_PADRAO_SEG
+        por_uf: dict[str, list[tuple[int | None, float]]] = {}
+        for uf, prestadores, duracao in conhecidas:
+            por_uf.setdefault(uf, []).append((prestadores, duracao))
+        com_prestadores = [(p, d) for _, p, d in conhecidas if p is not None]
+
+        resultado = {}
+        for (uf, cidade), duracao in duracoes.items():
+            if duracao is not None:
+                resultado[(uf, cidade)] = duracao
+                continue
+            da_uf = por_uf.get(uf, [])
+            prestadores = self._prestadores(uf, cidade)
+            if prestadores is not None:
+                candidatas = [(p, d) for p, d in da_uf if p is not None]
+                if len(candidatas) < VIZINHOS:
+                    candidatas = com_prestadores
+                if candidatas:
+                    alvo = math.log1p(prestadores)
+                    proximas = sorted(candidatas, key=lambda c: abs(math.log1p(c[0]) - alvo))[:VIZINHOS]
+                    resultado[(uf, cidade)] = statistics.median(d for _, d in proximas)
+                    continue
+            resultado[(uf, cidade)] = statistics.median(d for _, d in da_uf) if da_uf else geral
+        return resultado
+
+    def ordenar_lpt(self, tarefas: list[tuple[str, str]]) -> tuple[list[tuple[str, str]], dict]:
+        """Tarefas da mais longa para a mais curta (empate mantém a ordem original) + estimativas."""
+        estimativas = self.estimativas(tarefas)
+        return sorted(tarefas, key=lambda t: -estimativas[t]), estimativas
+
+
+def comparar_makespan(previsto: float, real: float) -> dict:
+    """Resumo previsto x real para log e relatório."""
+    erro = (real - previsto) / previsto if previsto else None
+    return {"previsto_seg": round(previsto, 1), "real_seg": round(real, 1),
+            "erro_relativo": round(erro, 3) if erro is not None else None}
+
+
+_historico_padrao: HistoricoCidades | None = None
+_lock_historico = threading.Lock()
+
+
+def obter_historico() -> HistoricoCidades:
+    """Histórico único do processo."""
+    global _historico_padrao
+    with _lock_historico:
+        if _historico_padrao is None:
+            _historico_padrao = HistoricoCidades()
+        return _historico_padrao
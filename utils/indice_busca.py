@@ -0,0 +1,297 @@
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils.armazem_resultados import CAMPOS, PASTA_RESULTADOS, hash_prestadores, lista_canonica
+from utils.file_manager import OUTPUT_DIR
+
+# =====================================================
+# 🔹 Índice de busca de prestadores (SQLite FTS5)
+# =====================================================
+# Tabela comum com os prestadores de cada cidade + índice FTS5 de
+# conteúdo externo sobre nome, endereço, bairro e telefone (sem acento,
+# com índice de prefixo de 2 a 8 letras: "odonto"* vira uma lista pronta
+# em vez de juntar as listas de todas as palavras que começam assim). UF e cidade também entram no FTS (cidade como
+# um token só, "BASALVADOR"): o filtro vira parte do MATCH e o FTS
+# cruza as listas invertidas, em vez de casar o país todo e filtrar
+# depois. O bot reindexa a cidade depois de registrar a lista no
+# armazém (só se o hash mudou); reconstruir() refaz tudo a partir de
+# output/resultados numa única transação.
+ARQUIVO_INDICE = OUTPUT_DIR / "indice_prestadores.db"
+
+POR_PAGINA_PADRAO = 20
+POR_PAGINA_MAX = 100
+# Contar custa por linha casada: até esse número de resultados a contagem é exata
+# e a ordem é UF/cidade/nome; acima ("rua", "cl") a contagem para no limite e a
+# ordem é a do índice, que o FTS5 já entrega paginada. Sem bm25 de propósito: o
+# IDF de um termo comum ("rua"*) varre a lista inteira mesmo com 1 resultado.
+LIMITE_RESULTADOS = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prestadores (
+    id INTEGER PRIMARY KEY,
+    uf TEXT NOT NULL,
+    cidade TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    endereco TEXT NOT NULL,
+    bairro TEXT NOT NULL,
+    telefone TEXT NOT NULL,
+    chave TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_prestadores_cidade ON prestadores (uf, cidade);
+CREATE TABLE IF NOT EXISTS cidades (
+    uf TEXT NOT NULL,
+    cidade TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    atualizado_em REAL NOT NULL,
+    PRIMARY KEY (uf, cidade)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS prestadores_fts USING fts5(
+    nome, endereco, bairro, telefone, uf, chave,
+    content='prestadores', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6 7 8'
+);
+"""
+
+_COLUNAS = ", ".join(CAMPOS)
+PREFIXO_MAX = 8  # maior prefixo do índice (prefix='2 ... 8')
+_COLUNAS_FTS = f"{_COLUNAS}, uf, chave"
+
+
+def chave_cidade(uf: str, cidade: str) -> str:
+    """UF + cidade num token só ("BA", "SALVADOR" → "BASALVADOR")."""
+    return re.sub(r"\W", "", f"{uf}{cidade}".upper())
+
+
+def montar_consulta(texto: str | None, uf: str | None = None, chaves: list[str] | None = None) -> str | None:
+    """
+    Texto livre → consulta FTS5: todas as palavras, cada uma como prefixo, só nas
+    colunas do prestador; UF e cidades (chave_cidade) como termos exatos.
+    Palavra maior que PREFIXO_MAX vira o prefixo de PREFIXO_MAX letras, que tem
+    lista pronta no índice ("odontologica" também acha "odontologia").
+    """
+    termos = re.findall(r"\w+", texto or "")
+    if not termos:
+        return None
+    expressao = " ".join(f'"{t[:PREFIXO_MAX]}"*' for t in termos)
+    partes = ["{%s} : (%s)" % (" ".join(CAMPOS), expressao)]
+    if chaves is not None:
+        partes.append("chave : (%s)" % " OR ".join(f'"{c}"' for c in chaves))
+    elif uf:
+        partes.append(f'uf : "{chave_cidade(uf, "")}"')
+    return " AND ".join(partes)
+
+
+class IndiceBusca:
+    """Índice FTS5 dos prestadores de todas as cidades."""
+
+    def __init__(self, caminho: str | Path = ARQUIVO_INDICE) -> None:
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.novo = not self.caminho.exists()
+        self._leitores: queue.SimpleQueue = queue.SimpleQueue()
+        with self._conexao() as con:
+            con.execute("PRAGMA journal_mode=WAL")  # leitura da API não espera a escrita do bot
+            con.executescript(_SCHEMA)
+
+    @contextmanager
+    def _conexao(self):
+        con = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        try:
+            yield con
+        finally:
+            con.close()
+
+    @contextmanager
+    def _leitura(self):
+        """Conexão reaproveitada entre buscas (abrir + carregar o FTS custa mais que a consulta)."""
+        try:
+            con = self._leitores.get_nowait()
+        except queue.Empty:
+            con = sqlite3.connect(self.caminho, timeout=30, isolation_level=None, check_same_thread=False)
+            con.row_factory = sqlite3.Row
+        try:
+            yield con
+        finally:
+            self._leitores.put(con)
+
+    @contextmanager
+    def _transacao(self):
+        with self._conexao() as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                yield con
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+
+    # ---------------------- escrita ----------------------
+
+    @staticmethod
+    def _substituir_cidade(con, uf: str, cidade: str, prestadores: list[dict]) -> None:
+        # Conteúdo externo: o FTS precisa receber os valores antigos para apagar
+        con.execute(
+            f"INSERT INTO prestadores_fts (prestadores_fts, rowid, {_COLUNAS_FTS}) "
+            f"SELECT 'delete', id, {_COLUNAS_FTS} FROM prestadores WHERE uf = ? AND cidade = ?",
+            (uf, cidade),
+        )
+        con.execute("DELETE FROM prestadores WHERE uf = ? AND cidade = ?", (uf, cidade))
+        chave = chave_cidade(uf, cidade)
+        con.executemany(
+            f"INSERT INTO prestadores (uf, cidade, chave, {_COLUNAS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(uf, cidade, chave, *(p[c] for c in CAMPOS)) for p in prestadores],
+        )
+        con.execute(
+            f"INSERT INTO prestadores_fts (rowid, {_COLUNAS_FTS}) "
+            f"SELECT id, {_COLUNAS_FTS} FROM prestadores WHERE uf = ? AND cidade = ?",
+            (uf, cidade),
+        )
+
+    def indexar_cidade(self, uf: str, cidade: str, prestadores: list[dict], hash_lista: str | None = None) -> bool:
+        """Troca os prestadores da cidade no índice. False se o hash já era o indexado."""
+        canonica = lista_canonica(prestadores)
+        hash_lista = hash_lista or hash_prestadores(canonica)
+        with self._transacao() as con:
+            atual = con.execute(
+                "SELECT hash FROM cidades WHERE uf = ? AND cidade = ?", (uf, cidade)
+            ).fetchone()
+            if atual is not None and atual["hash"] == hash_lista:
+                return False
+            self._substituir_cidade(con, uf, cidade, canonica)
+            con.execute(
+                "INSERT OR REPLACE INTO cidades (uf, cidade, hash, total, atualizado_em) VALUES (?, ?, ?, ?, ?)",
+                (uf, cidade, hash_lista, len(canonica), time.time()),
+            )
+        return True
+
+    def reconstruir(self, pasta: str | Path = PASTA_RESULTADOS) -> dict:
+        """Apaga e refaz o índice a partir dos JSON do armazém, numa única transação."""
+        inicio = time.perf_counter()
+        cidades, linhas = [], []
+        for caminho in sorted(Path(pasta).glob("*/*.json")):
+            try:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    registro = json.load(f)
+            except Exception:
+                continue
+            uf, cidade = registro["uf"], registro["cidade"]
+            cidades.append((uf, cidade, registro["hash"], registro["total"], time.time()))
+            chave = chave_cidade(uf, cidade)
+            linhas.extend((uf, cidade, chave, *(p[c] for c in CAMPOS)) for p in registro["prestadores"])
+
+        with self._transacao() as con:
+            con.execute("DELETE FROM prestadores")
+            con.execute("DELETE FROM cidades")
+            con.executemany(
+                f"INSERT INTO prestadores (uf, cidade, chave, {_COLUNAS}) VALUES (?, ?, ?, ?, ?, ?, ?)", linhas
+            )
+            con.executemany(
+                "INSERT INTO cidades (uf, cidade, hash, total, atualizado_em) VALUES (?, ?, ?, ?, ?)", cidades
+            )
+            # Refaz o FTS inteiro a partir da tabela de conteúdo (bem mais rápido que linha a linha)
+            con.execute("INSERT INTO prestadores_fts (prestadores_fts) VALUES ('rebuild')")
+        with self._conexao() as con:
+            con.execute("INSERT INTO prestadores_fts (prestadores_fts) VALUES ('optimize')")
+        return {"cidades": len(cidades), "prestadores": len(linhas),
+                "tempo_seg": round(time.perf_counter() - inicio, 2)}
+
+    # ---------------------- leitura ----------------------
+
+    def buscar(self, texto: str | None = None, uf: str | None = None, cidade: str | None = None,
+               pagina: int = 1, por_pagina: int = POR_PAGINA_PADRAO) -> dict:
+        """
+        Prestadores que casam com todas as palavras de `texto` (prefixo, sem acento),
+        filtrados por UF/cidade, em ordem de UF/cidade/nome (até LIMITE_RESULTADOS
+        resultados); sem texto, a lista da UF/cidade.
+        """
+        inicio = time.perf_counter()
+        pagina = max(int(pagina), 1)
+        por_pagina = min(max(int(por_pagina), 1), POR_PAGINA_MAX)
+        uf = uf.upper() if uf else None
+        cidade = cidade.upper() if cidade else None
+        campos = ", ".join(f"p.{c}" for c in ("uf", "cidade", *CAMPOS))
+        limite = [por_pagina, (pagina - 1) * por_pagina]
+
+        total_exato = True
+        with self._leitura() as con:
+            chaves = None
+            if cidade:
+                # Cidade sem UF pode existir em mais de uma UF: vira um OR de chaves
+                ufs = [uf] if uf else [
+                    linha[0] for linha in con.execute("SELECT uf FROM cidades WHERE cidade = ?", (cidade,))
+                ]
+                chaves = [chave_cidade(u, cidade) for u in ufs] or [chave_cidade("", cidade)]
+            consulta = montar_consulta(texto, uf, chaves)
+            if consulta:
+                # CROSS JOIN fixa o FTS como laço externo (o MATCH roda uma vez só)
+                origem = "prestadores_fts f CROSS JOIN prestadores p ON p.id = f.rowid WHERE prestadores_fts MATCH ?"
+                # O filtro já está no MATCH: a contagem nem precisa da tabela de conteúdo
+                total = con.execute(
+                    "SELECT count(*) FROM (SELECT 1 FROM prestadores_fts WHERE prestadores_fts MATCH ? LIMIT ?)",
+                    [consulta, LIMITE_RESULTADOS + 1],
+                ).fetchone()[0]
+                total_exato = total <= LIMITE_RESULTADOS
+                total = min(total, LIMITE_RESULTADOS)
+                criterio = "alfabetica" if total_exato else "indice"
+                ordem = "p.uf, p.cidade, p.nome" if total_exato else "f.rowid"
+                linhas = con.execute(
+                    f"SELECT {campos} FROM {origem} ORDER BY {ordem} LIMIT ? OFFSET ?",
+                    [consulta, *limite],
+                ).fetchall()
+            else:
+                filtros, params = [], []
+                for coluna, valor in (("uf", uf), ("cidade", cidade)):
+                    if valor:
+                        filtros.append(f"p.{coluna} = ?")
+                        params.append(valor)
+                where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+                total = con.execute(f"SELECT count(*) FROM prestadores p {where}", params).fetchone()[0]
+                criterio = "alfabetica"
+                linhas = con.execute(
+                    f"SELECT {campos} FROM prestadores p {where} ORDER BY p.uf, p.cidade, p.nome LIMIT ? OFFSET ?",
+                    [*params, *limite],
+                ).fetchall()
+
+        return {
+            "total": total,
+            "total_exato": total_exato,
+            "pagina": pagina,
+            "por_pagina": por_pagina,
+            "paginas": (total + por_pagina - 1) // por_pagina,
+            "ordem": criterio,
+            "resultados": [dict(linha) for linha in linhas],
+            "tempo_ms": round((time.perf_counter() - inicio) * 1000, 2),
+        }
+
+    def resumo(self) -> dict:
+        with self._leitura() as con:
+            cidades, prestadores = con.execute("SELECT count(*), coalesce(sum(total), 0) FROM cidades").fetchone()
+        return {"cidades": cidades, "prestadores": prestadores}
+
+
+_indice_padrao: IndiceBusca | None = None
+_lock_indice = threading.Lock()
+
+
+def obter_indice() -> IndiceBusca:
+    """Índice único do processo (criado agora → já nasce com o que há no armazém)."""
+    global _indice_padrao
+    with _lock_indice:
+        if _indice_padrao is None:
+            _indice_padrao = IndiceBusca()
+            if _indice_padrao.novo and PASTA_RESULTADOS.exists():
+                _indice_padrao.reconstruir()
+        return _indice_padrao
+
+
+if __name__ == "__main__":
+    # python -m utils.indice_busca  → reconstrói o índice a partir de output/resultados
+    print(f"🔎 Índice reconstruído: {IndiceBusca().reconstruir()}")
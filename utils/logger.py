@@ -1,36 +1,283 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 
+from utils.delays import cidade_atual
+from utils.metricas import etapa_atual
+
+# =====================================================
+# 🔹 Log fora do caminho da cidade (fila + thread de escrita)
+# =====================================================
+# O logger só enfileira (QueueHandler): formatar, escrever no console, no
+# .log, no .jsonl e alimentar o painel da web fica numa thread única
+# (QueueListener). Os arquivos são gravados em lote — descarregam quando
+# a fila esvazia ou a cada LOTE_MAX registros — e rotacionam por tamanho.
+# Cada registro leva uf/cidade (contexto_cidade da thread), etapa (span
+# medir() atual) e, quando houver, duracao.
+LOTE_MAX = 200
+TAMANHO_MAX_MB = float(os.getenv("AMIL_LOG_MAX_MB", "10"))
+BACKUPS = int(os.getenv("AMIL_LOG_BACKUPS", "5"))
+ESPERA_ESVAZIAR_SEG = 5.0
+
+CAMPOS_EXTRAS = ("uf", "cidade", "etapa", "duracao")
+
+_FORMATO_TEXTO = logging.Formatter(
+    "[%(asctime)s] [%(levelname)s] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S"
+)
+
+
+class _FormatadorJsonl(logging.Formatter):
+    """Uma linha JSON por registro; campos ausentes ficam de fora."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        linha = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for campo in CAMPOS_EXTRAS:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                linha[campo] = round(valor, 3) if campo == "duracao" else valor
+        if record.exc_info:
+            linha["exc"] = self.formatException(record.exc_info)
+        return json.dumps(linha, ensure_ascii=False)
+
+
+class _RotativoEmLote(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler que só faz flush a cada LOTE_MAX registros ou quando pedem (fila vazia)."""
+
+    def __init__(self, caminho: Path) -> None:
+        super().__init__(caminho, maxBytes=int(TAMANHO_MAX_MB * 1024 * 1024),
+                         backupCount=BACKUPS, encoding="utf-8")
+        self._pendentes = 0
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        # O original formata o registro de novo e faz dois stat() por registro;
+        # aqui gira depois de passar do limite (arquivo sempre aberto)
+        return self.maxBytes > 0 and self.stream is not None and self.stream.tell() >= self.maxBytes
+
+    def flush(self) -> None:  # chamado pelo emit() a cada registro
+        self._pendentes += 1
+        if self._pendentes >= LOTE_MAX:
+            self.descarregar()
+
+    def descarregar(self) -> None:
+        self._pendentes = 0
+        super().flush()
+
+
+class _Painel(logging.Handler):
+    """Entrega ao painel da web (callback_log) só os registros marcados com painel=True."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.assinantes: list = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not getattr(record, "painel", False):
+            return
+        for callback in list(self.assinantes):
+            try:
+                callback(record.getMessage())
+            except Exception:
+                self.handleError(record)
+
+
+# =====================================================
+# 🔹 Custo do log por cidade
+# =====================================================
+_lock_custos = threading.Lock()
+_custos: dict[tuple, dict] = {}
+
+
+def _somar_custo(chave: tuple, campo: str, segundos: float) -> None:
+    with _lock_custos:
+        custo = _custos.setdefault(chave, {"registros": 0, "chamador": 0.0, "escrita": 0.0})
+        custo[campo] += segundos
+        if campo == "chamador":
+            custo["registros"] += 1
+
+
+def iniciar_custos_log() -> None:
+    """Zera os custos no início de uma execução."""
+    with _lock_custos:
+        _custos.clear()
+
+
+def _formatar_custo(chave: tuple, custo: dict) -> dict:
+    return {
+        "uf": chave[0],
+        "cidade": chave[1],
+        "registros": custo["registros"],
+        "chamador_ms": round(custo["chamador"] * 1000, 2),
+        "escrita_ms": round(custo["escrita"] * 1000, 2),
+    }
+
+
+def custo_log_cidade(uf: str, cidade: str) -> dict:
+    """Registros e tempo gasto logando na thread da cidade (chamador) e na thread de escrita."""
+    with _lock_custos:
+        custo = dict(_custos.get((uf, cidade)) or {"registros": 0, "chamador": 0.0, "escrita": 0.0})
+    return _formatar_custo((uf, cidade), custo)
+
+
+def resumo_custos_log(por_cidade: bool = True) -> dict:
+    """Totais da execução + por cidade (registros fora de cidade ficam em uf/cidade None)."""
+    with _lock_custos:
+        itens = [(chave, dict(custo)) for chave, custo in _custos.items()]
+    cidades = [_formatar_custo(chave, custo) for chave, custo in itens]
+    resumo = {
+        "registros": sum(c["registros"] for c in cidades),
+        "chamador_ms": round(sum(c["chamador_ms"] for c in cidades), 2),
+        "escrita_ms": round(sum(c["escrita_ms"] for c in cidades), 2),
+        "fila": _fila.qsize(),
+    }
+    if por_cidade:
+        resumo["cidades"] = cidades
+    return resumo
+
+
+# =====================================================
+# 🔹 Fila e thread de escrita
+# =====================================================
+class _Enfileirador(logging.handlers.QueueHandler):
+    """Lado do chamador: anexa uf/cidade/etapa do contexto e só enfileira."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Fila no mesmo processo: nada de pickle, então nem formata nem copia aqui —
+        # msg % args fica para a thread de escrita (o código loga com f-strings)
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        inicio = time.perf_counter()
+        if getattr(record, "cidade", None) is None:
+            atual = cidade_atual()
+            if atual:
+                record.uf, record.cidade = atual
+        if getattr(record, "etapa", None) is None:
+            record.etapa = etapa_atual()
+        super().emit(record)
+        _somar_custo((getattr(record, "uf", None), getattr(record, "cidade", None)),
+                     "chamador", time.perf_counter() - inicio)
+
+
+class _Ouvinte(logging.handlers.QueueListener):
+    """QueueListener que descarrega os arquivos sempre que a fila esvazia."""
+
+    def dequeue(self, block: bool):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            self.descarregar()
+            return self.queue.get(block)
+
+    def handle(self, record: logging.LogRecord) -> None:
+        inicio = time.perf_counter()
+        super().handle(record)
+        _somar_custo((getattr(record, "uf", None), getattr(record, "cidade", None)),
+                     "escrita", time.perf_counter() - inicio)
+
+    def descarregar(self) -> None:
+        for handler in self.handlers:
+            if isinstance(handler, _RotativoEmLote):
+                handler.descarregar()
+
+    def adicionar(self, handler: logging.Handler) -> None:
+        self.handlers = self.handlers + (handler,)
+
+    def stop(self) -> None:
+        super().stop()
+        self.descarregar()
+
+
+_fila: queue.Queue = queue.Queue(-1)
+_painel = _Painel()
+_ouvinte: _Ouvinte | None = None
+_arquivos: set[Path] = set()
+_lock_ouvinte = threading.Lock()
+
+
+def _obter_ouvinte() -> _Ouvinte:
+    global _ouvinte
+    with _lock_ouvinte:
+        if _ouvinte is None:
+            console = logging.StreamHandler()
+            console.setFormatter(_FORMATO_TEXTO)
+            _ouvinte = _Ouvinte(_fila, console, _painel, respect_handler_level=True)
+            _ouvinte.start()
+            # atexit do logging roda depois: garante que o último lote chegue ao disco
+            atexit.register(_ouvinte.stop)
+        return _ouvinte
+
+
+def _adicionar_arquivos(log_file: Path) -> None:
+    """Texto (como antes) em log_file e JSON-lines ao lado (mesmo nome, .jsonl)."""
+    ouvinte = _obter_ouvinte()
+    with _lock_ouvinte:
+        if log_file in _arquivos:
+            return
+        _arquivos.add(log_file)
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        texto = _RotativoEmLote(log_file)
+        texto.setFormatter(_FORMATO_TEXTO)
+        jsonl = _RotativoEmLote(log_file.with_suffix(".jsonl"))
+        jsonl.setFormatter(_FormatadorJsonl())
+        ouvinte.adicionar(texto)
+        ouvinte.adicionar(jsonl)
+
+
+def esvaziar_logs(timeout: float = ESPERA_ESVAZIAR_SEG) -> None:
+    """Espera a thread de escrita processar o que já foi enfileirado (fim de execução)."""
+    limite = time.monotonic() + timeout
+    while _fila.unfinished_tasks and time.monotonic() < limite:
+        time.sleep(0.01)
+    if _ouvinte is not None:
+        with _lock_ouvinte:
+            _ouvinte.descarregar()
+
+
+@contextmanager
+def encaminhar_painel(callback_log=None):
+    """Durante o bloco, registros com extra={"painel": True} também vão para callback_log."""
+    if callback_log is None:
+        yield
+        return
+    _obter_ouvinte()
+    _painel.assinantes.append(callback_log)
+    try:
+        yield
+    finally:
+        esvaziar_logs()
+        _painel.assinantes.remove(callback_log)
+
 
 def setup_logger(name: str = "amil_bot",
                  log_file: str | Path | None = None,
                  level: int = logging.INFO) -> logging.Logger:
     """
-    Cria um logger com saída no console e (opcional) em arquivo.
+    Cria um logger com saída no console e (opcional) em arquivo (.log texto +
+    .jsonl estruturado, com rotação), escritos fora da thread que loga.
     """
     logger = logging.getLogger(name)
     logger.setLevel(level)
 
-    # Evita adicionar handlers duplicados
-    if logger.handlers:
-        return logger
-
-    formatter = logging.Formatter(
-        "[%(asctime)s] [%(levelname)s] %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
-
-    # Console
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-
-    # Arquivo (opcional)
+    _obter_ouvinte()
     if log_file:
-        log_path = Path(log_file)
-        log_path.parent.mkdir(parents=True, exist_ok=True)
-        file_handler = logging.FileHandler(log_path, encoding="utf-8")
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        _adicionar_arquivos(Path(log_file))
+
+    # Evita adicionar handlers duplicados
+    if not any(isinstance(h, _Enfileirador) for h in logger.handlers):
+        logger.addHandler(_Enfileirador(_fila))
 
-    return logger
\ No newline at end of file
+    return logger
@@ -0,0 +1,133 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# =====================================================
+# 🔹 Histogramas de latência (formato Prometheus)
+# =====================================================
+
+# Limites dos buckets em segundos — cobrem de cliques (<1s) até cidades inteiras (>5min)
+BUCKETS_PADRAO = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180, 300, 600)
+
+
+class Histograma:
+    """Histograma cumulativo com labels, seguro para uso entre threads."""
+
+    def __init__(self, nome: str, descricao: str, buckets: tuple = BUCKETS_PADRAO) -> None:
+        self.nome = nome
+        self.descricao = descricao
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **labels) -> None:
+        chave = tuple(sorted(labels.items()))
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = {"contagens": [0] * len(self.buckets), "soma": 0.0, "total": 0}
+                self._series[chave] = serie
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie["contagens"][i] += 1
+            serie["soma"] += valor
+            serie["total"] += 1
+
+    def resumo(self) -> list[dict]:
+        """Retorna soma/total/média por série (útil para logs)."""
+        with self._lock:
+            return [
+                {
+                    "labels": dict(chave),
+                    "total": serie["total"],
+                    "soma": round(serie["soma"], 3),
+                    "media": round(serie["soma"] / serie["total"], 3) if serie["total"] else 0.0,
+                }
+                for chave, serie in self._series.items()
+            ]
+
+    def exportar(self) -> list[str]:
+        linhas = [
+            f"# HELP {self.nome} {self.descricao}",
+            f"# TYPE {self.nome} histogram",
+        ]
+        with self._lock:
+            for chave, serie in sorted(self._series.items()):
+                base = [f'{k}="{_escapar_label(v)}"' for k, v in chave]
+                for limite, contagem in zip(self.buckets, serie["contagens"]):
+                    labels = ",".join(base + [f'le="{limite}"'])
+                    linhas.append(f"{self.nome}_bucket{{{labels}}} {contagem}")
+                labels = ",".join(base + ['le="+Inf"'])
+                linhas.append(f"{self.nome}_bucket{{{labels}}} {serie['total']}")
+                sufixo = "{" + ",".join(base) + "}" if base else ""
+                linhas.append(f"{self.nome}_sum{sufixo} {serie['soma']:.6f}")
+                linhas.append(f"{self.nome}_count{sufixo} {serie['total']}")
+        return linhas
+
+
+def _escapar_label(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# =====================================================
+# Registro global
+# =====================================================
+_REGISTRO: dict[str, Histograma] = {}
+_lock_registro = threading.Lock()
+
+
+def histograma(nome: str, descricao: str = "", buckets: tuple = BUCKETS_PADRAO) -> Histograma:
+    """Obtém (ou cria) um histograma registrado pelo nome."""
+    with _lock_registro:
+        if nome not in _REGISTRO:
+            _REGISTRO[nome] = Histograma(nome, descricao or nome, buckets)
+        return _REGISTRO[nome]
+
+
+ETAPA = histograma(
+    "amil_etapa_duracao_segundos",
+    "Duracao de cada etapa do processamento de uma cidade",
+)
+CIDADE = histograma(
+    "amil_cidade_duracao_segundos",
+    "Duracao total do processamento de uma cidade",
+)
+COOLDOWN = histograma(
+    "amil_cooldown_duracao_segundos",
+    "Tempo gasto em cooldowns e pausas deliberadas",
+)
+
+
+_local = threading.local()  # etapa atual da thread (campo "etapa" do log estruturado)
+
+
+@contextmanager
+def medir(etapa: str, hist: Histograma | None = None, **labels):
+    """
+    Span de tempo: mede o bloco e registra no histograma (ETAPA por padrão),
+    inclusive quando o bloco levanta exceção.
+    """
+    hist = hist or ETAPA
+    anterior = getattr(_local, "etapa", None)
+    _local.etapa = etapa
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.etapa = anterior
+        hist.observar(time.perf_counter() - inicio, etapa=etapa, **labels)
+
+
+def etapa_atual() -> str | None:
+    """Etapa do span medir() mais interno desta thread."""
+    return getattr(_local, "etapa", None)
+
+
+def exportar_prometheus() -> str:
+    """Texto no formato de exposição do Prometheus (0.0.4)."""
+    with _lock_registro:
+        hists = list(_REGISTRO.values())
+    linhas = []
+    for h in hists:
+        linhas.extend(h.exportar())
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,243 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from utils.file_manager import OUTPUT_DIR
+
+# =====================================================
+# 🔹 Perfil de CPU por execução / por cidade (opt-in)
+# =====================================================
+# Responde "o tempo vai para o Python (extração, planilha, HTML do PDF) ou
+# para esperar o Chrome?". Dois modos:
+#   cprofile   → determinístico, .prof (pstats / snakeviz); custo alto,
+#                só a thread que perfila.
+#   amostragem → uma thread lê sys._current_frames() a cada INTERVALO_MS
+#                e grava speedscope JSON; custo ~constante, todas as
+#                threads da execução (orquestrador) ou só a da cidade.
+# Ligado por variável de ambiente (AMIL_PERFIL=execucao|cidade) ou, para
+# UMA próxima cidade, pela web (POST /api/perfil).
+PASTA_PERFIS = OUTPUT_DIR / "perfis"
+
+CPROFILE = "cprofile"
+AMOSTRAGEM = "amostragem"
+MODOS = (CPROFILE, AMOSTRAGEM)
+
+EXECUCAO = "execucao"
+CIDADE = "cidade"
+ESCOPOS = (EXECUCAO, CIDADE)
+
+ESCOPO_PADRAO = os.getenv("AMIL_PERFIL", "").strip().lower()            # "" = desligado
+MODO_PADRAO = os.getenv("AMIL_PERFIL_MODO", AMOSTRAGEM).strip().lower()
+INTERVALO_MS = float(os.getenv("AMIL_PERFIL_INTERVALO_MS", "10"))
+PERFIS_GUARDADOS = 50  # listados em /api/perfil (os arquivos ficam)
+
+
+def _nome_arquivo(rotulo: str) -> str:
+    return f"{datetime.now():%Y%m%d_%H%M%S}_{rotulo}".replace(" ", "_").replace("/", "_")
+
+
+# =====================================================
+# 🔹 Amostrador (pilhas de sys._current_frames → speedscope)
+# =====================================================
+class Amostrador:
+    """Amostra as pilhas das threads escolhidas (None = todas menos a própria) em intervalo fixo."""
+
+    def __init__(self, threads: set[int] | None = None, intervalo_ms: float = INTERVALO_MS) -> None:
+        self.threads = threads
+        self.intervalo = intervalo_ms / 1000
+        self._parar = threading.Event()
+        self._frames: dict[tuple, int] = {}           # (nome, arquivo, linha) → índice
+        self._pilhas: dict[int, dict[tuple, int]] = {}  # thread → pilha → amostras
+        self._nomes: dict[int, str] = {}
+        self._thread: threading.Thread | None = None
+        self.inicio = self.fim = 0.0
+        self.amostras = 0
+
+    def iniciar(self) -> "Amostrador":
+        self.inicio = time.perf_counter()
+        self._thread = threading.Thread(target=self._amostrar, name="perfil-amostragem", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.fim = time.perf_counter()
+
+    def _indice(self, codigo) -> int:
+        chave = (codigo.co_name, codigo.co_filename, codigo.co_firstlineno)
+        indice = self._frames.get(chave)
+        if indice is None:
+            indice = self._frames[chave] = len(self._frames)
+        return indice
+
+    def _amostrar(self) -> None:
+        propria = threading.get_ident()
+        while not self._parar.wait(self.intervalo):
+            for ident, frame in sys._current_frames().items():
+                if ident == propria or (self.threads is not None and ident not in self.threads):
+                    continue
+                pilha = []
+                while frame is not None:
+                    pilha.append(self._indice(frame.f_code))
+                    frame = frame.f_back
+                pilha = tuple(reversed(pilha))  # speedscope: raiz primeiro
+                contagens = self._pilhas.setdefault(ident, {})
+                contagens[pilha] = contagens.get(pilha, 0) + 1
+            self.amostras += 1
+        for thread in threading.enumerate():
+            if thread.ident in self._pilhas:
+                self._nomes[thread.ident] = thread.name
+
+    def speedscope(self, nome: str) -> dict:
+        """Arquivo no formato https://www.speedscope.app/file-format-schema.json (um perfil por thread)."""
+        frames = [{"name": n, "file": a, "line": l} for (n, a, l) in self._frames]
+        perfis = []
+        for ident, contagens in self._pilhas.items():
+            pilhas = list(contagens)
+            pesos = [round(contagens[p] * self.intervalo, 6) for p in pilhas]
+            perfis.append({
+                "type": "sampled",
+                "name": f"{nome} [{self._nomes.get(ident, ident)}]",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(pesos), 6),
+                "samples": [list(p) for p in pilhas],
+                "weights": pesos,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": perfis,
+            "name": nome,
+            "exporter": "amil-bot",
+        }
+
+
+# =====================================================
+# 🔹 Perfilador (config, pedido da web, gravação)
+# =====================================================
+class Perfilador:
+    """Decide quando perfilar, roda cProfile/amostrador e grava em output/perfis/."""
+
+    def __init__(self, pasta: Path = PASTA_PERFIS, escopo: str = ESCOPO_PADRAO,
+                 modo: str = MODO_PADRAO) -> None:
+        self.pasta = Path(pasta)
+        self.escopo = escopo if escopo in ESCOPOS else ""
+        self.modo = modo if modo in MODOS else AMOSTRAGEM
+        self._lock = threading.Lock()
+        self._pedidos: list[dict] = []  # pedidos de uma vez só (web)
+        self._gerados: list[dict] = []
+        self._local = threading.local()  # cProfile ativo nesta thread (não dá para aninhar)
+
+    # ---------------------- pedidos da web ----------------------
+
+    def solicitar(self, escopo: str = CIDADE, modo: str | None = None,
+                  uf: str | None = None, cidade: str | None = None) -> dict:
+        """Perfila a PRÓXIMA execução/cidade (filtrando por uf/cidade, se dados)."""
+        if escopo not in ESCOPOS:
+            raise ValueError(f"Escopo inválido: {escopo} (use {', '.join(ESCOPOS)})")
+        if modo is not None and modo not in MODOS:
+            raise ValueError(f"Modo inválido: {modo} (use {', '.join(MODOS)})")
+        pedido = {"escopo": escopo, "modo": modo or self.modo, "uf": uf, "cidade": cidade,
+                  "pedido_em": time.time()}
+        with self._lock:
+            self._pedidos.append(pedido)
+        return pedido
+
+    def _consumir(self, escopo: str, uf: str | None = None, cidade: str | None = None) -> dict | None:
+        with self._lock:
+            for pedido in self._pedidos:
+                if (pedido["escopo"] == escopo
+                        and pedido["uf"] in (None, uf) and pedido["cidade"] in (None, cidade)):
+                    self._pedidos.remove(pedido)
+                    return pedido
+        return None
+
+    def resumo(self) -> dict:
+        with self._lock:
+            return {
+                "escopo_padrao": self.escopo or None,
+                "modo_padrao": self.modo,
+                "pendentes": list(self._pedidos),
+                "gerados": list(self._gerados),
+            }
+
+    # ---------------------- perfilar ----------------------
+
+    @contextmanager
+    def perfilar(self, rotulo: str, modo: str, todas_threads: bool = False, log=None):
+        """Perfila o bloco e grava o arquivo ao sair (mesmo com exceção)."""
+        # cProfile usa sys.setprofile da thread: um segundo desligaria o primeiro
+        if modo == CPROFILE and getattr(self._local, "cprofile", False):
+            modo = AMOSTRAGEM
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        inicio = time.perf_counter()
+        if modo == CPROFILE:
+            perfil = cProfile.Profile()
+            self._local.cprofile = True
+            perfil.enable()
+        else:
+            perfil = Amostrador(None if todas_threads else {threading.get_ident()}).iniciar()
+        try:
+            yield
+        finally:
+            if modo == CPROFILE:
+                perfil.disable()
+                self._local.cprofile = False
+                caminho = self.pasta / f"{_nome_arquivo(rotulo)}.prof"
+                perfil.dump_stats(caminho)
+            else:
+                perfil.parar()
+                caminho = self.pasta / f"{_nome_arquivo(rotulo)}.speedscope.json"
+                with open(caminho, "w", encoding="utf-8") as f:
+                    json.dump(perfil.speedscope(rotulo), f)
+            with self._lock:
+                self._gerados = (self._gerados + [{
+                    "rotulo": rotulo,
+                    "modo": modo,
+                    "arquivo": str(caminho),
+                    "duracao_seg": round(time.perf_counter() - inicio, 2),
+                    "gerado_em": time.time(),
+                }])[-PERFIS_GUARDADOS:]
+            if log:
+                log(f"🔬 Perfil ({modo}) de {rotulo} gravado em {caminho}")
+
+    def execucao(self, rotulo: str = "execucao", todas_threads: bool = False, log=None):
+        """Contexto da execução inteira: perfila se AMIL_PERFIL=execucao ou se a web pediu."""
+        pedido = self._consumir(EXECUCAO)
+        if pedido is None and self.escopo != EXECUCAO:
+            return _nulo()
+        return self.perfilar(rotulo, pedido["modo"] if pedido else self.modo, todas_threads, log)
+
+    def cidade(self, uf: str, cidade: str, log=None):
+        """Contexto de uma cidade: perfila se AMIL_PERFIL=cidade ou se há pedido para ela."""
+        pedido = self._consumir(CIDADE, uf, cidade)
+        if pedido is None and self.escopo != CIDADE:
+            return _nulo()
+        return self.perfilar(f"{cidade}-{uf}", pedido["modo"] if pedido else self.modo, log=log)
+
+
+@contextmanager
+def _nulo():
+    yield
+
+
+_perfilador_padrao: Perfilador | None = None
+_lock_perfilador = threading.Lock()
+
+
+def obter_perfilador() -> Perfilador:
+    """Perfilador único do processo."""
+    global _perfilador_padrao
+    with _lock_perfilador:
+        if _perfilador_padrao is None:
+            _perfilador_padrao = Perfilador()
+        return _perfilador_padrao
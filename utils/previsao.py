@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import deque
+
+# =====================================================
+# 🔹 Previsão de término (ETA) e vazão da execução
+# =====================================================
+# Cada cidade pesa a duração estimada pelo histórico (utils/historico.py:
+# cidades grandes pesam mais). Ao concluir, o peso sai do restante da UF
+# e do total e o horário entra numa janela deslizante — tudo O(1) por
+# cidade. A vazão da janela (peso/seg) dá o ETA geral e o de cada UF; a
+# comparação da janela com a média da execução mostra se ela está ficando
+# mais lenta (bloqueios, retries).
+JANELA_SEG = 1800.0  # 30 min
+MINIMO_NA_JANELA = 3  # com menos cidades concluídas, ETA pelo histórico (peso / paralelismo)
+
+
+class PrevisaoExecucao:
+    """Estado incremental da execução atual; resumo() é O(nº de UFs)."""
+
+    def __init__(self, janela_seg: float = JANELA_SEG, relogio=time.time) -> None:
+        self.janela_seg = janela_seg
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self.iniciar([], {})
+
+    def iniciar(self, tarefas: list[tuple[str, str]], pesos: dict[tuple[str, str], float],
+                paralelismo: int = 1) -> None:
+        """Chamado uma vez com as cidades na ordem em que vão ser raspadas (sem as puladas)."""
+        with self._lock:
+            self._inicio = self._relogio()
+            self._paralelismo = max(paralelismo, 1)
+            self._pesos = {t: float(pesos.get(t, 0.0)) for t in tarefas}
+            self._restante_uf: dict[str, float] = {}
+            self._cidades_uf: dict[str, int] = {}
+            # peso acumulado até a última cidade de cada UF, na ordem das tarefas:
+            # a UF termina quando tudo até ali tiver sido feito
+            self._peso_ate_fim_uf: dict[str, float] = {}
+            acumulado = 0.0
+            for uf, cidade in tarefas:
+                peso = self._pesos[(uf, cidade)]
+                acumulado += peso
+                self._restante_uf[uf] = self._restante_uf.get(uf, 0.0) + peso
+                self._cidades_uf[uf] = self._cidades_uf.get(uf, 0) + 1
+                self._peso_ate_fim_uf[uf] = acumulado
+            self._peso_total = acumulado
+            self._peso_feito = 0.0  # concluídas (vazão)
+            self._peso_fora = 0.0   # concluídas + falhas definitivas (saíram do restante)
+            self._concluidas = 0
+            self._total = len(tarefas)
+            self._janela: deque[tuple[float, float, bool]] = deque()  # (horário, peso, falhou)
+            self._peso_janela = 0.0
+            self._concluidas_janela = 0
+            self._falhas_janela = 0
+
+    # ---------------------- eventos (O(1) amortizado) ----------------------
+
+    def _expirar(self, agora: float) -> None:
+        limite = agora - self.janela_seg
+        while self._janela and self._janela[0][0] < limite:
+            _, peso, falhou = self._janela.popleft()
+            if falhou:
+                self._falhas_janela -= 1
+            else:
+                self._peso_janela -= peso
+                self._concluidas_janela -= 1
+
+    def _retirar(self, uf: str, cidade: str) -> float:
+        peso = self._pesos.pop((uf, cidade))
+        self._restante_uf[uf] -= peso
+        self._cidades_uf[uf] -= 1
+        self._peso_fora += peso
+        return peso
+
+    def concluir(self, uf: str, cidade: str) -> None:
+        """Cidade fora do plano (ex.: pulada por já ter PDF) não conta na vazão."""
+        with self._lock:
+            if (uf, cidade) not in self._pesos:
+                return
+            agora = self._relogio()
+            peso = self._retirar(uf, cidade)
+            self._peso_feito += peso
+            self._concluidas += 1
+            self._janela.append((agora, peso, False))
+            self._peso_janela += peso
+            self._concluidas_janela += 1
+            self._expirar(agora)
+
+    def falhar(self, uf: str, cidade: str, definitiva: bool = False) -> None:
+        """Falha conta na janela (sinal de bloqueio); a definitiva sai do restante."""
+        with self._lock:
+            if (uf, cidade) not in self._pesos:
+                return
+            agora = self._relogio()
+            if definitiva:
+                self._retirar(uf, cidade)
+                self._total -= 1
+            self._janela.append((agora, 0.0, True))
+            self._falhas_janela += 1
+            self._expirar(agora)
+
+    # ---------------------- consulta ----------------------
+
+    def resumo(self) -> dict:
+        with self._lock:
+            agora = self._relogio()
+            self._expirar(agora)
+            decorrido = max(agora - self._inicio, 1e-9)
+            restante = max(self._peso_total - self._peso_fora, 0.0)
+
+            taxa_media = self._peso_feito / decorrido if self._peso_feito else None
+            taxa = recente = cidades_por_hora = None
+            base = "historico"
+            if self._concluidas_janela >= MINIMO_NA_JANELA:
+                # A janela começa na 1ª conclusão dentro dela: o trabalho daquela cidade
+                # foi feito antes, então o peso dela fica de fora (senão a taxa sai inflada)
+                inicio_janela, peso_primeira, falhou = self._janela[0]
+                intervalo = max(agora - inicio_janela, 1e-9)
+                if self._peso_janela - peso_primeira > 0:
+                    taxa = recente = (self._peso_janela - peso_primeira) / intervalo  # seg estimados / seg real
+                    base = "janela"
+                cidades_por_hora = (self._concluidas_janela - (0 if falhou else 1)) / intervalo * 3600
+            elif decorrido >= self.janela_seg:
+                # Quase nada concluído na última janela (bloqueio, site fora): a vazão
+                # recente cai e o ETA usa a média da execução até aqui
+                recente = self._peso_janela / self.janela_seg
+                cidades_por_hora = self._concluidas_janela / self.janela_seg * 3600
+                taxa = taxa_media
+                base = "media" if taxa else "historico"
+            elif self._concluidas:
+                cidades_por_hora = self._concluidas / decorrido * 3600
+
+            if not taxa:
+                taxa = float(self._paralelismo)  # histórico puro: N navegadores em paralelo
+
+            por_uf = {}
+            for uf, cidades in self._cidades_uf.items():
+                if cidades <= 0:
+                    continue
+                falta = max(self._peso_ate_fim_uf[uf] - self._peso_fora, self._restante_uf[uf], 0.0)
+                por_uf[uf] = {"restantes": cidades, "eta_seg": round(falta / taxa)}
+
+            return {
+                "concluidas": self._concluidas,
+                "total": self._total,
+                "cidades_por_hora": round(cidades_por_hora, 1) if cidades_por_hora is not None else None,
+                "falhas_janela": self._falhas_janela,
+                # < 1: a janela recente rende menos que a média da execução
+                "ritmo_relativo": round(recente / taxa_media, 2) if recente is not None and taxa_media else None,
+                "eta_seg": round(restante / taxa) if self._total else None,
+                "termino_previsto": agora + restante / taxa if self._total else None,
+                "base": base,
+                "por_uf": por_uf,
+            }
+
+
+_previsao_padrao: PrevisaoExecucao | None = None
+_lock_previsao = threading.Lock()
+
+
+def obter_previsao() -> PrevisaoExecucao:
+    """Previsão única do processo (a execução atual)."""
+    global _previsao_padrao
+    with _lock_previsao:
+        if _previsao_padrao is None:
+            _previsao_padrao = PrevisaoExecucao()
+        return _previsao_padrao
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, render_template, jsonify, request, send_file, Response, stream_with_context
 from pathlib import Path
 import json
 import threading
@@ -11,7 +11,17 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from utils.file_manager import DOCS_PDFS_DIR, OUTPUT_DIR
+from utils.metricas import exportar_prometheus, histograma
+from utils.delays import resumo_esperas
+from scraper.proxy_pool import obter_pool
+from scraper.recursos import obter_monitor
+from utils.indice_busca import obter_indice
+from utils.exportacao import FORMATOS, exportar
+from utils.perfilador import obter_perfilador
+from utils.logger import resumo_custos_log
+from utils.previsao import obter_previsao
 from main import executar_bot_com_callbacks
+from orquestrador import executar_bot_async_com_callbacks
 
 app = Flask(__name__)
 
@@ -25,13 +35,22 @@ status_execucao = {
     "log": [],
     "erro": None,
     "inicio": None,
-    "fim": None
+    "fim": None,
+    "latencia_parada_seg": None
 }
 
 # Thread de execução
 thread_execucao = None
 stop_flag = threading.Event()
 
+# 🔥 NOVO — Latência entre /api/parar e o fim real da thread do bot
+LATENCIA_PARADA = histograma(
+    "amil_parada_latencia_segundos",
+    "Tempo entre o pedido de parada e o encerramento da execucao",
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300),
+)
+parada_solicitada_em = None
+
 @app.route('/')
 def index():
     """Página principal."""
@@ -40,7 +59,10 @@ def index():
 @app.route('/api/status')
 def get_status():
     """Retorna status atual da execução."""
-    return jsonify(status_execucao)
+    # 🔥 NOVO — Proporção ativo vs dormindo da execução atual + memória por navegador
+    # 🔥 NOVO — ETA geral/por UF e cidades por hora (utils/previsao.py)
+    return jsonify({**status_execucao, "esperas": resumo_esperas(), "recursos": obter_monitor().resumo(),
+                    "custo_log": resumo_custos_log(por_cidade=False), "previsao": obter_previsao().resumo()})
 
 @app.route('/api/iniciar', methods=['POST'])
 def iniciar_bot():
@@ -58,6 +80,11 @@ def iniciar_bot():
     # 🔥 NOVO — Verificar se quer continuar progresso
     data = request.get_json() or {}
     continuar_progresso = data.get("continuar_progresso", True)
+    # 🔥 NOVO — Mais de 1 navegador usa o orquestrador asyncio
+    try:
+        navegadores = max(1, int(data.get("navegadores", 1)))
+    except (ValueError, TypeError):
+        return jsonify({"erro": "navegadores deve ser um número"}), 400
     
     # 🔥 CORREÇÃO — Carregar progresso ANTES de resetar status para mostrar na interface
     progresso_anterior = None
@@ -80,12 +107,13 @@ def iniciar_bot():
     status_execucao["erro"] = None
     status_execucao["inicio"] = datetime.now().isoformat()
     status_execucao["fim"] = None
+    status_execucao["latencia_parada_seg"] = None
     stop_flag.clear()
     
     # Iniciar em thread separada
     thread_execucao = threading.Thread(
         target=executar_bot_com_status, 
-        args=(continuar_progresso,)  # 🔥 NOVO — Passar flag
+        args=(continuar_progresso, navegadores)  # 🔥 NOVO — Passar flag
     )
     thread_execucao.daemon = True
     thread_execucao.start()
@@ -105,7 +133,9 @@ def iniciar_bot():
 @app.route('/api/parar', methods=['POST'])
 def parar_bot():
     """Para a execução do bot."""
-    global stop_flag
+    global stop_flag, parada_solicitada_em
+    if not stop_flag.is_set():
+        parada_solicitada_em = time.perf_counter()
     stop_flag.set()
     status_execucao["rodando"] = False
     status_execucao["erro"] = None  # Limpar erro ao parar
@@ -204,7 +234,88 @@ def get_estatisticas():
             "erro": str(e)
         }), 500
 
-def executar_bot_com_status(continuar_progresso=True):  # 🔥 NOVO — Parâmetro
+# 🔥 NOVO — Saúde dos proxies (latência, sucesso, bloqueios, quarentena)
+@app.route('/api/proxies')
+def get_proxies():
+    """Estatísticas do pool de proxies."""
+    return jsonify({"proxies": obter_pool().resumo()})
+
+# 🔥 NOVO — Busca de prestadores em todas as cidades (índice FTS5)
+@app.route('/api/prestadores')
+def buscar_prestadores():
+    """Busca por nome/endereço/bairro/telefone; filtros uf e cidade; paginada."""
+    texto = request.args.get('q', '').strip()
+    uf = request.args.get('uf', '').strip()
+    cidade = request.args.get('cidade', '').strip()
+    if not (texto or uf or cidade):
+        return jsonify({"erro": "Informe q, uf ou cidade"}), 400
+    try:
+        pagina = int(request.args.get('pagina', 1))
+        por_pagina = int(request.args.get('por_pagina', 20))
+    except ValueError:
+        return jsonify({"erro": "pagina e por_pagina devem ser números"}), 400
+    try:
+        return jsonify(obter_indice().buscar(texto, uf or None, cidade or None, pagina, por_pagina))
+    except Exception as e:
+        return jsonify({"erro": str(e)}), 500
+
+@app.route('/api/prestadores/reconstruir', methods=['POST'])
+def reconstruir_indice():
+    """Refaz o índice a partir de output/resultados (uma transação)."""
+    return jsonify(obter_indice().reconstruir())
+
+# 🔥 NOVO — Exportação de todos os prestadores (gzip em streaming, memória constante)
+@app.route('/api/export')
+def exportar_prestadores():
+    """NDJSON ou CSV (formato=), filtros uf, cidade e desde (timestamp ou data ISO)."""
+    formato = request.args.get('formato', 'ndjson').lower()
+    if formato not in FORMATOS:
+        return jsonify({"erro": f"formato deve ser um de: {', '.join(FORMATOS)}"}), 400
+    uf = request.args.get('uf', '').strip().upper() or None
+    cidade = request.args.get('cidade', '').strip().upper() or None
+    desde = request.args.get('desde', '').strip() or None
+    if desde:
+        try:
+            desde = float(desde)
+        except ValueError:
+            try:
+                desde = datetime.fromisoformat(desde).timestamp()
+            except ValueError:
+                return jsonify({"erro": "desde deve ser timestamp ou data ISO (ex.: 2026-10-01)"}), 400
+
+    nome = "_".join(filter(None, ["prestadores", uf, cidade and cidade.replace(" ", "_")]))
+    return Response(
+        stream_with_context(exportar(formato, uf, cidade, desde)),
+        mimetype="application/gzip",
+        headers={"Content-Disposition": f"attachment; filename={nome}.{formato}.gz"},
+    )
+
+# 🔥 NOVO — Perfil de CPU de uma próxima cidade (ou execução) sem reiniciar o servidor
+@app.route('/api/perfil', methods=['GET', 'POST'])
+def perfil():
+    """GET: pedidos pendentes e perfis gravados. POST: {"escopo", "modo", "uf", "cidade"}."""
+    perfilador = obter_perfilador()
+    if request.method == 'GET':
+        return jsonify(perfilador.resumo())
+    data = request.get_json(silent=True) or {}
+    try:
+        pedido = perfilador.solicitar(
+            escopo=data.get("escopo", "cidade"),
+            modo=data.get("modo"),
+            uf=(data.get("uf") or "").strip().upper() or None,
+            cidade=(data.get("cidade") or "").strip().upper() or None,
+        )
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    return jsonify({"mensagem": "Perfil agendado", "pedido": pedido})
+
+# 🔥 NOVO — Métricas de latência no formato Prometheus
+@app.route('/metrics')
+def metrics():
+    """Histogramas de duração por cidade, etapa e cooldown."""
+    return Response(exportar_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def executar_bot_com_status(continuar_progresso=True, navegadores=1):  # 🔥 NOVO — Parâmetro
     """Executa o bot atualizando status."""
     def callback_progresso(uf, cidade, total, atual):
         status_execucao["uf_atual"] = uf
@@ -221,7 +332,13 @@ def executar_bot_com_status(continuar_progresso=True):  # 🔥 NOVO — Parâmet
             status_execucao["log"] = status_execucao["log"][-100:]
     
     try:
-        executar_bot_com_callbacks(callback_progresso, callback_log, stop_flag, continuar_progresso)  # 🔥 NOVO
+        if navegadores > 1:
+            executar_bot_async_com_callbacks(
+                callback_progresso, callback_log, stop_flag, continuar_progresso,
+                max_navegadores=navegadores,
+            )
+        else:
+            executar_bot_com_callbacks(callback_progresso, callback_log, stop_flag, continuar_progresso)  # 🔥 NOVO
         status_execucao["progresso"] = status_execucao["total"]
         status_execucao["log"].append(f"[{datetime.now().strftime('%H:%M:%S')}] ✅ Bot finalizado com sucesso!")
     except Exception as e:
@@ -230,9 +347,15 @@ def executar_bot_com_status(continuar_progresso=True):  # 🔥 NOVO — Parâmet
     finally:
         status_execucao["rodando"] = False
         status_execucao["fim"] = datetime.now().isoformat()
+        # 🔥 NOVO — Medir quanto tempo a parada levou para ter efeito
+        global parada_solicitada_em
+        if stop_flag.is_set() and parada_solicitada_em is not None:
+            latencia = time.perf_counter() - parada_solicitada_em
+            LATENCIA_PARADA.observar(latencia)
+            status_execucao["latencia_parada_seg"] = round(latencia, 2)
+            status_execucao["log"].append(f"[{datetime.now().strftime('%H:%M:%S')}] ⏱️ Parada efetivada em {latencia:.2f}s")
+        parada_solicitada_em = None
         # �� NOVO — Limpar erro após 3 segundos (tempo para o frontend mostrar)
-        import threading
-        import time
         def limpar_erro_depois():
             time.sleep(3)
             if not status_execucao["rodando"]: